@@ -1,11 +1,17 @@
+import os
+
 import requests 
-from minsearch import AppendableIndex
 from fastmcp import FastMCP
 from toyaikit.tools import wrap_instance_methods
 
+from bm25 import create_index, DEFAULT_INDEX_BACKEND
 from search_tools import SearchTools
 
-def init_index():
+def init_index(backend=None):
+    # "minsearch" (AppendableIndex) or "bm25" (BM25Index, faster on large indexes)
+    if backend is None:
+        backend = os.getenv("INDEX_BACKEND", DEFAULT_INDEX_BACKEND)
+
     docs_url = 'https://github.com/alexeygrigorev/llm-rag-workshop/raw/main/notebooks/documents.json'
     docs_response = requests.get(docs_url)
     documents_raw = docs_response.json()
@@ -20,9 +26,10 @@ def init_index():
             documents.append(doc)
 
 
-    index = AppendableIndex(
+    index = create_index(
         text_fields=["question", "text", "section"],
-        keyword_fields=["course"]
+        keyword_fields=["course"],
+        backend=backend
     )
 
     index.fit(documents)
@@ -0,0 +1,352 @@
+"""
+Approximate nearest neighbour search over normalized embeddings.
+
+IVFIndex is an inverted file index: k-means splits the vectors into
+n_lists clusters, each vector is filed under its nearest centroid, and a
+query only scores the vectors in the n_probe clusters whose centroids are
+closest to it. n_probe is the recall/latency knob: n_probe == n_lists is
+exact search, n_probe == 1 scores roughly 1/n_lists of the corpus.
+
+Vectors are compared by inner product, which is cosine similarity for
+the L2-normalized embeddings VectorIndex produces.
+
+Until it is trained the index searches exactly; it trains itself once it
+holds train_size vectors, so a corpus that grows one page at a time
+(wiki add_entry) switches over without a rebuild.
+"""
+import json
+from array import array
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+DEFAULT_N_PROBE = 8
+KMEANS_ITERATIONS = 20
+
+# k-means is fit on at most this many vectors per list
+MAX_TRAIN_POINTS_PER_LIST = 256
+
+# rows of the vectors x centroids score matrix computed at a time
+ASSIGN_BATCH_SIZE = 8192
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first, without sorting all of them.
+    """
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Index of the nearest centroid for every vector, in batches.
+    """
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BATCH_SIZE):
+        batch = np.asarray(vectors[start:start + ASSIGN_BATCH_SIZE], dtype=np.float32)
+        labels[start:start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(
+        vectors: np.ndarray,
+        n_clusters: int,
+        iterations: int = KMEANS_ITERATIONS,
+        seed: int = 0
+) -> np.ndarray:
+    """
+    k-means on the unit sphere: centroids are normalized mean directions.
+
+    Returns:
+        np.ndarray: (n_clusters x dim) float32 centroids
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = assign(vectors, centroids)
+
+        # per-cluster sums with one reduceat over the vectors sorted by label
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=n_clusters)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+
+        # restart empty clusters from random vectors
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        new_centroids = sums / np.where(norms == 0, 1, norms)
+
+        if np.allclose(new_centroids, centroids):
+            break
+        centroids = new_centroids
+
+    return centroids.astype(np.float32, copy=False)
+
+
+class IVFIndex:
+    """
+    Inverted file index with k-means centroids.
+
+    Vectors live in one growable (capacity x dim) buffer; each list keeps
+    the row ids filed under its centroid in an array('I'), so inserts are
+    amortized O(1) and a probe reads its ids without copying.
+    """
+
+    def __init__(
+            self,
+            n_lists: int,
+            n_probe: int = DEFAULT_N_PROBE,
+            train_size: int | None = None,
+            dtype: str = "float32",
+            seed: int = 0
+    ):
+        """
+        Args:
+            n_lists (int): Number of k-means clusters.
+            n_probe (int): Clusters scored per query; higher is slower and
+                more accurate.
+            train_size (int): Vectors needed before the index trains itself;
+                defaults to 8 per list.
+            dtype (str): Storage dtype of the vectors.
+            seed (int): Seed for the k-means initialization.
+        """
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_size = n_lists * 8 if train_size is None else train_size
+        self.dtype = np.dtype(dtype)
+        self.seed = seed
+
+        self.centroids: np.ndarray | None = None
+        self._vectors = np.zeros((0, 0), dtype=self.dtype)
+        self._size = 0
+        self._lists: List[array] | None = None
+        self._csr: Tuple[np.ndarray, np.ndarray] | None = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._size]
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _reserve(self, size: int, dim: int):
+        if self._vectors.shape[1] != dim and self._size == 0:
+            self._vectors = np.zeros((0, dim), dtype=self.dtype)
+
+        capacity = len(self._vectors)
+        if size <= capacity and self._vectors.flags.writeable:
+            return
+
+        new_capacity = max(size, 2 * capacity, 1024)
+        buffer = np.empty((new_capacity, dim), dtype=self.dtype)
+        buffer[:self._size] = self._vectors[:self._size]
+        self._vectors = buffer
+
+    def _materialize_lists(self) -> List[array]:
+        """
+        Turn the read-only id arrays of a loaded index into growable lists.
+        """
+        if self._lists is None:
+            ids, offsets = self._csr
+            self._lists = [
+                array("I", ids[offsets[j]:offsets[j + 1]].tolist())
+                for j in range(self.n_lists)
+            ]
+            self._csr = None
+        return self._lists
+
+    def _list_ids(self, j: int) -> np.ndarray:
+        if self._lists is not None:
+            return np.frombuffer(self._lists[j], dtype=np.uint32)
+        ids, offsets = self._csr
+        return ids[offsets[j]:offsets[j + 1]]
+
+    def train(self, vectors: np.ndarray | None = None) -> "IVFIndex":
+        """
+        Fit the centroids (on a sample of at most 256 vectors per list) and
+        file every vector already in the index under them.
+        """
+        if vectors is None:
+            vectors = self.vectors
+
+        n_lists = min(self.n_lists, len(vectors))
+        if n_lists == 0:
+            raise ValueError("Cannot train an IVFIndex without vectors")
+
+        sample_size = n_lists * MAX_TRAIN_POINTS_PER_LIST
+        if len(vectors) > sample_size:
+            rng = np.random.default_rng(self.seed)
+            vectors = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+
+        self.n_lists = n_lists
+        self.centroids = spherical_kmeans(vectors, n_lists, seed=self.seed)
+        self._lists = [array("I") for _ in range(n_lists)]
+        self._csr = None
+        self._file(0, self._size)
+        return self
+
+    def _file(self, start: int, stop: int):
+        labels = assign(self._vectors[start:stop], self.centroids)
+        lists = self._materialize_lists()
+
+        rows = (np.argsort(labels, kind="stable") + start).astype(np.uint32)
+        bounds = np.cumsum(np.bincount(labels, minlength=self.n_lists))
+        for label, group in enumerate(np.split(rows, bounds[:-1])):
+            if len(group):
+                lists[label].frombytes(group.tobytes())
+
+    def add(self, vectors: np.ndarray) -> range:
+        """
+        Append vectors and return their row ids.
+        """
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2:
+            raise ValueError(f"Expected a 2-d array of vectors, got shape {vectors.shape}")
+
+        start = self._size
+        self._reserve(start + len(vectors), vectors.shape[1])
+        self._vectors[start:start + len(vectors)] = vectors
+        self._size += len(vectors)
+
+        if self.is_trained:
+            self._file(start, self._size)
+        elif self._size >= self.train_size:
+            self.train()
+
+        return range(start, self._size)
+
+    def select(self, rows: np.ndarray) -> "IVFIndex":
+        """
+        A new index holding only the given rows (a bool mask or row ids),
+        renumbered in order and filed under the same centroids, so nothing
+        is retrained.
+        """
+        index = type(self)(self.n_lists, self.n_probe, self.train_size, self.dtype.name, self.seed)
+        if self.is_trained:
+            index.centroids = self.centroids
+            index._lists = [array("I") for _ in range(self.n_lists)]
+        if len(self):
+            index.add(self.vectors[rows])
+        return index
+
+    def search(
+            self,
+            queries: np.ndarray,
+            k: int = 10,
+            n_probe: int | None = None
+    ) -> List[np.ndarray]:
+        """
+        Row ids of the approximate top k vectors for each query, best first.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if not self.is_trained:
+            scores = queries @ self.vectors.T
+            return [top_k_indices(row, k) for row in scores]
+
+        n_probe = min(self.n_probe if n_probe is None else n_probe, self.n_lists)
+        centroid_scores = queries @ self.centroids.T
+
+        results = []
+        for query, row in zip(queries, centroid_scores):
+            probes = top_k_indices(row, n_probe)
+            candidates = np.concatenate([self._list_ids(j) for j in probes])
+            scores = self._vectors[candidates].astype(np.float32, copy=False) @ query
+            results.append(candidates[top_k_indices(scores, k)].astype(np.int64))
+        return results
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        The centroids and the lists as CSR arrays (ids grouped by list and
+        list offsets); the vectors are stored by the caller.
+        """
+        if self._lists is None:
+            ids, offsets = self._csr
+        else:
+            ids = np.concatenate(
+                [np.frombuffer(ids, dtype=np.uint32) for ids in self._lists]
+            )
+            offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+            np.cumsum([len(ids) for ids in self._lists], out=offsets[1:])
+        return {"centroids": self.centroids, "ids": ids, "offsets": offsets}
+
+    @classmethod
+    def from_arrays(
+            cls,
+            vectors: np.ndarray,
+            centroids: np.ndarray,
+            ids: np.ndarray,
+            offsets: np.ndarray,
+            n_probe: int = DEFAULT_N_PROBE
+    ) -> "IVFIndex":
+        """
+        Rebuild a trained index from to_arrays output without copying;
+        memory-mapped arrays are only copied on the first add.
+        """
+        index = cls(n_lists=len(centroids), n_probe=n_probe, dtype=vectors.dtype.name)
+        index.centroids = centroids
+        index._vectors = vectors
+        index._size = len(vectors)
+        index._csr = (ids, offsets)
+        return index
+
+    def save(self, path: str | Path) -> Path:
+        """
+        Write the index to a directory of .npy files.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        np.save(path / "vectors.npy", self.vectors)
+        if self.is_trained:
+            for name, values in self.to_arrays().items():
+                np.save(path / f"{name}.npy", values)
+
+        params = {"n_lists": self.n_lists, "n_probe": self.n_probe, "train_size": self.train_size}
+        (path / "ivf.json").write_text(json.dumps(params))
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path, n_probe: int | None = None) -> "IVFIndex":
+        """
+        Open an index written by save, memory-mapping its arrays.
+        """
+        path = Path(path)
+        params = json.loads((path / "ivf.json").read_text())
+        n_probe = params["n_probe"] if n_probe is None else n_probe
+        vectors = np.load(path / "vectors.npy", mmap_mode="r")
+
+        if not (path / "centroids.npy").exists():
+            index = cls(params["n_lists"], n_probe, params["train_size"], vectors.dtype.name)
+            index.add(vectors)
+            return index
+
+        index = cls.from_arrays(
+            vectors,
+            **{
+                name: np.load(path / f"{name}.npy", mmap_mode="r")
+                for name in ("centroids", "ids", "offsets")
+            },
+            n_probe=n_probe,
+        )
+        index.train_size = params["train_size"]
+        return index
@@ -0,0 +1,85 @@
+"""
+Benchmark for approximate vector search.
+
+Builds an ann_index.IVFIndex over synthetic clustered embeddings and
+reports, for a range of n_probe values, recall@k against exact
+brute-force search and the latency per query.
+
+Usage:
+    uv run python -m benchmarks.bench_ann
+    uv run python -m benchmarks.bench_ann --num-vectors 200000 --n-lists 512 --n-probe 4 16 64
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex, top_k_indices
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def generate_vectors(num_vectors: int, dim: int, num_topics: int = 1000, seed: int = 1) -> np.ndarray:
+    """
+    Unit vectors scattered around num_topics directions, roughly the shape
+    of chunk embeddings from a few hundred pages.
+    """
+    rng = np.random.default_rng(seed)
+    topics = normalize(rng.standard_normal((num_topics, dim)))
+    labels = rng.integers(num_topics, size=num_vectors)
+    vectors = topics[labels] + 0.07 * rng.standard_normal((num_vectors, dim))
+    return normalize(vectors).astype(np.float32)
+
+
+def recall_at_k(approximate: list, exact: list) -> float:
+    hits = sum(len(set(a.tolist()) & set(e.tolist())) for a, e in zip(approximate, exact))
+    return hits / sum(len(e) for e in exact)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark IVF search against exact search")
+    parser.add_argument('--num-vectors', type=int, default=100_000, help='Corpus size')
+    parser.add_argument('--dim', type=int, default=384, help='Embedding dimension')
+    parser.add_argument('--num-queries', type=int, default=200, help='Queries to time')
+    parser.add_argument('--k', type=int, default=10, help='Results per query')
+    parser.add_argument('--n-lists', type=int, default=256, help='IVF clusters')
+    parser.add_argument(
+        '--n-probe',
+        type=int,
+        nargs='+',
+        default=[1, 2, 4, 8, 16, 32],
+        help='Clusters scored per query'
+    )
+    args = parser.parse_args()
+
+    vectors = generate_vectors(args.num_vectors, args.dim)
+    rng = np.random.default_rng(2)
+    queries = vectors[rng.integers(len(vectors), size=args.num_queries)]
+    queries = normalize(queries + 0.05 * rng.standard_normal(queries.shape)).astype(np.float32)
+
+    t0 = time.perf_counter()
+    exact = [top_k_indices(vectors @ query, args.k) for query in queries]
+    exact_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+
+    t0 = time.perf_counter()
+    index = IVFIndex(args.n_lists)
+    index.add(vectors)
+    build_s = time.perf_counter() - t0
+
+    print(f"{args.num_vectors} x {args.dim} vectors, {args.n_lists} lists, built in {build_s:.2f} s")
+    print(f"exact          recall@{args.k} 1.000  {exact_ms:>7.3f} ms/query")
+
+    for n_probe in args.n_probe:
+        t0 = time.perf_counter()
+        approximate = [index.search(query[None], args.k, n_probe=n_probe)[0] for query in queries]
+        ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        print(
+            f"n_probe {n_probe:>4}   recall@{args.k} {recall_at_k(approximate, exact):.3f}  "
+            f"{ms:>7.3f} ms/query  {exact_ms / ms:>5.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,110 @@
+"""
+Benchmark for wikiagent.bm25.BM25Index against minsearch's indexes.
+
+Indexes a synthetic FAQ corpus (question/text/section, keyword field
+course) and times fitting and filtered, boosted searches like the ones
+in mcp_faq's SearchTools.search.
+
+Usage:
+    uv run python -m benchmarks.bench_bm25
+    uv run python -m benchmarks.bench_bm25 --num-docs 50000 --skip-appendable
+"""
+import argparse
+import itertools
+import random
+import time
+
+from minsearch import AppendableIndex, Index
+
+from wikiagent.bm25 import BM25Index
+
+
+TEXT_FIELDS = ["question", "text", "section"]
+KEYWORD_FIELDS = ["course"]
+COURSES = ["data-engineering-zoomcamp", "machine-learning-zoomcamp", "mlops-zoomcamp", "llm-zoomcamp"]
+
+
+def generate_docs(
+        num_docs: int,
+        num_courses: int = len(COURSES),
+        vocabulary_size: int = 20_000,
+        seed: int = 1
+) -> list:
+    """
+    FAQ-like records with a Zipf-like word distribution, spread evenly
+    over num_courses courses; the first course is COURSES[0].
+    """
+    courses = (COURSES + [f"course-{i}" for i in range(len(COURSES), num_courses)])[:num_courses]
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(vocabulary_size)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary_size)))
+
+    def text(k):
+        return " ".join(rng.choices(words, cum_weights=cum_weights, k=k))
+
+    return [
+        {
+            "question": text(12),
+            "text": text(rng.randint(30, 200)),
+            "section": text(3),
+            "course": rng.choice(courses),
+        }
+        for _ in range(num_docs)
+    ]
+
+
+def run_benchmark(index, queries: list) -> float:
+    """
+    Average milliseconds per filtered, boosted search.
+    """
+    t0 = time.perf_counter()
+    for query in queries:
+        index.search(
+            query,
+            filter_dict={"course": COURSES[0]},
+            boost_dict={"question": 3.0, "section": 0.5},
+            num_results=5,
+        )
+    return (time.perf_counter() - t0) * 1000 / len(queries)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark BM25Index against minsearch")
+    parser.add_argument('--num-docs', type=int, default=300, help='Corpus size')
+    parser.add_argument('--num-queries', type=int, default=50, help='Queries to time')
+    parser.add_argument(
+        '--num-courses',
+        type=int,
+        default=len(COURSES),
+        help='Distinct course values; a filter keeps 1/num-courses of the docs'
+    )
+    parser.add_argument(
+        '--skip-appendable',
+        action='store_true',
+        help="Skip minsearch's AppendableIndex, whose fit is quadratic"
+    )
+    args = parser.parse_args()
+
+    docs = generate_docs(args.num_docs, args.num_courses)
+    rng = random.Random(2)
+    queries = [
+        " ".join(rng.choice(docs)["text"].split()[:rng.randint(2, 6)])
+        for _ in range(args.num_queries)
+    ]
+
+    indexes = {"minsearch Index": Index, "BM25Index": BM25Index}
+    if not args.skip_appendable:
+        indexes = {"minsearch AppendableIndex": AppendableIndex, **indexes}
+
+    print(f"{args.num_docs} docs, {args.num_queries} queries, filter keeps 1/{args.num_courses}")
+    for name, cls in indexes.items():
+        t0 = time.perf_counter()
+        index = cls(text_fields=TEXT_FIELDS, keyword_fields=KEYWORD_FIELDS)
+        index.fit(docs)
+        fit_s = time.perf_counter() - t0
+
+        print(f"{name:<26} fit {fit_s:>7.2f} s  search {run_benchmark(index, queries):>8.2f} ms/query")
+
+
+if __name__ == '__main__':
+    main_cli()
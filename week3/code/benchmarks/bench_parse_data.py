@@ -0,0 +1,100 @@
+"""
+Benchmark for parallel frontmatter parsing.
+
+Generates a synthetic corpus of markdown files with YAML frontmatter and
+reports how many files per second docs.parse_data handles at different
+worker counts, with and without the fast frontmatter parser.
+
+Usage:
+    uv run python -m benchmarks.bench_parse_data --files 5000
+    uv run python -m benchmarks.bench_parse_data --files 5000 --fast
+"""
+import argparse
+import random
+import time
+
+import docs
+
+
+def generate_corpus(num_files: int, seed: int = 1) -> list[docs.RawRepositoryFile]:
+    """
+    Generate markdown files with a realistic mix of frontmatter and body.
+
+    Args:
+        num_files: Number of files to generate
+        seed: Random seed so runs are comparable
+
+    Returns:
+        List of RawRepositoryFile objects
+    """
+    rng = random.Random(seed)
+    words = ["data", "drift", "model", "evaluation", "metric", "report",
+             "dataset", "column", "llm", "judge", "test", "preset"]
+
+    files = []
+    for i in range(num_files):
+        title = " ".join(rng.choices(words, k=4)).title()
+        tags = ", ".join(rng.choices(words, k=3))
+        body = "\n\n".join(
+            " ".join(rng.choices(words, k=80)) for _ in range(rng.randint(3, 15))
+        )
+        # most real pages have a flat header, some carry lists
+        header = (
+            f"title: {title}\n"
+            f"description: {' '.join(rng.choices(words, k=12))}\n"
+            "icon: chart-line\n"
+        )
+        if rng.random() < 0.2:
+            header += f"tags: [{tags}]\n"
+
+        content = f"---\n{header}---\n\n{body}"
+        files.append(docs.RawRepositoryFile(filename=f"docs/page_{i}.mdx", content=content))
+
+    return files
+
+
+def run_benchmark(
+        files: list[docs.RawRepositoryFile],
+        workers: int,
+        repeat: int,
+        fast: bool = False
+) -> float:
+    """
+    Parse the corpus and return the best files/second over the repeats.
+    """
+    best = 0.0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        docs.parse_data(files, workers=workers, fast=fast)
+        elapsed = time.perf_counter() - t0
+        best = max(best, len(files) / elapsed)
+    return best
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark docs.parse_data")
+    parser.add_argument('--files', type=int, default=5000, help='Number of synthetic files')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeats per worker count')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        nargs='+',
+        default=[1, 2, 4, 8],
+        help='Worker counts to benchmark'
+    )
+    parser.add_argument('--fast', action='store_true', help='Use the fast frontmatter parser')
+    args = parser.parse_args()
+
+    files = generate_corpus(args.files)
+    print(f"{len(files)} files")
+
+    baseline = None
+    for workers in args.workers:
+        rate = run_benchmark(files, workers, args.repeat, fast=args.fast)
+        if baseline is None:
+            baseline = rate
+        print(f"workers={workers:<3} {rate:>10.0f} files/s  {rate / baseline:>5.2f}x")
+
+
+if __name__ == '__main__':
+    main_cli()
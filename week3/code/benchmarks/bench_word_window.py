@@ -0,0 +1,96 @@
+"""
+Benchmark for word-window chunking of Wikipedia pages.
+
+Compares SearchTools._chunk_with_word_window against the previous
+split/join implementation on synthetic pages of 100KB to 1MB and checks
+that both produce the same chunks.
+
+Usage:
+    uv run python -m benchmarks.bench_word_window
+    uv run python -m benchmarks.bench_word_window --sizes 100000 1000000 --repeat 5
+"""
+import argparse
+import random
+import time
+
+from wikiagent.tools import SearchTools
+
+
+def chunk_with_split_join(data, chunk_size=200, overlap=50):
+    """The split/join implementation the slicing version replaced."""
+    title = data["title"]
+    words = data["content"].strip().split(" ")
+    chunks = []
+
+    start = 0
+    total_words = len(words)
+
+    while start < total_words:
+        end = start + chunk_size
+        chunks.append({
+            "title": title,
+            "content": " ".join(words[start:end])
+        })
+        start += chunk_size - overlap
+
+    return chunks
+
+
+def generate_page(num_chars: int, seed: int = 1) -> dict:
+    """
+    Generate a page of roughly num_chars characters of wiki-like prose.
+    """
+    rng = random.Random(seed)
+    words = ["capybara", "rodent", "the", "of", "South", "America", "water",
+             "grass", "is", "a", "semi-aquatic", "mammal", "(Hydrochoerus)"]
+
+    paragraphs = []
+    size = 0
+    while size < num_chars:
+        paragraph = " ".join(rng.choices(words, k=rng.randint(40, 200))) + "."
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 1
+
+    return {"title": "Capybara", "content": "\n".join(paragraphs)[:num_chars]}
+
+
+def run_benchmark(chunk, page: dict, repeat: int) -> float:
+    """
+    Chunk the page and return the best time in seconds over the repeats.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        chunk(page)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark word-window chunking")
+    parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='+',
+        default=[100_000, 250_000, 500_000, 1_000_000],
+        help='Page sizes in characters'
+    )
+    parser.add_argument('--repeat', type=int, default=5, help='Repeats per page size')
+    args = parser.parse_args()
+
+    search_tools = SearchTools(index=None)
+
+    for size in args.sizes:
+        page = generate_page(size)
+        assert search_tools._chunk_with_word_window(page) == chunk_with_split_join(page)
+
+        before = run_benchmark(chunk_with_split_join, page, args.repeat)
+        after = run_benchmark(search_tools._chunk_with_word_window, page, args.repeat)
+        print(
+            f"{size:>9} chars  split/join {before * 1000:>7.2f} ms  "
+            f"slicing {after * 1000:>7.2f} ms  {before / after:>5.2f}x"
+        )
+
+
+if __name__ == '__main__':
+    main_cli()
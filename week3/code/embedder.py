@@ -0,0 +1,307 @@
+"""
+Batched, cached text embeddings.
+
+Embedder wraps a sentence-transformers model for both chunk and query
+encoding:
+
+- texts missing from the cache are deduplicated, sorted by length and
+  encoded in batches, so a batch holds texts of similar length and pads
+  little
+- chunk embeddings are cached on disk by (model name, text hash), so an
+  index rebuild only encodes the chunks whose text changed
+- torch is pinned to num_threads, so encoding doesn't oversubscribe the
+  cores shared with the search thread pool and the agent
+
+The cache directory holds one subdirectory per model with append-only
+shards: <shard>.keys.npy (16-byte text digests) and <shard>.vectors.npy.
+A shard is only read once its keys file exists, and the keys file is
+written last, so concurrent writers and interrupted runs never expose a
+half-written shard. Once there are more than MAX_CACHE_SHARDS, the next
+cache to open merges them, holding compact.lock so only one process
+merges at a time. A reader that listed shards a merge then removed
+skips them and lists the directory again to pick up the merged shard.
+"""
+import os
+import sys
+import time
+import hashlib
+import threading
+from pathlib import Path
+from functools import lru_cache
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+import index_store
+
+
+DEFAULT_EMBEDDING_MODEL = "multi-qa-distilbert-cos-v1"
+DEFAULT_EMBEDDING_BATCH_SIZE = 64
+DEFAULT_EMBEDDING_CACHE_DIR = Path(".cache") / "embeddings"
+
+# CPU inference of a small model stops scaling well before this
+DEFAULT_NUM_THREADS = min(8, os.cpu_count() or 1)
+
+# shards are merged into one when a cache is opened with more than this
+MAX_CACHE_SHARDS = 32
+
+# a compact.lock older than this is left over from a crashed merge
+COMPACT_LOCK_STALE = 600
+
+
+@lru_cache(maxsize=None)
+def load_embedding_model(model_name: str = DEFAULT_EMBEDDING_MODEL):
+    """
+    Load a sentence-transformers model on CPU, once per process.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name, device="cpu")
+
+
+def set_num_threads(num_threads: int) -> None:
+    """
+    Limit torch to num_threads intra-op threads.
+
+    The limit is process-wide, so it's kept out of the cached loader and
+    only changed when it differs. torch is only imported by the model, so
+    if no model has loaded it there is nothing to limit.
+    """
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent text digest -> embedding store for one model.
+
+    Shards are memory-mapped; only the digests are read into memory.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._shards: List[np.ndarray] = []
+        self._rows: Dict[bytes, tuple] = {}
+        self._loaded = False
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._rows)
+
+    def _shard_names(self) -> List[str]:
+        return sorted(p.name[:-len(".keys.npy")] for p in self.path.glob("*.keys.npy"))
+
+    def _load(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            names = self._shard_names()
+            if len(names) > MAX_CACHE_SHARDS:
+                names = self._compact(names)
+
+            loaded = set()
+            for _ in range(2):
+                missing = False
+                for name in names:
+                    if name in loaded:
+                        continue
+                    shard = self._read_shard(name, mmap_mode="r")
+                    if shard is None:
+                        missing = True
+                        continue
+                    self._register(*shard)
+                    loaded.add(name)
+                if not missing:
+                    break
+                # merged away since listing, the merged shard is new
+                names = self._shard_names()
+            self._loaded = True
+
+    def _read_shard(self, name: str, mmap_mode: str | None = None):
+        """
+        The (keys, vectors) of a shard, or None if a merge removed it.
+        """
+        try:
+            return (
+                np.load(self.path / f"{name}.keys.npy"),
+                np.load(self.path / f"{name}.vectors.npy", mmap_mode=mmap_mode),
+            )
+        except FileNotFoundError:
+            return None
+
+    def _register(self, keys: np.ndarray, vectors: np.ndarray):
+        shard = len(self._shards)
+        self._shards.append(vectors)
+        for row, key in enumerate(keys):
+            self._rows[key.tobytes()] = (shard, row)
+
+    def _write_shard(self, keys: np.ndarray, vectors: np.ndarray) -> str:
+        self.path.mkdir(parents=True, exist_ok=True)
+        name = f"{time.time_ns()}-{os.getpid()}-{threading.get_ident()}"
+
+        for kind, values in (("vectors", vectors), ("keys", keys)):
+            tmp = self.path / f".{name}.{kind}.npy"
+            np.save(tmp, values)
+            os.replace(tmp, self.path / f"{name}.{kind}.npy")
+        return name
+
+    def _acquire_compact_lock(self) -> Path | None:
+        lock = self.path / "compact.lock"
+        try:
+            if time.time() - lock.stat().st_mtime > COMPACT_LOCK_STALE:
+                lock.unlink(missing_ok=True)
+        except FileNotFoundError:
+            pass
+
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return None
+        return lock
+
+    def _compact(self, names: List[str]) -> List[str]:
+        """
+        Merge the shards into one and return the shard names to load.
+        Another process already merging leaves the shards as they are.
+        """
+        lock = self._acquire_compact_lock()
+        if lock is None:
+            return names
+
+        try:
+            shards = [shard for shard in map(self._read_shard, names) if shard is not None]
+            if not shards:
+                return []
+            keys = np.concatenate([keys for keys, _ in shards])
+            vectors = np.concatenate([vectors for _, vectors in shards])
+
+            _, first = np.unique(keys, axis=0, return_index=True)
+            first.sort()
+            merged = self._write_shard(keys[first], vectors[first])
+
+            # keys first: a listed shard without keys is never read
+            for name in names:
+                for kind in ("keys", "vectors"):
+                    (self.path / f"{name}.{kind}.npy").unlink(missing_ok=True)
+        finally:
+            lock.unlink(missing_ok=True)
+        return [merged]
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        self._load()
+        found = {}
+        for key in keys:
+            location = self._rows.get(key)
+            if location is not None:
+                shard, row = location
+                found[key] = self._shards[shard][row]
+        return found
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray):
+        if not len(keys):
+            return
+        self._load()
+        key_array = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(len(keys), -1)
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        with self._lock:
+            self._write_shard(key_array, vectors)
+            self._register(key_array, vectors)
+
+
+class Embedder:
+    """
+    Encodes texts with a sentence-transformers model in length-sorted
+    batches, reusing cached embeddings for texts it has seen before.
+
+    Embeddings are float32 and L2-normalized.
+    """
+
+    def __init__(
+            self,
+            model_name: str = DEFAULT_EMBEDDING_MODEL,
+            batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+            cache_dir: str | Path | None = DEFAULT_EMBEDDING_CACHE_DIR,
+            num_threads: int = DEFAULT_NUM_THREADS
+    ):
+        """
+        Args:
+            model_name (str): sentence-transformers model to embed with.
+            batch_size (int): Texts encoded per forward pass.
+            cache_dir (str | Path, optional): Root of the persistent cache,
+                or None to always encode.
+            num_threads (int): torch threads used for encoding.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.cache = None
+        if cache_dir is not None:
+            self.cache = EmbeddingCache(Path(cache_dir) / index_store.cache_key({"model": model_name}))
+
+        self.encoded = 0
+        self.cache_hits = 0
+
+    @property
+    def model(self):
+        model = load_embedding_model(self.model_name)
+        set_num_threads(self.num_threads)
+        return model
+
+    def _encode_batches(self, texts: List[str]) -> np.ndarray:
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        model = self.model
+        vectors = None
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            embeddings = model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
+            if vectors is None:
+                vectors = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+            vectors[batch] = embeddings
+
+        self.encoded += len(texts)
+        return vectors
+
+    def encode(self, texts: Sequence[str], cache: bool = True) -> np.ndarray:
+        """
+        Embed texts, returning a (len(texts) x dim) float32 array.
+
+        Args:
+            texts: Texts to embed.
+            cache (bool): Look up and store embeddings in the persistent
+                cache. Queries are encoded with cache=False so one-off
+                texts don't grow it.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        if self.cache is None or not cache:
+            return self._encode_batches(texts)
+
+        keys = [text_key(text) for text in texts]
+        found = self.cache.get_many(keys)
+        self.cache_hits += sum(key in found for key in keys)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            vectors = self._encode_batches(list(missing.values()))
+            self.cache.put_many(list(missing), vectors)
+            found.update(zip(missing, vectors))
+
+        return np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
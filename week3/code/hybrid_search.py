@@ -0,0 +1,187 @@
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Sequence
+
+import docs
+import index_store
+import search_tools
+import vector_search
+
+from search_tools import SearchTools
+from vector_search import VectorSearchTools
+
+
+DEFAULT_RRF_K = 60
+
+# each retriever returns this many times top_k candidates for the fusion
+DEFAULT_CANDIDATE_FACTOR = 4
+
+
+def chunk_key(chunk: Dict[str, Any]) -> tuple:
+    """
+    Identify a chunk across retrievers by its repository, file, offset and
+    text; both indexes are built from the same chunking, so these agree.
+    """
+    return (chunk.get("repo"), chunk.get("filename"), chunk.get("start"), chunk.get("content"))
+
+
+def reciprocal_rank_fusion(
+        rankings: Iterable[Sequence[Dict[str, Any]]],
+        k: int = DEFAULT_RRF_K,
+        key: Callable[[Dict[str, Any]], Any] = chunk_key
+) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists with reciprocal rank fusion.
+
+    Every result scores sum(1 / (k + rank)) over the lists it appears in,
+    with ranks starting at 1. Results only need to agree on key, not on
+    their scores, which makes RRF suitable for mixing TF-IDF and embedding
+    similarities.
+
+    Returns:
+        list: Results ordered by fused score; ties keep first-seen order
+    """
+    scores = {}
+    results = {}
+
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            result_key = key(result)
+            scores[result_key] = scores.get(result_key, 0.0) + 1.0 / (k + rank)
+            results.setdefault(result_key, result)
+
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [results[result_key] for result_key in ordered]
+
+
+class HybridIndex:
+    """
+    Runs a lexical and a vector index side by side and fuses their rankings.
+
+    Both retrievers are queried concurrently in a thread pool, so a hybrid
+    search takes about as long as the slower of the two.
+    """
+
+    def __init__(
+            self,
+            lexical,
+            vector: vector_search.VectorIndex,
+            rrf_k: int = DEFAULT_RRF_K,
+            candidate_factor: int = DEFAULT_CANDIDATE_FACTOR
+    ):
+        self.lexical = lexical
+        self.vector = vector
+        self.rrf_k = rrf_k
+        self.candidate_factor = candidate_factor
+        self._executor = None
+
+    @property
+    def docs(self):
+        return self.lexical.docs
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hybrid-search")
+        return self._executor
+
+    def search(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
+        num_candidates = num_results * self.candidate_factor
+
+        lexical = self.executor.submit(
+            self.lexical.search, query=query, num_results=num_candidates
+        )
+        vector = self.executor.submit(
+            self.vector.search, query, num_results=num_candidates
+        )
+
+        fused = reciprocal_rank_fusion([lexical.result(), vector.result()], k=self.rrf_k)
+        return fused[:num_results]
+
+    def search_many(self, queries: List[str], num_results: int = 10) -> List[List[Dict[str, Any]]]:
+        num_candidates = num_results * self.candidate_factor
+
+        lexical = self.executor.submit(
+            search_tools.batch_search, self.lexical, queries, num_candidates
+        )
+        vector = self.executor.submit(
+            self.vector.search_many, queries, num_results=num_candidates
+        )
+
+        return [
+            reciprocal_rank_fusion([lexical_results, vector_results], k=self.rrf_k)[:num_results]
+            for lexical_results, vector_results in zip(lexical.result(), vector.result())
+        ]
+
+
+class HybridSearchTools(SearchTools):
+    """
+    SearchTools over a HybridIndex: TF-IDF and embedding retrieval fused
+    with reciprocal rank fusion, with the same tools and result dicts.
+    """
+
+    def __init__(
+            self,
+            lexical: SearchTools,
+            vector: VectorSearchTools,
+            top_k: int,
+            rrf_k: int = DEFAULT_RRF_K
+    ):
+        super().__init__(
+            index=HybridIndex(lexical.index, vector.index, rrf_k=rrf_k),
+            file_index=lexical.file_index,
+            top_k=top_k,
+            state=lexical.state
+        )
+        self.lexical = lexical
+        self.vector = vector
+
+    def refresh(self, raw_files: Iterable[docs.RawRepositoryFile]) -> docs.ManifestDiff:
+        raw_files = list(raw_files)
+        diff = self.lexical.refresh(raw_files)
+        self.vector.refresh(raw_files)
+
+        if diff:
+            self.index = HybridIndex(
+                self.lexical.index, self.vector.index, rrf_k=self.index.rrf_k
+            )
+            self.file_index = self.lexical.file_index
+            self.state = self.lexical.state
+        return diff
+
+    def _batch_search(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        return self.index.search_many(queries, num_results=self.top_k)
+
+
+def prepare_hybrid_search_tools(
+        chunk_size: int,
+        chunk_step: int,
+        top_k: int,
+        refresh: bool = False,
+        chunking: str = "sliding_window",
+        model_name: str = vector_search.DEFAULT_EMBEDDING_MODEL,
+        n_lists: int | None = None,
+        n_probe: int = vector_search.DEFAULT_N_PROBE,
+        rrf_k: int = DEFAULT_RRF_K,
+        cache_dir: Path = index_store.DEFAULT_CACHE_DIR,
+        embedding_cache_dir: Path | None = vector_search.DEFAULT_EMBEDDING_CACHE_DIR
+) -> HybridSearchTools:
+    """
+    Return hybrid search tools; the TF-IDF and vector indexes are cached
+    separately by prepare_search_tools and prepare_vector_search_tools,
+    and share one DocsSource, so the docs are extracted at most once.
+    """
+    source = search_tools.DocsSource(refresh)
+
+    lexical = search_tools.prepare_search_tools(
+        chunk_size, chunk_step, top_k,
+        chunking=chunking, cache_dir=cache_dir, source=source
+    )
+    vector = vector_search.prepare_vector_search_tools(
+        chunk_size, chunk_step, top_k,
+        chunking=chunking, model_name=model_name,
+        n_lists=n_lists, n_probe=n_probe,
+        cache_dir=cache_dir, embedding_cache_dir=embedding_cache_dir,
+        source=source
+    )
+    return HybridSearchTools(lexical, vector, top_k=top_k, rrf_k=rrf_k)
@@ -4,6 +4,8 @@ from pydantic_ai.messages import FunctionToolCallEvent
 from pydantic_ai.messages import ModelMessage, UserPromptPart
 
 import search_tools
+import vector_search
+import hybrid_search
 from dotenv import load_dotenv
 load_dotenv()
 from pydantic import BaseModel
@@ -14,7 +16,20 @@ from dataclasses import dataclass
 class AgentConfig:
     chunk_size: int = 2000
     chunk_step: int = 1000
+    # "sliding_window", "tokens" (chunk_size/chunk_step counted in tokens)
+    # or "markdown" (structure-aware, ignores chunk_step)
+    chunking: str = "sliding_window"
     top_k: int = 5
+    # "tfidf" (minsearch), "vector" (sentence-transformers embeddings)
+    # or "hybrid" (both, fused with reciprocal rank fusion)
+    search_backend: str = "tfidf"
+    embedding_model: str = vector_search.DEFAULT_EMBEDDING_MODEL
+    # IVF clusters for approximate vector search (None searches exactly)
+    # and how many of them each query scores
+    ann_lists: int | None = None
+    ann_probe: int = vector_search.DEFAULT_N_PROBE
+    # revalidate the docs archive now instead of trusting the local copy
+    refresh_index: bool = False
 
     model: str = "openai:gpt-4o-mini"
 
@@ -61,6 +76,8 @@ Requirements:
 - For each section, include references listing all the sources
     you used to write that section.
 - Do not perform more than 6 searches per query.
+- To run several searches at once, pass all the queries to search_many;
+    each query counts as one search.
 """.strip()
 
 
@@ -71,6 +88,9 @@ def force_answer_after_6_searches(messages: list[ModelMessage]) -> list[ModelMes
         for p in m.parts:
             if p.part_kind == 'tool-call' and p.tool_name == 'search':
                 num_tool_calls = num_tool_calls + 1
+            elif p.part_kind == 'tool-call' and p.tool_name == 'search_many':
+                # every query of a batched search counts as a search
+                num_tool_calls = num_tool_calls + len(p.args_as_dict().get('queries', []))
 
     if num_tool_calls >= 6:
         print('forcing output')
@@ -87,16 +107,41 @@ def create_agent(config: AgentConfig = None) -> Agent:
     if config is None:
         config = AgentConfig()
 
-    tools = search_tools.prepare_search_tools(
-        config.chunk_size,
-        config.chunk_step,
-        config.top_k
-    )
+    if config.search_backend == "hybrid":
+        tools = hybrid_search.prepare_hybrid_search_tools(
+            config.chunk_size,
+            config.chunk_step,
+            config.top_k,
+            refresh=config.refresh_index,
+            chunking=config.chunking,
+            model_name=config.embedding_model,
+            n_lists=config.ann_lists,
+            n_probe=config.ann_probe
+        )
+    elif config.search_backend == "vector":
+        tools = vector_search.prepare_vector_search_tools(
+            config.chunk_size,
+            config.chunk_step,
+            config.top_k,
+            refresh=config.refresh_index,
+            chunking=config.chunking,
+            model_name=config.embedding_model,
+            n_lists=config.ann_lists,
+            n_probe=config.ann_probe
+        )
+    else:
+        tools = search_tools.prepare_search_tools(
+            config.chunk_size,
+            config.chunk_step,
+            config.top_k,
+            refresh=config.refresh_index,
+            chunking=config.chunking
+        )
 
     agent = Agent(
         name="search",
         instructions=search_instructions,
-        tools=[tools.search, tools.read_file],
+        tools=[tools.search, tools.search_many, tools.read_file],
         model=config.model,
         output_type=SearchResultArticle,
         history_processors=[force_answer_after_6_searches]
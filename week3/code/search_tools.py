@@ -1,19 +1,192 @@
-import pickle
+import threading
 
 from pathlib import Path
-from typing import Any, Dict, List
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List
+from collections.abc import Sequence
+
+import numpy as np
 
 from minsearch import Index
 
 import docs
+import index_store
+
+
+TEXT_FIELDS = ["title", "description", "content"]
+
+DEFAULT_QUERY_CACHE_SIZE = 1024
+
+
+@dataclass
+class IndexState:
+    """
+    Per-file ingestion state kept alongside the search index.
+
+    Stores the manifest (file key -> CRC32, see docs.file_key) of the
+    indexed files together with their parsed documents, keyed the same
+    way, so a refresh only re-parses the files
+    that were added or modified. Chunks are not stored: they are cheap
+    offsets into the document texts and are recomputed by all_chunks.
+    """
+    chunk_size: int
+    chunk_step: int
+    chunking: str = "sliding_window"
+    manifest: dict[str, int] = field(default_factory=dict)
+    documents: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    def update(self, raw_files: Iterable[docs.RawRepositoryFile]) -> docs.ManifestDiff:
+        """
+        Bring the state in line with the given repository files.
+
+        Args:
+            raw_files: All files currently in the repository
+
+        Returns:
+            ManifestDiff describing what changed since the last update
+        """
+        if not isinstance(self.documents, dict):
+            # documents of a loaded store are a read-only view
+            self.documents = dict(self.documents)
+
+        manifest = {}
+        changed_files = []
+
+        for f in raw_files:
+            key = docs.file_key(f.filename, f.repo)
+            checksum = docs.file_checksum(f)
+            manifest[key] = checksum
+            if self.manifest.get(key) != checksum:
+                changed_files.append(f)
+
+        diff = docs.diff_manifest(self.manifest, manifest)
+
+        for key in diff.deleted:
+            self.documents.pop(key, None)
+
+        for doc in docs.parse_data(changed_files):
+            self.documents[docs.document_key(doc)] = doc
+
+        self.manifest = manifest
+        return diff
 
+    def all_chunks(self) -> Sequence[dict[str, Any]]:
+        return chunk_documents(
+            self.documents.values(),
+            chunk_size=self.chunk_size,
+            chunk_step=self.chunk_step,
+            chunking=self.chunking,
+        )
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for cache lookups: 'Data  Drift ' and 'data drift'
+    map to the same key.
+    """
+    return " ".join(query.split()).casefold()
+
+
+def _freeze(params: Dict[str, Any] | None):
+    if not params:
+        return None
+    return tuple(sorted(params.items()))
+
+
+class QueryCache:
+    """
+    In-memory LRU cache of search results.
+
+    Keys cover everything that affects the results: the normalized query,
+    filters, boosts and number of results. Entries are tied to one index;
+    bind() drops them when the index is replaced. Hits and misses are
+    counted for monitoring.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._index = None
+        # tools may be called from pydantic-ai's worker threads
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(
+            query: str,
+            filter_dict: Dict[str, Any] | None = None,
+            boost_dict: Dict[str, float] | None = None,
+            num_results: int | None = None
+    ) -> tuple:
+        return (normalize_query(query), _freeze(filter_dict), _freeze(boost_dict), num_results)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def __len__(self):
+        return len(self._entries)
+
+    def bind(self, index) -> None:
+        """
+        Make sure the cached results belong to index, clearing them if not.
+        """
+        with self._lock:
+            if self._index is not index:
+                self._entries.clear()
+                self._index = index
+
+    def get(self, key: tuple) -> List[Dict[str, Any]] | None:
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # copies, so callers can't modify the cached results
+        return [dict(r) for r in results]
+
+    def set(self, key: tuple, results: List[Dict[str, Any]]) -> None:
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = [dict(r) for r in results]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
 
 
 class SearchTools:
-    def __init__(self, index: Index, file_index: dict[str, Any], top_k: int):
+    def __init__(
+            self,
+            index: Index,
+            file_index: dict[str, Any],
+            top_k: int,
+            state: IndexState | None = None,
+            cache_size: int = DEFAULT_QUERY_CACHE_SIZE
+    ):
         self.index = index
         self.file_index = file_index
         self.top_k = top_k
+        self.state = state
+        # hits still go through search(), so the agent sees (and counts)
+        # a normal tool call either way
+        self.cache = QueryCache(max_size=cache_size)
 
     def search(self, query: str) -> List[Dict[str, Any]]:
         """
@@ -25,26 +198,105 @@ class SearchTools:
         Returns:
             A list of search results
         """
-        return self.index.search(
+        self.cache.bind(self.index)
+        key = self.cache.key(query, num_results=self.top_k)
+
+        results = self.cache.get(key)
+        if results is not None:
+            return results
+
+        results = self.index.search(
             query=query,
-            num_results=5,
+            num_results=self.top_k,
         )
+        # chunk content is only materialized for the results we return
+        results = [dict(r) for r in results]
+        self.cache.set(key, results)
+        return results
+
+    def search_many(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        Run several searches in one call, e.g. different phrasings of the
+        same question. Each query counts as one search.
+
+        Args:
+            queries (List[str]): The search query strings.
+
+        Returns:
+            A list with the search results for each query, in order
+        """
+        self.cache.bind(self.index)
+        keys = [self.cache.key(query, num_results=self.top_k) for query in queries]
+        results = [self.cache.get(key) for key in keys]
 
-    def read_file(self, filename: str) -> str:
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            found = self._batch_search([queries[i] for i in missing])
+            for i, query_results in zip(missing, found):
+                results[i] = [dict(r) for r in query_results]
+                self.cache.set(keys[i], results[i])
+
+        return results
+
+    def read_file(self, filename: str, repo: str | None = None) -> str:
         """
         Retrieve the contents of a file from the file index if it exists.
 
         Args:
             filename (str): The name of the file to read.
+            repo (str, optional): The repository of the file ('owner/name'),
+                as in the search results. Only needed when several
+                repositories have a file with this name.
 
         Returns:
             str: The file's contents if found, otherwise an error message
-            indicating that the file does not exist.
+            indicating that the file does not exist or is ambiguous.
         """
-        if filename in self.file_index:
-            return self.file_index[filename]
+        key = docs.file_key(filename, repo)
+        if key in self.file_index:
+            return self.file_index[key]
+
+        if repo is None:
+            # file keys are 'owner/name/' + filename
+            suffix = "/" + filename
+            keys = [
+                k for k in self.file_index
+                if k.endswith(suffix) and k[:-len(suffix)].count("/") == 1
+            ]
+            if len(keys) == 1:
+                return self.file_index[keys[0]]
+            if keys:
+                return f"Several repositories have {filename}, pass repo as one of: " + ", ".join(
+                    k[:-len(suffix)] for k in keys
+                )
         return "File doesn't exist"
-    
+
+    def refresh(self, raw_files: Iterable[docs.RawRepositoryFile]) -> docs.ManifestDiff:
+        """
+        Re-ingest only the files that changed since the index was built.
+
+        Added and modified files are parsed again, deleted files are
+        dropped, and the index is refit from the cached documents.
+
+        Args:
+            raw_files: All files currently in the repository
+
+        Returns:
+            ManifestDiff describing what changed
+        """
+        diff = self.state.update(raw_files)
+        if not diff:
+            return diff
+
+        self.index = self._build_index(self.state.all_chunks())
+        self.file_index = prepare_file_index(self.state.documents.values())
+        return diff
+
+    def _build_index(self, chunks):
+        return build_search_index(chunks)
+
+    def _batch_search(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        return batch_search(self.index, queries, num_results=self.top_k)
 
 
 def load_data():
@@ -53,42 +305,123 @@ def load_data():
     return parsed_data
 
 
-def prepare_search_index(parsed_data, chunk_size: int, chunk_step: int):
-    chunks = docs.chunk_documents(parsed_data, size=chunk_size, step=chunk_step)
+def build_search_index(chunks):
+    index = Index(text_fields=TEXT_FIELDS)
 
-    index = Index(text_fields=["title", "description", "content"])
+    # Index.fit needs random access, so streamed chunks are collected here
+    if not isinstance(chunks, Sequence):
+        chunks = list(chunks)
 
     index.fit(chunks)
     return index
 
 
+def batch_search(
+        index: Index,
+        queries: List[str],
+        num_results: int,
+        boost_dict: Dict[str, float] | None = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    Run several queries against a minsearch Index at once.
+
+    Returns the same results as calling index.search for every query, but
+    each text field is scored with one sparse product of the (queries x
+    terms) and (docs x terms) TF-IDF matrices instead of a cosine_similarity
+    call per query. The vectorizer L2-normalizes both sides, so the product
+    is the cosine similarity.
+    """
+    if not queries or not len(index.docs):
+        return [[] for _ in queries]
+
+    if boost_dict is None:
+        boost_dict = {}
+
+    scores = np.zeros((len(queries), len(index.docs)))
+    for field in index.text_fields:
+        query_vecs = index.vectorizers[field].transform(queries)
+        sim = query_vecs @ index.text_matrices[field].T
+        scores += sim.toarray() * boost_dict.get(field, 1)
+
+    results = []
+    for row in scores:
+        candidates = np.flatnonzero(row > 0)
+        if len(candidates) > num_results:
+            top = np.argpartition(-row[candidates], num_results - 1)[:num_results]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-row[candidates], kind="stable")]
+        results.append([index.docs[i] for i in candidates])
+
+    return results
+
+
+def chunk_documents(
+        parsed_data,
+        chunk_size: int,
+        chunk_step: int,
+        chunking: str = "sliding_window"
+) -> Sequence[dict[str, Any]]:
+    """
+    Chunk parsed documents with the selected strategy.
+
+    "sliding_window" cuts overlapping character windows of chunk_size every
+    chunk_step characters; "tokens" does the same counting tokens instead
+    of characters and adds num_tokens to every chunk; "markdown" splits on
+    headings, paragraphs and code blocks and packs them up to chunk_size
+    (chunk_step is unused).
+    """
+    if chunking == "sliding_window":
+        return docs.ChunkStore.from_documents(parsed_data, size=chunk_size, step=chunk_step)
+    if chunking == "tokens":
+        return docs.chunk_token_documents(parsed_data, size=chunk_size, step=chunk_step)
+    if chunking == "markdown":
+        return docs.chunk_markdown_documents(parsed_data, size=chunk_size)
+    raise ValueError(f"Unknown chunking strategy: {chunking}")
+
+
+def prepare_search_index(
+        parsed_data,
+        chunk_size: int,
+        chunk_step: int,
+        chunking: str = "sliding_window"
+):
+    chunks = chunk_documents(parsed_data, chunk_size, chunk_step, chunking=chunking)
+    return build_search_index(chunks)
+
+
 def prepare_file_index(parsed_data):
     file_index = {}
 
     for item in parsed_data:
-        filename = item["filename"]
         content = item["content"]
-        file_index[filename] = content
+        file_index[docs.document_key(item)] = content
 
     return file_index
 
 
 
-def _prepare_search_tools(chunk_size: int, chunk_step: int, top_k: int):
-    parsed_data = load_data()
+def _prepare_search_tools(
+        raw_files: Iterable[docs.RawRepositoryFile] | None = None,
+        chunk_size: int = 2000,
+        chunk_step: int = 1000,
+        top_k: int = 5,
+        chunking: str = "sliding_window"
+):
+    if raw_files is None:
+        raw_files = docs.read_github_data()
 
-    search_index = prepare_search_index(
-        parsed_data=parsed_data,
-        chunk_size=chunk_size,
-        chunk_step=chunk_step
-    )
+    state = IndexState(chunk_size=chunk_size, chunk_step=chunk_step, chunking=chunking)
+    state.update(raw_files)
+
+    search_index = build_search_index(state.all_chunks())
 
-    file_index = prepare_file_index(parsed_data=parsed_data)
+    file_index = prepare_file_index(parsed_data=state.documents.values())
 
     return SearchTools(
         index=search_index,
         file_index=file_index,
-        top_k=top_k
+        top_k=top_k,
+        state=state
     )
 
 
@@ -98,27 +431,217 @@ def _prepare_search_tools(chunk_size: int, chunk_step: int, top_k: int):
 #     return SearchTools(index=index)
 
 
-def prepare_search_tools(chunk_size: int, chunk_step: int, top_k: int):
-    cache_dir = Path(".cache")
-    cache_dir.mkdir(exist_ok=True)
+def index_config(chunk_size: int, chunk_step: int, chunking: str) -> dict[str, Any]:
+    """
+    Everything besides the sources that determines the built index.
+    """
+    config = {
+        "chunking": chunking,
+        "chunk_size": chunk_size,
+        "chunk_step": chunk_step,
+        "text_fields": TEXT_FIELDS,
+        "keyword_fields": [],
+        **index_store.library_versions(),
+    }
+    if chunking == "tokens":
+        config.update(docs.tokenizer_config())
+    return config
+
+
+def save_search_tools(
+        search_tools: SearchTools,
+        path: Path,
+        config_hash: str | None = None,
+        arrays: Dict[str, np.ndarray] | None = None
+) -> Path:
+    state = search_tools.state
+    params = {
+        "chunk_size": state.chunk_size,
+        "chunk_step": state.chunk_step,
+        "chunking": state.chunking,
+        "top_k": search_tools.top_k,
+    }
+    return index_store.save_search_tools(
+        search_tools,
+        path,
+        source_hash=index_store.manifest_hash(state.manifest),
+        config_hash=config_hash,
+        params=params,
+        arrays=arrays,
+    )
+
+
+def read_store_header(path: Path) -> Dict[str, Any] | None:
+    """
+    Return the header of the store at path if it can be loaded.
 
-    cache_file = cache_dir / f"search_tools_{chunk_size}_{chunk_step}_{top_k}.bin"
+    Returns None when there is no complete store at path or it was written
+    with a different schema version, so the caller rebuilds it.
+    """
+    header = index_store.read_header(path)
+    if header is None:
+        return None
 
-    if cache_file.exists():
-        with open(cache_file, "rb") as f:
-            search_tools = pickle.load(f)
-            return search_tools
+    if header["schema_version"] != index_store.SCHEMA_VERSION:
+        print(
+            f"index cache {path} has schema version {header['schema_version']}, "
+            f"expected {index_store.SCHEMA_VERSION}; rebuilding"
+        )
+        return None
+
+    return header
+
+
+def load_state(path: Path, header: Dict[str, Any], metadata: Dict[str, Any]) -> IndexState:
+    params = header["params"]
+    return IndexState(
+        chunk_size=params["chunk_size"],
+        chunk_step=params["chunk_step"],
+        chunking=params["chunking"],
+        manifest=metadata["manifest"],
+        documents=index_store.load_documents(path, metadata),
+    )
 
-    search_tools = _prepare_search_tools(
-        chunk_size=chunk_size, chunk_step=chunk_step, top_k=top_k
+
+def load_search_tools(path: Path, top_k: int | None = None) -> SearchTools | None:
+    """
+    Open a store written by save_search_tools, or return None if there's
+    no usable store at path.
+    """
+    header = read_store_header(path)
+    if header is None:
+        return None
+
+    index, metadata = index_store.load_index(path, header)
+    state = load_state(path, header, metadata)
+    index_store.mark_used(path)
+
+    return SearchTools(
+        index=index,
+        file_index=index_store.StoredFileIndex(state.documents),
+        top_k=header["params"]["top_k"] if top_k is None else top_k,
+        state=state
     )
 
-    with open(cache_file, "wb") as f:
-        pickle.dump(search_tools, f)
+
+class DocsSource:
+    """
+    The current docs, as seen by prepare_cached.
+
+    The manifest is read from the zip entries of the docs archive, which
+    is enough to find a matching store; the files themselves are only
+    extracted when an index has to be built or refreshed, and at most once
+    per source, so indexes prepared from the same source share them.
+    """
+
+    def __init__(self, refresh: bool = False):
+        """
+        Args:
+            refresh: Revalidate the downloaded docs archive now instead of
+                trusting it for docs.DEFAULT_CACHE_TTL
+        """
+        cache_ttl = 0 if refresh else docs.DEFAULT_CACHE_TTL
+        self.manifest = docs.read_github_manifest(cache_ttl=cache_ttl)
+        self._raw_files = None
+
+    @property
+    def raw_files(self) -> List[docs.RawRepositoryFile]:
+        if self._raw_files is None:
+            # reading the manifest just (re)validated the archive
+            self._raw_files = docs.read_github_data()
+        return self._raw_files
+
+
+def prepare_cached(
+        config: Dict[str, Any],
+        load: Callable[[Path], SearchTools | None],
+        build: Callable[[List[docs.RawRepositoryFile]], SearchTools],
+        save: Callable[[SearchTools, Path, str], Path],
+        refresh: bool = False,
+        cache_dir: Path = index_store.DEFAULT_CACHE_DIR,
+        source: DocsSource | None = None
+) -> SearchTools:
+    """
+    Load search tools for the current docs from the cache, or build them.
+
+    The cache key is a digest of the source manifest and config, so any
+    change to the docs or the index setup gets a new store. When the docs
+    changed, the latest store with the same config is refreshed
+    incrementally instead of rebuilding everything. The docs are only
+    extracted and parsed when no store matches.
+
+    Args:
+        config: Everything besides the sources that determines the index
+        load: Opens a store, returns None if it can't
+        build: Builds search tools from scratch from the raw files
+        save: Writes search tools to a store, given the config hash
+        refresh: Revalidate the downloaded docs archive now instead of
+            trusting it for docs.DEFAULT_CACHE_TTL
+        cache_dir: Store directory
+        source: Docs to index; defaults to a new DocsSource(refresh)
+    """
+    if source is None:
+        source = DocsSource(refresh)
+
+    config_hash = index_store.cache_key(config)
+    store_path = Path(cache_dir) / index_store.cache_key({
+        "config": config_hash,
+        "sources": index_store.manifest_hash(source.manifest),
+    })
+
+    search_tools = load(store_path)
+    if search_tools is not None:
+        return search_tools
+
+    raw_files = source.raw_files
+
+    previous = index_store.find_latest(cache_dir, config_hash)
+    if previous is not None:
+        search_tools = load(previous)
+
+    if search_tools is not None:
+        diff = search_tools.refresh(raw_files)
+        print(
+            f"refreshed index: {len(diff.added)} added, "
+            f"{len(diff.modified)} modified, {len(diff.deleted)} deleted"
+        )
+    else:
+        search_tools = build(raw_files)
+
+    save(search_tools, store_path, config_hash)
 
     return search_tools
 
 
+def prepare_search_tools(
+        chunk_size: int,
+        chunk_step: int,
+        top_k: int,
+        refresh: bool = False,
+        chunking: str = "sliding_window",
+        cache_dir: Path = index_store.DEFAULT_CACHE_DIR,
+        source: DocsSource | None = None
+):
+    """
+    Return TF-IDF search tools for the current docs, see prepare_cached.
+    """
+    return prepare_cached(
+        config=index_config(chunk_size, chunk_step, chunking),
+        load=partial(load_search_tools, top_k=top_k),
+        build=partial(
+            _prepare_search_tools,
+            chunk_size=chunk_size,
+            chunk_step=chunk_step,
+            top_k=top_k,
+            chunking=chunking,
+        ),
+        save=save_search_tools,
+        refresh=refresh,
+        cache_dir=cache_dir,
+        source=source,
+    )
+
+
 if __name__ == "__main__":
     search_tools = prepare_search_tools()
     results = search_tools.search("data drift")
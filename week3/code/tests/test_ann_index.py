@@ -0,0 +1,97 @@
+import numpy as np
+
+import embedder
+import vector_search
+
+from ann_index import IVFIndex, top_k_indices
+from tests.test_search_tools import install_docs, make_file
+from tests.test_vector_search import BagOfWordsModel, FILES
+
+
+def clustered_vectors(n, dim=32, num_topics=20, seed=0):
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((num_topics, dim))
+    vectors = topics[rng.integers(num_topics, size=n)] + 0.2 * rng.standard_normal((n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_search(vectors, queries, k):
+    return [top_k_indices(row, k) for row in queries @ vectors.T]
+
+
+def recall(approximate, exact):
+    return np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approximate, exact)])
+
+
+def test_ivf_recall_improves_with_n_probe():
+    vectors = clustered_vectors(2000)
+    queries = vectors[:50]
+    index = IVFIndex(n_lists=16)
+    index.add(vectors)
+    exact = exact_search(vectors, queries, 10)
+
+    assert index.is_trained
+    assert recall(index.search(queries, 10, n_probe=16), exact) == 1.0
+    assert recall(index.search(queries, 10, n_probe=1), exact) > 0.5
+
+
+def test_ivf_incremental_inserts_and_persistence(tmp_path):
+    vectors = clustered_vectors(300)
+    index = IVFIndex(n_lists=4, n_probe=4, train_size=100)
+
+    index.add(vectors[:50])
+    assert not index.is_trained, "Expected exact search until train_size vectors"
+    assert index.search(vectors[:1], 1)[0].tolist() == [0]
+
+    for start in range(50, 300, 50):
+        assert index.add(vectors[start:start + 50]) == range(start, start + 50)
+    assert index.is_trained
+    assert len(index) == 300
+
+    loaded = IVFIndex.load(index.save(tmp_path / "ivf"))
+    assert isinstance(loaded.vectors, np.memmap)
+    assert [ids.tolist() for ids in loaded.search(vectors[:5], 3)] == [
+        ids.tolist() for ids in index.search(vectors[:5], 3)
+    ]
+
+    loaded.add(vectors[:1])
+    assert loaded.search(vectors[:1], 2)[0].tolist() in ([0, 300], [300, 0])
+
+
+def test_vector_search_tools_with_ivf(monkeypatch, tmp_path):
+    monkeypatch.setattr(embedder, "load_embedding_model", lambda name: BagOfWordsModel())
+    files = FILES + [
+        make_file(f"page{i}.md", f"Page {i}", f"filler text number {i}") for i in range(20)
+    ]
+    install_docs(monkeypatch, files)
+
+    prepare = lambda: vector_search.prepare_vector_search_tools(
+        2000, 1000, 2, n_lists=2, n_probe=2, cache_dir=tmp_path,
+        embedding_cache_dir=tmp_path / "embeddings"
+    )
+    tools = prepare()
+    assert tools.index.ann.is_trained
+    assert tools.search("llm judge")[0]["filename"] == "llm.md"
+
+    loaded = prepare()
+    assert loaded.index.ann.is_trained
+    assert loaded.search("llm judge") == tools.search("llm judge")
+
+    loaded.index.add([{"filename": "new.md", "title": "Monitoring", "content": "monitoring dashboards"}])
+    assert loaded.index.search("monitoring dashboards", 1)[0]["filename"] == "new.md"
+
+
+def test_select_keeps_rows_without_retraining():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(100, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index = IVFIndex(n_lists=4, n_probe=4)
+    index.add(vectors)
+    keep = np.arange(100) % 3 != 0
+
+    selected = index.select(keep)
+
+    assert selected.centroids is index.centroids
+    assert np.array_equal(selected.vectors, vectors[keep])
+    assert selected.search(vectors[1:2], 1)[0].tolist() == [0]
@@ -0,0 +1,392 @@
+import io
+import re
+import zipfile
+
+import pytest
+
+import docs
+
+
+class FakeResponse:
+
+    def __init__(self, content: bytes, status_code: int = 200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def make_zip(files: dict[str, str], commit: str = "") -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.comment = commit.encode()
+        for filename, content in files.items():
+            zf.writestr(f"docs-main/{filename}", content)
+    return buffer.getvalue()
+
+
+def install_fake_download(monkeypatch, files: dict[str, str]):
+    archive = make_zip(files)
+    monkeypatch.setattr(
+        docs.requests, "get",
+        lambda url, **kwargs: FakeResponse(archive)
+    )
+
+
+def test_iter_files_streams_matching_files(monkeypatch):
+    install_fake_download(monkeypatch, {
+        "index.md": "# Index",
+        "guide/setup.mdx": "---\ntitle: Setup\n---\nbody",
+        "images/logo.png": "binary",
+        ".hidden.md": "hidden",
+    })
+    monkeypatch.setattr(docs, "DOWNLOAD_CHUNK_SIZE", 7)
+
+    reader = docs.GithubRepositoryDataReader(
+        "evidentlyai", "docs", allowed_extensions={"md", "mdx"}
+    )
+    files = reader.iter_files()
+
+    assert not isinstance(files, list), "Expected a lazy iterator"
+
+    filenames = [f.filename for f in files]
+    assert filenames == ["index.md", "guide/setup.mdx"]
+
+
+def test_read_without_extension_filter(monkeypatch):
+    install_fake_download(monkeypatch, {"a.md": "a", "b.py": "b"})
+
+    reader = docs.GithubRepositoryDataReader("evidentlyai", "docs")
+    files = reader.read()
+
+    assert [f.content for f in files] == ["a", "b"]
+
+
+class FakeCodeload:
+
+    def __init__(self, files: dict[str, str], etag: str = '"v1"'):
+        self.archive = make_zip(files)
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append(headers)
+        if headers.get("If-None-Match") == self.etag:
+            return FakeResponse(b"", status_code=304)
+        return FakeResponse(self.archive, headers={"ETag": self.etag})
+
+
+def test_archive_cache_serves_fresh_entries_locally(monkeypatch, tmp_path):
+    codeload = FakeCodeload({"a.md": "a"})
+    monkeypatch.setattr(docs.requests, "get", codeload.get)
+
+    cache = docs.RepositoryArchiveCache(tmp_path, ttl=3600)
+    reader = docs.GithubRepositoryDataReader("evidentlyai", "docs", cache=cache)
+
+    assert [f.content for f in reader.read()] == ["a"]
+    assert [f.content for f in reader.read()] == ["a"]
+    assert len(codeload.requests) == 1, "Expected the second read to hit the cache"
+
+
+def test_archive_cache_revalidates_stale_entries(monkeypatch, tmp_path):
+    codeload = FakeCodeload({"a.md": "a"})
+    monkeypatch.setattr(docs.requests, "get", codeload.get)
+
+    cache = docs.RepositoryArchiveCache(tmp_path, ttl=0)
+    reader = docs.GithubRepositoryDataReader("evidentlyai", "docs", cache=cache)
+    reader.read()
+    reader.read()
+
+    assert codeload.requests[1] == {"If-None-Match": '"v1"'}
+
+    codeload.archive = make_zip({"a.md": "changed"})
+    codeload.etag = '"v2"'
+
+    assert [f.content for f in reader.read()] == ["changed"]
+    assert len(list((tmp_path / "blobs").glob("*.zip"))) == 1, "Expected the replaced blob to be deleted"
+    assert [p.name for p in (tmp_path / "refs" / "evidentlyai" / "docs").iterdir()] == ["main.json"]
+
+
+def test_archive_cache_keeps_blobs_other_refs_point_to(monkeypatch, tmp_path):
+    codeload = FakeCodeload({"a.md": "a"})
+    monkeypatch.setattr(docs.requests, "get", codeload.get)
+
+    cache = docs.RepositoryArchiveCache(tmp_path, ttl=0)
+    main = docs.GithubRepositoryDataReader("evidentlyai", "docs", cache=cache)
+    # a pinned commit is never revalidated, so it keeps the first archive
+    pinned = docs.GithubRepositoryDataReader("evidentlyai", "docs", cache=cache, ref="a" * 40)
+    main.read()
+    pinned.read()
+
+    codeload.archive = make_zip({"a.md": "changed"})
+    codeload.etag = '"v2"'
+    main.read()
+
+    assert [f.content for f in pinned.read()] == ["a"]
+    assert len(list((tmp_path / "blobs").glob("*.zip"))) == 2
+
+
+def test_manifest_matches_extracted_files(monkeypatch, tmp_path):
+    codeload = FakeCodeload({
+        "index.md": "# Index",
+        "guide/setup.mdx": "setup",
+        "images/logo.png": "binary",
+    })
+    monkeypatch.setattr(docs.requests, "get", codeload.get)
+
+    cache = docs.RepositoryArchiveCache(tmp_path, ttl=3600)
+    reader = docs.GithubRepositoryDataReader(
+        "evidentlyai", "docs", allowed_extensions={"md", "mdx"}, cache=cache
+    )
+
+    opened = []
+    original_open = zipfile.ZipFile.open
+
+    def tracking_open(self, name, *args, **kwargs):
+        opened.append(name)
+        return original_open(self, name, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, "open", tracking_open)
+    manifest = reader.manifest()
+
+    assert opened == [], "Expected the manifest to come from the zip entries alone"
+    assert manifest == docs.build_manifest(reader.read())
+    assert list(manifest) == ["evidentlyai/docs/index.md", "evidentlyai/docs/guide/setup.mdx"]
+
+
+def test_manifest_keeps_same_paths_of_different_repositories(monkeypatch):
+    archives = {
+        "https://codeload.github.com/evidentlyai/docs/zip/main": make_zip({"index.md": "docs"}),
+        "https://codeload.github.com/evidentlyai/evidently/zip/main": make_zip({"index.md": "library"}),
+    }
+    monkeypatch.setattr(
+        docs.requests.Session, "get",
+        lambda self, url, **kwargs: FakeResponse(archives[url])
+    )
+
+    reader = docs.MultiRepositoryDataReader([
+        docs.RepositorySpec("evidentlyai", "docs"),
+        docs.RepositorySpec("evidentlyai", "evidently"),
+    ])
+    manifest = reader.manifest()
+
+    assert list(manifest) == ["evidentlyai/docs/index.md", "evidentlyai/evidently/index.md"]
+    assert manifest == docs.build_manifest(reader.read())
+
+
+def test_parse_data_with_workers_preserves_order(monkeypatch):
+    monkeypatch.setattr(docs, "PARALLEL_PARSE_MIN_FILES", 2)
+    files = [
+        docs.RawRepositoryFile(filename=f"{i}.md", content=f"---\ntitle: T{i}\n---\nbody {i}")
+        for i in range(20)
+    ]
+
+    parsed = docs.parse_data(files, workers=2)
+
+    assert parsed == docs.parse_data(files)
+    assert [d["title"] for d in parsed] == [f"T{i}" for i in range(20)]
+
+
+def test_parse_frontmatter_matches_python_frontmatter():
+    import frontmatter
+
+    samples = [
+        "---\ntitle: Data drift\ndescription: How to detect drift\n---\n\n# Body",
+        "---\ntitle: \"Quoted: title\"\nicon: 'chart'\n---\nbody",
+        "---\ntitle: x\ntags: [a, b]\nnested:\n  key: value\n---\nbody",
+        "---\ndate: 2024-01-01\ndraft: yes\nweight: 10\n---\nbody",
+        "---\ntitle: x # comment\n---\nbody",
+        "no frontmatter at all",
+        "---\ntitle: unterminated\n",
+    ]
+
+    for text in samples:
+        expected = frontmatter.loads(text).to_dict()
+        assert docs.parse_frontmatter(text) == expected, text
+
+
+def test_multi_repository_reader_tags_files(monkeypatch):
+    sha = "a" * 40
+    archives = {
+        "https://codeload.github.com/evidentlyai/docs/zip/main": make_zip({"a.md": "a"}, commit="b" * 40),
+        f"https://codeload.github.com/evidentlyai/evidently/zip/{sha}": make_zip({"b.md": "b"}),
+    }
+    monkeypatch.setattr(
+        docs.requests.Session, "get",
+        lambda self, url, **kwargs: FakeResponse(archives[url])
+    )
+
+    reader = docs.MultiRepositoryDataReader([
+        docs.RepositorySpec("evidentlyai", "docs"),
+        docs.RepositorySpec("evidentlyai", "evidently", ref=sha),
+    ])
+    files = reader.read()
+
+    assert [(f.repo, f.filename, f.commit) for f in files] == [
+        ("evidentlyai/docs", "a.md", "b" * 40),
+        ("evidentlyai/evidently", "b.md", sha),
+    ]
+
+    parsed = docs.parse_data(files)
+    assert parsed[1]["repo"] == "evidentlyai/evidently"
+    assert parsed[1]["commit"] == sha
+
+
+def test_entry_filter_rejects_before_decompression(monkeypatch):
+    install_fake_download(monkeypatch, {
+        "index.md": "# Index",
+        "api/reference.md": "x" * 5000,
+        "drafts/wip.md": "draft",
+        "images/logo.png": "p" * 300,
+    })
+
+    reader = docs.GithubRepositoryDataReader(
+        "evidentlyai", "docs",
+        allowed_extensions={"md"},
+        exclude=["drafts/*"],
+        max_file_size=1000,
+    )
+
+    opened = []
+    original_open = zipfile.ZipFile.open
+
+    def tracking_open(self, name, *args, **kwargs):
+        opened.append(getattr(name, "filename", name))
+        return original_open(self, name, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, "open", tracking_open)
+
+    files = reader.read()
+
+    assert [f.filename for f in files] == ["index.md"]
+    assert opened == ["docs-main/index.md"]
+    assert reader.stats == docs.ExtractionStats(
+        files_read=1, bytes_read=7, files_skipped=3, bytes_skipped=5305
+    )
+
+
+def test_chunk_store_matches_chunk_documents():
+    documents = [
+        {"filename": "a.md", "title": "A", "content": "abcdefghij" * 25},
+        {"filename": "b.md", "title": "B", "content": "short"},
+        {"filename": "c.md", "title": "C", "content": ""},
+    ]
+
+    store = docs.ChunkStore.from_documents(documents, size=100, step=40)
+    expected = docs.chunk_documents(documents, size=100, step=40)
+
+    assert len(store) == len(expected)
+    assert [dict(chunk) for chunk in store] == expected
+    assert store[-1]["filename"] == "b.md"
+    assert store.texts[0] is documents[0]["content"]
+
+
+def test_iter_chunks_streams_to_disk(tmp_path):
+    documents = [
+        {"filename": "a.md", "title": "A", "content": "abcdefghij" * 25},
+        {"filename": "b.md", "title": "B", "content": "short"},
+    ]
+
+    chunks = docs.iter_chunks(iter(documents), size=100, step=40)
+    assert next(chunks) == {"start": 0, "content": documents[0]["content"][:100],
+                            "filename": "a.md", "title": "A"}
+
+    path = tmp_path / "chunks.jsonl"
+    written = docs.write_chunks(docs.iter_chunks(documents, size=100, step=40), path)
+
+    expected = docs.chunk_documents(documents, size=100, step=40)
+    assert written == len(expected)
+    assert list(docs.read_chunks(path)) == expected
+
+
+def test_markdown_chunks_keep_code_blocks_and_repeat_headings():
+    text = (
+        "Intro\n\n"
+        "# Setup\n\n"
+        "Install the package.\n\n"
+        "```python\n# not a heading\nimport evidently\n```\n\n"
+        "## Usage\n\n"
+        + "word " * 40 + "\n"
+    )
+
+    chunks = docs.chunk_markdown_documents([{"filename": "a.md", "content": text}], size=80)
+
+    assert [c["section"] for c in chunks] == [None, "# Setup", "## Usage", "## Usage", "## Usage"]
+    assert chunks[1]["content"].startswith("# Setup")
+    assert "```python\n# not a heading\nimport evidently\n```" in chunks[1]["content"]
+    assert chunks[3]["content"].startswith("## Usage\n\nword")
+    assert all(c["filename"] == "a.md" for c in chunks)
+
+
+class WordEncoding:
+    """Stand-in for a tiktoken encoding: one token per word."""
+
+    def encode(self, text, disallowed_special=()):
+        self.words = re.findall(r"\s*\S+", text)
+        return list(range(len(self.words)))
+
+    def decode_with_offsets(self, tokens):
+        offsets, pos = [], 0
+        for word in self.words:
+            offsets.append(pos)
+            pos += len(word)
+        return "".join(self.words), offsets
+
+
+def test_token_chunks_are_sized_in_tokens():
+    text = " ".join(f"w{i}" for i in range(10))
+    documents = [{"filename": "a.md", "content": text}]
+
+    chunks = docs.chunk_token_documents(documents, size=4, step=3, encoding=WordEncoding())
+
+    assert [c["content"] for c in chunks] == [
+        "w0 w1 w2 w3", " w3 w4 w5 w6", " w6 w7 w8 w9"
+    ]
+    assert [c["num_tokens"] for c in chunks] == [4, 4, 4]
+    assert all(text[c["start"]:].startswith(c["content"]) for c in chunks)
+
+
+def test_get_encoding_falls_back_to_char_estimate_offline(monkeypatch):
+    import tiktoken
+
+    def offline(model):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(tiktoken, "encoding_for_model", offline)
+    docs.get_encoding.cache_clear()
+    try:
+        with pytest.warns(RuntimeWarning, match="one per 4 characters"):
+            encoding = docs.get_encoding()
+    finally:
+        docs.get_encoding.cache_clear()
+
+    text = "Data drift happens when data changes"
+    chunks = docs.chunk_token_documents([{"content": text}], size=3, step=2, encoding=encoding)
+
+    assert [c["content"] for c in chunks[:2]] == ["Data drift h", "ft happens w"]
+    assert [c["num_tokens"] for c in chunks] == [3, 3, 3, 3]
+    assert all(text[c["start"]:].startswith(c["content"]) for c in chunks)
+    assert docs.tokenizer_config(encoding) == {"tokenizer": "chars/4", "tokenizer_version": "1"}
+
+
+def test_char_estimate_round_trips_any_text():
+    encoding = docs.CharEstimateEncoding()
+    text = "naïve 数据 drift 🚀\n"
+
+    tokens = encoding.encode(text)
+    decoded, offsets = encoding.decode_with_offsets(tokens)
+
+    assert len(tokens) == -(-len(text) // 4)
+    assert decoded == text
+    assert offsets == list(range(0, len(text), 4))
+
@@ -0,0 +1,137 @@
+import numpy as np
+
+import embedder
+
+from embedder import Embedder
+from tests.test_vector_search import BagOfWordsModel
+
+
+class BatchRecordingModel(BagOfWordsModel):
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        return super().encode(texts, **kwargs)
+
+
+def test_embedder_batches_by_length(monkeypatch):
+    model = BatchRecordingModel()
+    monkeypatch.setattr(embedder, "load_embedding_model", lambda name: model)
+
+    texts = ["a", "a b c d", "a b", "a b c d e f", "a b c"]
+    vectors = Embedder(batch_size=2, cache_dir=None).encode(texts)
+
+    assert model.batches == [["a b c d e f", "a b c d"], ["a b c", "a b"], ["a"]]
+    np.testing.assert_allclose(vectors, BagOfWordsModel().encode(texts, normalize_embeddings=True))
+
+
+def test_embedder_cache(monkeypatch, tmp_path):
+    model = BatchRecordingModel()
+    monkeypatch.setattr(embedder, "load_embedding_model", lambda name: model)
+
+    first = Embedder(cache_dir=tmp_path).encode(["drift", "tracing", "drift"])
+    assert sorted(model.encoded) == ["drift", "tracing"], "Expected duplicates to be encoded once"
+
+    # a new process: the cache is read back from disk
+    model.encoded.clear()
+    fresh = Embedder(cache_dir=tmp_path)
+    second = fresh.encode(["tracing", "llm judge", "drift"])
+
+    assert model.encoded == ["llm judge"]
+    assert fresh.cache_hits == 2
+    np.testing.assert_array_equal(second[[0, 2]], first[[1, 0]])
+
+    # queries skip the cache
+    fresh.encode(["drift"], cache=False)
+    assert model.encoded == ["llm judge", "drift"]
+
+    # another model has its own cache
+    model.encoded.clear()
+    Embedder("other-model", cache_dir=tmp_path).encode(["drift"])
+    assert model.encoded == ["drift"]
+
+
+def test_embedding_cache_compaction(monkeypatch, tmp_path):
+    monkeypatch.setattr(embedder, "load_embedding_model", lambda name: BagOfWordsModel())
+    monkeypatch.setattr(embedder, "MAX_CACHE_SHARDS", 3)
+
+    for i in range(5):
+        Embedder(cache_dir=tmp_path).encode([f"text {i}", "shared"])
+
+    cache = Embedder(cache_dir=tmp_path).cache
+    assert len(cache) == 6
+    assert len(cache._shard_names()) <= 3
+
+
+def test_embedding_cache_survives_concurrent_compaction(monkeypatch, tmp_path):
+    monkeypatch.setattr(embedder, "load_embedding_model", lambda name: BagOfWordsModel())
+    monkeypatch.setattr(embedder, "MAX_CACHE_SHARDS", 3)
+
+    for i in range(4):
+        Embedder(cache_dir=tmp_path).encode([f"text {i}"])
+
+    # a reader lists the shards, then another process merges them
+    reader = Embedder(cache_dir=tmp_path).cache
+    listed = reader._shard_names()
+    Embedder(cache_dir=tmp_path).cache._load()
+    assert len(reader._shard_names()) == 1
+
+    # the reader loads from its stale listing without merging itself
+    real_shard_names = reader._shard_names
+    listings = [listed]
+    monkeypatch.setattr(reader, "_shard_names", lambda: listings.pop() if listings else real_shard_names())
+    monkeypatch.setattr(embedder, "MAX_CACHE_SHARDS", 32)
+    assert len(reader) == 4
+
+
+def test_embedding_cache_compacts_once_at_a_time(monkeypatch, tmp_path):
+    monkeypatch.setattr(embedder, "load_embedding_model", lambda name: BagOfWordsModel())
+    monkeypatch.setattr(embedder, "MAX_CACHE_SHARDS", 3)
+
+    for i in range(4):
+        Embedder(cache_dir=tmp_path).encode([f"text {i}"])
+
+    cache = Embedder(cache_dir=tmp_path).cache
+    (cache.path / "compact.lock").touch()
+    assert len(cache) == 4
+    assert len(cache._shard_names()) == 4, "Expected no merge while another process holds the lock"
+
+
+def test_model_is_loaded_once_whatever_the_thread_count(monkeypatch):
+    import sys
+    import types
+
+    loads, thread_limits = [], []
+
+    class SentenceTransformer(BagOfWordsModel):
+        def __init__(self, model_name, device):
+            super().__init__()
+            loads.append(model_name)
+
+    class Torch:
+        threads = 4
+
+        def get_num_threads(self):
+            return self.threads
+
+        def set_num_threads(self, num_threads):
+            thread_limits.append(num_threads)
+            self.threads = num_threads
+
+    monkeypatch.setitem(
+        sys.modules, "sentence_transformers", types.SimpleNamespace(SentenceTransformer=SentenceTransformer)
+    )
+    monkeypatch.setitem(sys.modules, "torch", Torch())
+    embedder.load_embedding_model.cache_clear()
+    try:
+        Embedder(cache_dir=None, num_threads=2).encode(["drift"])
+        Embedder(cache_dir=None, num_threads=2).encode(["tracing", "evals"])
+        Embedder(cache_dir=None, num_threads=3).encode(["judge"])
+    finally:
+        embedder.load_embedding_model.cache_clear()
+
+    assert loads == [embedder.DEFAULT_EMBEDDING_MODEL]
+    assert thread_limits == [2, 3]
@@ -0,0 +1,37 @@
+import embedder
+import hybrid_search
+
+from hybrid_search import reciprocal_rank_fusion
+from tests.test_search_tools import install_docs
+from tests.test_vector_search import BagOfWordsModel, FILES
+
+
+def test_reciprocal_rank_fusion():
+    a, b, c = ({"filename": name, "start": 0} for name in "abc")
+
+    fused = reciprocal_rank_fusion([[a, b, c], [b, c]], k=60)
+
+    # a only ranks first once; b and c score in both lists
+    assert [r["filename"] for r in fused] == ["b", "c", "a"]
+
+
+def test_hybrid_search_tools(monkeypatch, tmp_path):
+    model = BagOfWordsModel()
+    monkeypatch.setattr(embedder, "load_embedding_model", lambda name: model)
+    reads = install_docs(monkeypatch, FILES)
+
+    tools = hybrid_search.prepare_hybrid_search_tools(
+        2000, 1000, 2, cache_dir=tmp_path, embedding_cache_dir=tmp_path / "embeddings"
+    )
+
+    assert len(reads) == 1, "Expected both indexes to be built from one read"
+
+    results = tools.search("llm judge")
+    assert results[0]["filename"] == "llm.md"
+    assert len(results) == 2
+    assert len({r["filename"] for r in results}) == 2, "Expected fused results to be deduplicated"
+    assert all(isinstance(r, dict) for r in results)
+
+    assert tools.search_many(["drift", "llm judge"]) == [
+        tools.search("drift"), tools.search("llm judge")
+    ]
@@ -0,0 +1,276 @@
+import os
+import time
+
+from docs import RawRepositoryFile
+import search_tools
+
+
+def make_file(filename: str, title: str, body: str) -> RawRepositoryFile:
+    content = f"---\ntitle: {title}\n---\n{body}"
+    return RawRepositoryFile(filename=filename, content=content)
+
+
+def install_docs(monkeypatch, files) -> list:
+    """
+    Serve files as the docs; returns the list of read_github_data calls.
+    """
+    reads = []
+
+    def read_github_data(**kwargs):
+        reads.append(kwargs)
+        return files
+
+    monkeypatch.setattr(search_tools.docs, "read_github_data", read_github_data)
+    monkeypatch.setattr(
+        search_tools.docs, "read_github_manifest",
+        lambda **kwargs: search_tools.docs.build_manifest(files)
+    )
+    return reads
+
+
+def make_search_tools(files) -> search_tools.SearchTools:
+    state = search_tools.IndexState(chunk_size=2000, chunk_step=1000)
+    state.update(files)
+
+    return search_tools.SearchTools(
+        index=search_tools.build_search_index(state.all_chunks()),
+        file_index=search_tools.prepare_file_index(state.documents.values()),
+        top_k=5,
+        state=state
+    )
+
+
+def test_same_filename_in_two_repositories(tmp_path):
+    files = []
+    for repo, body in [("evidentlyai/docs", "Docs home"), ("evidentlyai/evidently", "Library home")]:
+        f = make_file("index.md", "Home", body)
+        f.repo = repo
+        files.append(f)
+
+    tools = make_search_tools(files)
+
+    assert sorted(tools.state.documents) == ["evidentlyai/docs/index.md", "evidentlyai/evidently/index.md"]
+    assert {r["repo"] for r in tools.search("home")} == {"evidentlyai/docs", "evidentlyai/evidently"}
+    assert "Library home" in tools.read_file("index.md", repo="evidentlyai/evidently")
+    assert tools.read_file("index.md").startswith("Several repositories have index.md")
+
+    search_tools.save_search_tools(tools, tmp_path / "store")
+    loaded = search_tools.load_search_tools(tmp_path / "store")
+
+    assert sorted(loaded.state.documents) == sorted(tools.state.documents)
+    assert "Docs home" in loaded.read_file("index.md", repo="evidentlyai/docs")
+
+    diff = loaded.refresh(files[1:])
+    assert diff.deleted == ["evidentlyai/docs/index.md"]
+    assert "Library home" in loaded.read_file("index.md")
+
+
+def test_refresh_only_reparses_changed_files(monkeypatch):
+    tools = make_search_tools([
+        make_file("drift.md", "Data drift", "Detect data drift"),
+        make_file("llm.md", "LLM judge", "LLM as a judge"),
+        make_file("old.md", "Old page", "Deprecated"),
+    ])
+
+    parsed = []
+    original_parse_data = search_tools.docs.parse_data
+
+    def tracking_parse_data(files):
+        parsed.extend(f.filename for f in files)
+        return original_parse_data(files)
+
+    monkeypatch.setattr(search_tools.docs, "parse_data", tracking_parse_data)
+
+    diff = tools.refresh([
+        make_file("drift.md", "Data drift", "Detect data drift"),
+        make_file("llm.md", "LLM judge", "LLM as a judge with custom criteria"),
+        make_file("new.md", "Tracing", "Tracing for agents"),
+    ])
+
+    assert diff.added == ["new.md"]
+    assert diff.modified == ["llm.md"]
+    assert diff.deleted == ["old.md"]
+    assert sorted(parsed) == ["llm.md", "new.md"]
+
+    assert tools.read_file("old.md") == "File doesn't exist"
+    assert tools.search("tracing")[0]["filename"] == "new.md"
+
+
+def test_refresh_without_changes_keeps_index():
+    files = [make_file("drift.md", "Data drift", "Detect data drift")]
+    tools = make_search_tools(files)
+    index = tools.index
+
+    diff = tools.refresh(files)
+
+    assert not diff
+    assert tools.index is index
+
+
+def test_store_roundtrip(tmp_path):
+    tools = make_search_tools([
+        make_file("drift.md", "Data drift", "Detect data drift"),
+        make_file("llm.md", "LLM judge", "LLM as a judge"),
+    ])
+
+    search_tools.save_search_tools(tools, tmp_path / "store")
+    loaded = search_tools.load_search_tools(tmp_path / "store")
+
+    assert loaded.search("drift") == tools.search("drift")
+    assert loaded.read_file("llm.md") == tools.read_file("llm.md")
+    assert loaded.state.manifest == tools.state.manifest
+
+    diff = loaded.refresh([make_file("llm.md", "LLM judge", "LLM as a judge")])
+    assert diff.deleted == ["drift.md"]
+    assert loaded.search("drift") == []
+
+
+def test_store_with_other_schema_version_is_rebuilt(tmp_path, monkeypatch):
+    tools = make_search_tools([make_file("drift.md", "Data drift", "Detect data drift")])
+    search_tools.save_search_tools(tools, tmp_path / "store")
+
+    monkeypatch.setattr(search_tools.index_store, "SCHEMA_VERSION", 2)
+
+    assert search_tools.load_search_tools(tmp_path / "store") is None
+    assert search_tools.load_search_tools(tmp_path / "missing") is None
+
+
+def test_token_index_config_names_the_tokenizer(monkeypatch):
+    monkeypatch.setattr(search_tools.docs, "get_encoding", search_tools.docs.CharEstimateEncoding)
+    estimated = search_tools.index_config(500, 400, "tokens")
+
+    assert estimated["tokenizer"] == "chars/4"
+    assert "tokenizer" not in search_tools.index_config(500, 400, "sliding_window")
+
+    class Encoding:
+        name = "cl100k_base"
+
+    monkeypatch.setattr(search_tools.docs, "get_encoding", Encoding)
+    assert search_tools.index_config(500, 400, "tokens") != estimated
+
+
+def test_prepare_search_tools_keys_cache_on_sources(tmp_path, monkeypatch):
+    files = [
+        make_file("drift.md", "Data drift", "Detect data drift"),
+        make_file("llm.md", "LLM judge", "LLM as a judge"),
+    ]
+    reads = install_docs(monkeypatch, files)
+
+    builds = []
+    original_prepare = search_tools._prepare_search_tools
+
+    def tracking_prepare(*args, **kwargs):
+        builds.append(kwargs)
+        return original_prepare(*args, **kwargs)
+
+    monkeypatch.setattr(search_tools, "_prepare_search_tools", tracking_prepare)
+    cache_dir = tmp_path / "search_index"
+
+    first = search_tools.prepare_search_tools(2000, 1000, 5, cache_dir=cache_dir)
+    again = search_tools.prepare_search_tools(2000, 1000, 3, cache_dir=cache_dir)
+
+    assert len(builds) == 1
+    assert len(reads) == 1, "Expected a cache hit not to extract the docs"
+    assert again.top_k == 3
+    assert again.search("drift") == first.search("drift")
+
+    files[1] = make_file("llm.md", "LLM judge", "LLM as a judge with tracing")
+    changed = search_tools.prepare_search_tools(2000, 1000, 5, cache_dir=cache_dir)
+
+    assert len(builds) == 1, "Expected the previous store to be refreshed"
+    assert changed.search("tracing")[0]["filename"] == "llm.md"
+    assert len(list(search_tools.index_store.iter_stores(cache_dir))) == 2
+
+    legacy_file = tmp_path / "search_tools_2000_1000_5.bin"
+    legacy_file.write_bytes(b"legacy")
+
+    assert len(search_tools.index_store.prune(cache_dir, dry_run=True)) == 1
+    assert legacy_file.exists(), "Expected legacy caches to be left alone by default"
+
+    removed = search_tools.index_store.prune(cache_dir, legacy=True, legacy_dir=tmp_path)
+
+    assert len(removed) == 2
+    assert not legacy_file.exists()
+    assert len(list(search_tools.index_store.iter_stores(cache_dir))) == 1
+    assert search_tools.prepare_search_tools(2000, 1000, 5, cache_dir=cache_dir).search("tracing")
+    assert len(builds) == 1
+
+
+def test_prune_removes_stores_of_abandoned_configurations(tmp_path, monkeypatch):
+    install_docs(monkeypatch, [make_file("drift.md", "Data drift", "Detect data drift")])
+    index_store = search_tools.index_store
+    cache_dir = tmp_path / "search_index"
+
+    search_tools.prepare_search_tools(2000, 1000, 5, cache_dir=cache_dir)
+    search_tools.prepare_search_tools(1000, 500, 5, cache_dir=cache_dir)
+    old, current = sorted(
+        (path for path, _ in index_store.iter_stores(cache_dir)),
+        key=lambda path: index_store.read_header(path)["params"]["chunk_size"],
+        reverse=True,
+    )
+    month_ago = time.time() - 30 * 24 * 60 * 60
+    os.utime(old / index_store.HEADER_FILE, (month_ago, month_ago))
+
+    assert index_store.prune(cache_dir) == []
+    assert index_store.prune(cache_dir, max_age=7 * 24 * 60 * 60) == [old]
+
+    upgraded = dict(index_store.library_versions(), minsearch="99.0")
+    monkeypatch.setattr(index_store, "library_versions", lambda: upgraded)
+
+    assert index_store.prune(cache_dir) == [current]
+    assert list(index_store.iter_stores(cache_dir)) == []
+
+
+def test_concurrent_saves_keep_the_first_store(tmp_path):
+    tools = make_search_tools([make_file("drift.md", "Data drift", "Detect data drift")])
+    path = tmp_path / "store"
+
+    search_tools.save_search_tools(tools, path)
+    created_at = search_tools.index_store.read_header(path)["created_at"]
+    search_tools.save_search_tools(tools, path)
+
+    assert search_tools.index_store.read_header(path)["created_at"] == created_at
+    assert [p.name for p in tmp_path.iterdir()] == ["store"]
+
+
+def test_search_many_matches_search():
+    tools = make_search_tools([
+        make_file("drift.md", "Data drift", "Detect data drift in production data"),
+        make_file("llm.md", "LLM judge", "LLM as a judge for evaluation"),
+        make_file("tracing.md", "Tracing", "Tracing LLM calls and data"),
+        make_file("metrics.md", "Metrics", "All metrics and presets"),
+    ])
+    tools.top_k = 2
+    queries = ["data drift", "llm evaluation", "presets", "nothing matches xyz"]
+
+    results = tools.search_many(queries)
+
+    assert results == [tools.search(q) for q in queries]
+    assert [len(r) for r in results] == [2, 2, 1, 0]
+
+
+def test_query_cache_serves_normalized_repeats():
+    tools = make_search_tools([
+        make_file("drift.md", "Data drift", "Detect data drift"),
+        make_file("llm.md", "LLM judge", "LLM as a judge"),
+    ])
+
+    first = tools.search("data drift")
+    first[0]["content"] = "modified by the caller"
+
+    assert tools.search("  Data   DRIFT ") == tools.search("data drift") != first
+    assert tools.search_many(["data drift", "llm judge"])[0] == tools.search("data drift")
+    assert (tools.cache.hits, tools.cache.misses) == (4, 2)
+    assert tools.cache.hit_rate == 4 / 6
+
+
+def test_query_cache_is_invalidated_by_refresh():
+    tools = make_search_tools([make_file("drift.md", "Data drift", "Detect data drift")])
+    assert tools.search("tracing") == []
+
+    tools.refresh([
+        make_file("drift.md", "Data drift", "Detect data drift"),
+        make_file("tracing.md", "Tracing", "Tracing for agents"),
+    ])
+
+    assert tools.search("tracing")[0]["filename"] == "tracing.md"
@@ -0,0 +1,61 @@
+import numpy as np
+
+import embedder
+import vector_search
+
+from tests.test_search_tools import install_docs, make_file
+
+
+class BagOfWordsModel:
+    """Stand-in for a sentence-transformers model: hashed word counts."""
+
+    dim = 64
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, **kwargs):
+        self.encoded.extend(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, sum(map(ord, word)) % self.dim] += 1
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+        return vectors
+
+
+FILES = [
+    make_file("drift.md", "Data drift", "Detect data drift in production"),
+    make_file("llm.md", "LLM judge", "Use an LLM as a judge"),
+    make_file("tracing.md", "Tracing", "Tracing agent calls"),
+]
+
+
+def test_vector_search_tools(monkeypatch, tmp_path):
+    model = BagOfWordsModel()
+    monkeypatch.setattr(embedder, "load_embedding_model", lambda name: model)
+    install_docs(monkeypatch, FILES)
+
+    tools = vector_search.prepare_vector_search_tools(
+        2000, 1000, 2, dtype="float16", cache_dir=tmp_path,
+        embedding_cache_dir=tmp_path / "embeddings"
+    )
+
+    assert tools.index.embeddings.dtype == np.float16
+    assert tools.search("llm judge")[0]["filename"] == "llm.md"
+    assert len(tools.search("tracing")) == 2
+    assert [r[0]["filename"] for r in tools.search_many(["drift", "tracing agent"])] == [
+        "drift.md", "tracing.md"
+    ]
+
+    model.encoded.clear()
+    loaded = vector_search.prepare_vector_search_tools(
+        2000, 1000, 2, dtype="float16", cache_dir=tmp_path,
+        embedding_cache_dir=tmp_path / "embeddings"
+    )
+
+    assert isinstance(loaded.index.embeddings, np.memmap)
+    assert loaded.search("llm judge") == tools.search("llm judge")
+    assert model.encoded == ["llm judge"], "Expected only the query to be embedded"
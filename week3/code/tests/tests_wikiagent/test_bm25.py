@@ -0,0 +1,138 @@
+import math
+
+import pytest
+
+from wikiagent.bm25 import BM25Index, create_index
+from wikiagent import tools
+
+
+DOCS = [
+    {"question": "How do I install Docker?", "text": "Use the docker installer.", "section": "setup", "course": "de"},
+    {"question": "Kafka topics", "text": "docker compose starts kafka and docker networking", "section": "module 6", "course": "de"},
+    {"question": "Homework deadline", "text": "The homework is due on Monday.", "section": "general", "course": "ml"},
+    {"question": "Docker on Windows", "text": "Enable WSL.", "section": "setup", "course": "ml"},
+]
+
+
+def make_index(docs=DOCS):
+    index = BM25Index(text_fields=["question", "text", "section"], keyword_fields=["course"])
+    return index.fit(docs)
+
+
+def test_bm25_scores_match_formula():
+    index = BM25Index(text_fields=["text"], k1=1.2, b=0.75).fit([
+        {"text": "kafka kafka streams"},
+        {"text": "spark"},
+    ])
+
+    postings = index.postings["text"]["kafka"]
+    assert list(postings.doc_ids) == [0] and list(postings.tfs) == [2]
+
+    # doc 0: tf 2, length 3, average length 2
+    idf = math.log(1 + (2 - 1 + 0.5) / (1 + 0.5))
+    expected = idf * 2 * 2.2 / (2 + 1.2 * (1 - 0.75 + 0.75 * 3 / 2))
+    scores = index._field_scores("text", {"kafka": 1})[1]
+    assert math.isclose(scores[0][0], expected)
+
+
+def test_bm25_search_ranks_filters_and_boosts():
+    index = make_index()
+
+    # doc 0 matches in two fields
+    results = index.search("docker", num_results=10, output_ids=True)
+    assert [r["_id"] for r in results] == [0, 1, 3]
+
+    filtered = index.search("docker", filter_dict={"course": "ml"}, num_results=10)
+    assert filtered == [DOCS[3]]
+    assert index.search("docker", filter_dict={"course": "unknown"}) == []
+
+    # without the question field, the text with two mentions wins
+    text_only = index.search("docker", boost_dict={"question": 0}, num_results=10)
+    assert text_only == [DOCS[1], DOCS[0]]
+
+    assert index.search("the and of") == []
+    assert index.search("docker", num_results=0) == []
+
+
+def test_bm25_keyword_bitmaps():
+    index = BM25Index(
+        text_fields=["question", "text"], keyword_fields=["course", "section"]
+    ).fit(DOCS)
+
+    assert index.keyword_bitmap("course", "ml").tolist() == [False, False, True, True]
+    assert index.search("docker", filter_dict={"course": "ml", "section": "setup"}) == [DOCS[3]]
+    assert index.search("docker", filter_dict={"course": "de", "section": "general"}) == []
+
+    # a cached bitmap is extended over appended documents
+    new_doc = {"question": "Docker memory", "text": "raise the limit", "section": "setup", "course": "ml"}
+    index.append(new_doc)
+    assert index.keyword_bitmap("course", "ml").tolist() == [False, False, True, True, True]
+    assert index.search("docker memory", filter_dict={"course": "ml"})[0] is new_doc
+
+
+def test_bm25_append_matches_fit():
+    appended = BM25Index(text_fields=["question", "text", "section"], keyword_fields=["course"])
+    for doc in DOCS:
+        appended.append(doc)
+
+    for query in ["docker", "homework monday", "setup windows"]:
+        assert appended.search(query, filter_dict={"course": "de"}) == make_index().search(
+            query, filter_dict={"course": "de"}
+        )
+
+
+def test_bm25_append_rejects_bad_docs_without_changes():
+    index = make_index()
+    before = index.search("docker kafka", filter_dict={"course": "de"}, num_results=10)
+
+    with pytest.raises(TypeError, match="course"):
+        index.append({"question": "Docker kafka", "text": "docker", "course": ["de", "ml"]})
+
+    assert len(index.docs) == len(DOCS)
+    assert len(index.doc_lengths["text"]) == len(DOCS)
+    assert len(index.keyword_codes["course"]) == len(DOCS)
+    assert index.search("docker kafka", filter_dict={"course": "de"}, num_results=10) == before
+
+
+def test_tokenizer_matches_minsearch():
+    from minsearch.append import Tokenizer
+
+    text = "How do I run Docker-Compose on Windows 11? It's in module_6, isn't it?"
+    assert BM25Index(["text"]).tokenizer.tokenize(text) == Tokenizer().tokenize(text)
+
+
+def test_wiki_search_tools_with_bm25_index():
+    index = BM25Index(text_fields=["title", "content"], keyword_fields=["title"])
+    search_tools = tools.SearchTools(index)
+
+    search_tools.add_entry([
+        {"title": "Capybara", "content": "old text about swamps", "url": None},
+        {"title": "Rodent", "content": "rodents gnaw", "url": None},
+    ])
+    search_tools.add_entry([{"title": "Capybara", "content": "new text about savannas", "url": None}])
+
+    assert isinstance(search_tools.index, BM25Index)
+    assert search_tools.search("savannas")[0]["title"] == "Capybara"
+    assert search_tools.search("swamps") == []
+
+
+def test_create_index_defaults_to_minsearch():
+    from minsearch import AppendableIndex
+
+    assert isinstance(create_index(["text"]), AppendableIndex)
+    assert isinstance(create_index(["text"], ["course"], backend="bm25"), BM25Index)
+    with pytest.raises(ValueError, match="whoosh"):
+        create_index(["text"], backend="whoosh")
+
+
+def test_select_keeps_parameters_and_renumbers():
+    index = BM25Index(text_fields=["question", "text"], keyword_fields=["course"], k1=1.5, b=0.5)
+    index.fit(DOCS)
+
+    selected = index.select([False, True, True] + [False] * (len(DOCS) - 3))
+
+    assert selected.docs == DOCS[1:3]
+    assert (selected.k1, selected.b) == (1.5, 0.5)
+    assert selected.tokenizer.stop_words is index.tokenizer.stop_words
+    assert selected.search("homework", filter_dict={"course": "ml"}) == [DOCS[2]]
+    assert index.select([2]).docs == [DOCS[2]]
@@ -0,0 +1,341 @@
+import asyncio
+import sqlite3
+import threading
+from functools import partial
+
+import httpx
+import pytest
+
+from wikiagent import tools
+
+
+def install_mock_transport(monkeypatch, handler):
+    monkeypatch.setattr(
+        tools.httpx, "AsyncClient",
+        partial(httpx.AsyncClient, transport=httpx.MockTransport(handler))
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_keyword_pages_limits_concurrency_per_host(monkeypatch):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+        title = request.url.params["title"]
+        if title == "Missing":
+            return httpx.Response(404)
+        return httpx.Response(200, content=f"page about {title}".encode())
+
+    install_mock_transport(monkeypatch, handler)
+
+    wiki_search = tools.WikiSearch(max_per_host=2)
+    keywords = ["Capybara", "Rodent", "Missing", "Hydrochoerus", "Guinea+pig"]
+    pages = await wiki_search.get_keyword_pages(keywords)
+    await wiki_search.aclose()
+
+    assert [p["title"] for p in pages] == ["Capybara", "Rodent", "Hydrochoerus", "Guinea+pig"]
+    assert pages[0]["content"] == "page about Capybara"
+    assert max_in_flight == 2, f"Expected at most 2 concurrent requests, got {max_in_flight}"
+
+
+@pytest.mark.asyncio
+async def test_get_keywords_async(monkeypatch):
+    def handler(request):
+        return httpx.Response(200, json={
+            "query": {"search": [{"title": "Capybara"}, {"title": "Lesser capybara"}]}
+        })
+
+    install_mock_transport(monkeypatch, handler)
+
+    wiki_search = tools.WikiSearch()
+    keywords = await wiki_search.get_keywords_async("capybara")
+    await wiki_search.aclose()
+
+    assert keywords == ["Capybara", "Lesser+capybara"]
+
+
+def test_client_of_a_finished_loop_is_closed(monkeypatch):
+    install_mock_transport(monkeypatch, lambda request: httpx.Response(200, content=b"page"))
+    wiki_search = tools.WikiSearch()
+
+    asyncio.run(wiki_search.get_keyword_page_async("Capybara"))
+    first = wiki_search._client
+    asyncio.run(wiki_search.get_keyword_page_async("Rodent"))
+
+    assert wiki_search._client is not first
+    assert first.is_closed
+    asyncio.run(wiki_search.aclose())
+
+
+def test_page_cache_ttl_and_lru_eviction(tmp_path, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(tools.time, "time", lambda: now)
+
+    cache = tools.PageCache(tmp_path / "pages.sqlite", ttl=60, max_bytes=30)
+    cache.set("a", "x" * 10)
+    cache.set("b", "y" * 10)
+
+    now += 1
+    assert cache.get("a") == "x" * 10
+
+    now += 1
+    cache.set("c", "z" * 10)
+
+    assert cache.get("b") is None, "Expected the least recently used entry to be evicted"
+    assert cache.get("a") == "x" * 10
+
+    now += 120
+    assert cache.get("c") is None, "Expected the entry to expire"
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_page_cache_batches_access_time_writes(tmp_path, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(tools.time, "time", lambda: now)
+    path = tmp_path / "pages.sqlite"
+
+    cache = tools.PageCache(path, flush_interval=30)
+    cache.set("a", "x")
+
+    def stored_accessed_at():
+        with sqlite3.connect(path) as conn:
+            return conn.execute("SELECT accessed_at FROM pages WHERE key = 'a'").fetchone()[0]
+
+    now += 10
+    assert cache.get("a") == "x"
+    assert stored_accessed_at() == 1000.0, "Expected a hit not to write"
+
+    now += 30
+    assert cache.get("a") == "x"
+    assert stored_accessed_at() == 1040.0
+
+    now += 1
+    cache.get("a")
+    cache.close()
+    assert stored_accessed_at() == 1041.0
+
+
+@pytest.mark.asyncio
+async def test_async_cache_lookups_run_off_the_event_loop(tmp_path, monkeypatch):
+    install_mock_transport(monkeypatch, lambda request: httpx.Response(200, content=b"page"))
+
+    cache = tools.PageCache(tmp_path / "pages.sqlite")
+    threads = []
+    original_get = cache.get
+
+    def tracking_get(key):
+        threads.append(threading.get_ident())
+        return original_get(key)
+
+    monkeypatch.setattr(cache, "get", tracking_get)
+
+    wiki_search = tools.WikiSearch(cache=cache)
+    await wiki_search.get_keyword_page_async("Capybara")
+    pages = await wiki_search.get_keyword_page_async("Capybara")
+    await wiki_search.aclose()
+
+    assert pages[0]["content"] == "page"
+    assert cache.hits == 1
+    assert threading.get_ident() not in threads
+
+
+def test_wiki_search_serves_repeated_pages_from_cache(tmp_path, monkeypatch):
+    calls = []
+
+    class FakeResponse:
+        content = b"Capybaras live in South America"
+
+        def raise_for_status(self):
+            pass
+
+    def fake_get(url, **kwargs):
+        calls.append(url)
+        return FakeResponse()
+
+    wiki_search = tools.WikiSearch(cache=tools.PageCache(tmp_path / "pages.sqlite"))
+    monkeypatch.setattr(wiki_search._session, "get", fake_get)
+
+    first = wiki_search.get_keyword_page("Capybara")
+    second = wiki_search.get_keyword_page("capybara")
+
+    assert len(calls) == 1
+    assert second[0]["content"] == first[0]["content"]
+    assert second[0]["title"] == "capybara"
+    assert wiki_search.cache.hit_rate == 0.5
+
+
+def test_normalize_key_folds_only_the_first_character():
+    assert tools.normalize_key("capybara ") == tools.normalize_key("Capybara")
+    assert tools.normalize_key("New_York+City") == "New York City"
+    assert tools.normalize_key("SAT") != tools.normalize_key("Sat")
+    assert tools.normalize_key("AIDS") != tools.normalize_key("Aids")
+
+
+def make_search_tools():
+    from minsearch import AppendableIndex
+
+    index = AppendableIndex(text_fields=["title", "content"], keyword_fields=["title"])
+    return tools.SearchTools(index)
+
+
+def test_add_entry_skips_duplicate_pages():
+    search_tools = make_search_tools()
+    page = {"title": "Capybara", "content": "Capybaras live near water. " * 50, "url": None}
+
+    first = search_tools.add_entry([page])
+    second = search_tools.add_entry([dict(page, title="capybara")])
+
+    assert len(first) > 0
+    assert second == []
+    assert len(search_tools.index.docs) == len(first)
+
+
+def test_add_entry_keeps_titles_that_differ_past_the_first_letter():
+    search_tools = make_search_tools()
+
+    search_tools.add_entry([
+        {"title": "SAT", "content": "a standardized test", "url": None},
+        {"title": "Sat", "content": "a Hindu concept of truth", "url": None},
+    ])
+
+    assert sorted(doc["title"] for doc in search_tools.index.docs) == ["SAT", "Sat"]
+
+
+def test_add_entry_replaces_changed_pages():
+    search_tools = make_search_tools()
+    search_tools.add_entry([
+        {"title": "Capybara", "content": "old text about swamps", "url": None},
+        {"title": "Rodent", "content": "rodents gnaw", "url": None},
+    ])
+
+    search_tools.add_entry([{"title": "Capybara", "content": "new text about savannas", "url": None}])
+
+    contents = sorted(doc["content"] for doc in search_tools.index.docs)
+    assert contents == ["new text about savannas", "rodents gnaw"]
+    assert search_tools.search("savannas")[0]["title"] == "Capybara"
+    assert search_tools.search("swamps") == []
+
+
+def test_replacing_a_page_keeps_the_index_parameters():
+    from wikiagent.bm25 import BM25Index
+
+    search_tools = tools.SearchTools(
+        BM25Index(text_fields=["title", "content"], k1=2.0, b=0.3, stop_words=set())
+    )
+    search_tools.add_entry([{"title": "Capybara", "content": "the old text", "url": None}])
+    search_tools.add_entry([{"title": "Capybara", "content": "the new text", "url": None}])
+
+    index = search_tools.index
+    assert (index.k1, index.b, index.tokenizer.stop_words) == (2.0, 0.3, set())
+    assert search_tools.search("the")[0]["content"] == "the new text"
+
+    appendable = make_search_tools()
+    appendable.index.tokenizer.stop_words = {"capybaras"}
+    appendable.add_entry([{"title": "Capybara", "content": "old", "url": None}])
+    appendable.add_entry([{"title": "Capybara", "content": "new", "url": None}])
+    assert appendable.index.tokenizer.stop_words == {"capybaras"}
+
+
+def test_add_entry_embeds_chunks(monkeypatch, tmp_path):
+    import embedder
+    from tests.test_vector_search import BagOfWordsModel
+
+    model = BagOfWordsModel()
+    monkeypatch.setattr(embedder, "load_embedding_model", lambda name: model)
+
+    search_tools = make_search_tools()
+    search_tools.embedder = embedder.Embedder(cache_dir=tmp_path)
+    pages = [
+        {"title": "Capybara", "content": "old text about swamps", "url": None},
+        {"title": "Rodent", "content": "rodents gnaw", "url": None},
+    ]
+    search_tools.add_entry(pages)
+    search_tools.add_entry([{"title": "Capybara", "content": "new text about savannas", "url": None}])
+
+    assert len(search_tools.embeddings) == len(search_tools.index.docs) == 2
+    assert search_tools.search("savannas", num_results=1)[0]["title"] == "Capybara"
+    assert search_tools.search("rodents gnaw", num_results=1)[0]["title"] == "Rodent"
+
+    # a fresh index over the same pages is embedded from the cache
+    model.encoded.clear()
+    rebuilt = make_search_tools()
+    rebuilt.embedder = embedder.Embedder(cache_dir=tmp_path)
+    rebuilt.add_entry(pages[1:])
+    assert model.encoded == []
+
+
+def test_add_entry_appends_to_the_ann_index(monkeypatch, tmp_path):
+    import embedder
+    from ann_index import IVFIndex
+    from tests.test_vector_search import BagOfWordsModel
+
+    monkeypatch.setattr(embedder, "load_embedding_model", lambda name: BagOfWordsModel())
+
+    ann = IVFIndex(n_lists=2, n_probe=2)
+    search_tools = tools.SearchTools(
+        make_search_tools().index, embedder=embedder.Embedder(cache_dir=tmp_path), ann=ann
+    )
+    pages = [
+        {"title": f"Page {i}", "content": f"filler text number {i}", "url": None}
+        for i in range(20)
+    ]
+    search_tools.add_entry(pages[:1])
+    buffer = ann._vectors
+    search_tools.add_entry(pages[1:] + [{"title": "Capybara", "content": "capybaras in savannas", "url": None}])
+
+    assert ann._vectors is buffer, "Expected appends to reuse the preallocated buffer"
+    assert search_tools.ann.is_trained
+    assert len(search_tools.ann) == len(search_tools.index.docs) == 21
+    assert search_tools.search("capybaras savannas", num_results=1)[0]["title"] == "Capybara"
+
+    search_tools.add_entry([{"title": "Capybara", "content": "capybaras near swamps", "url": None}])
+    assert search_tools.ann.is_trained
+    assert len(search_tools.ann) == len(search_tools.index.docs) == 21
+    assert search_tools.search("capybaras swamps", num_results=1)[0]["content"] == "capybaras near swamps"
+
+
+class CharEncoding:
+    """Stand-in for a tiktoken encoding: one token per character."""
+
+    def encode(self, text, disallowed_special=()):
+        return [ord(c) for c in text]
+
+    def decode_with_offsets(self, tokens):
+        return "".join(map(chr, tokens)), list(range(len(tokens)))
+
+
+def test_add_entry_with_token_windows(monkeypatch):
+    monkeypatch.setattr(tools, "get_encoding", lambda: CharEncoding())
+    search_tools = make_search_tools()
+
+    chunks = search_tools.add_entry(
+        [{"title": "Capybara", "content": "abcdefghij", "url": None}],
+        chunk_size=4, overlap=1, unit="tokens"
+    )
+
+    assert [c["content"] for c in chunks] == ["abcd", "defg", "ghij"]
+    assert [c["num_tokens"] for c in chunks] == [4, 4, 4]
+
+
+def test_word_window_matches_split_join():
+    from benchmarks.bench_word_window import chunk_with_split_join
+
+    search_tools = tools.SearchTools(index=None)
+    pages = [
+        "",
+        "one",
+        "  Capybara  (Hydrochoerus)\nis the  largest rodent ",
+        " ".join(f"wörd{i}" for i in range(23)),
+    ]
+
+    for content in pages:
+        page = {"title": "Capybara", "content": content}
+        assert search_tools._chunk_with_word_window(page, chunk_size=5, overlap=2) == \
+            chunk_with_split_join(page, chunk_size=5, overlap=2)
@@ -0,0 +1,326 @@
+from pathlib import Path
+from functools import partial
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+import docs
+import index_store
+import search_tools
+
+from ann_index import DEFAULT_N_PROBE, IVFIndex, top_k_indices
+from embedder import (
+    DEFAULT_EMBEDDING_BATCH_SIZE,
+    DEFAULT_EMBEDDING_CACHE_DIR,
+    DEFAULT_EMBEDDING_MODEL,
+    Embedder,
+)
+from search_tools import IndexState, SearchTools
+
+
+def chunk_text(chunk: Dict[str, Any]) -> str:
+    """
+    The text that gets embedded for a chunk: title, description and content.
+    """
+    text = (
+        (chunk.get("title") or "") + " "
+        + (chunk.get("description") or "") + " "
+        + (chunk.get("content") or "")
+    )
+    return text.strip()
+
+
+class VectorIndex:
+    """
+    Brute-force cosine search over sentence-transformers embeddings.
+
+    Embeddings are L2-normalized and kept as one (docs x dim) matrix, so a
+    query is scored against every chunk with a single matrix-vector product
+    and the top results are picked with argpartition. Texts are encoded by
+    an embedder.Embedder, which caches chunk embeddings across rebuilds and
+    only loads the model when something needs encoding.
+
+    With n_lists set, the embeddings are kept in an ann_index.IVFIndex
+    instead and a query only scores the n_probe nearest clusters.
+    """
+
+    def __init__(
+            self,
+            model_name: str = DEFAULT_EMBEDDING_MODEL,
+            dtype: str = "float32",
+            batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+            n_lists: int | None = None,
+            n_probe: int = DEFAULT_N_PROBE,
+            embedder: Embedder | None = None
+    ):
+        """
+        Args:
+            model_name (str): sentence-transformers model to embed with.
+            dtype (str): "float32", or "float16" to halve the memory and
+                disk footprint of the embeddings.
+            batch_size (int): Chunks encoded per forward pass.
+            n_lists (int): IVF clusters for approximate search, or None to
+                search exactly.
+            n_probe (int): Clusters scored per query when n_lists is set.
+            embedder (Embedder, optional): Shared embedder; overrides
+                model_name and batch_size.
+        """
+        if embedder is None:
+            embedder = Embedder(model_name, batch_size=batch_size)
+        self.embedder = embedder
+        self.model_name = embedder.model_name
+        self.dtype = np.dtype(dtype)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.ann: IVFIndex | None = None
+        self._embeddings = np.zeros((0, 0), dtype=self.dtype)
+        self.docs: Sequence[Dict[str, Any]] = []
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        if self.ann is not None:
+            return self.ann.vectors
+        return self._embeddings
+
+    @embeddings.setter
+    def embeddings(self, embeddings: np.ndarray):
+        if self.n_lists is None:
+            self._embeddings = embeddings
+            return
+        self.ann = IVFIndex(self.n_lists, n_probe=self.n_probe, dtype=self.dtype.name)
+        self.ann.add(embeddings)
+
+    def encode(self, texts: List[str], cache: bool = True) -> np.ndarray:
+        return self.embedder.encode(texts, cache=cache)
+
+    def fit(self, docs: Sequence[Dict[str, Any]]) -> "VectorIndex":
+        self.docs = docs
+        if len(docs):
+            embeddings = self.encode([chunk_text(doc) for doc in docs])
+            self.embeddings = embeddings.astype(self.dtype, copy=False)
+        return self
+
+    def add(self, docs: Sequence[Dict[str, Any]]):
+        """
+        Embed and append more chunks without re-encoding the existing ones.
+        """
+        if not len(docs):
+            return
+        embeddings = self.encode([chunk_text(doc) for doc in docs]).astype(self.dtype, copy=False)
+
+        if self.ann is not None:
+            self.ann.add(embeddings)
+        elif len(self.docs):
+            self.embeddings = np.concatenate([self.embeddings, embeddings])
+        else:
+            self.embeddings = embeddings
+
+        self.docs = list(self.docs) + list(docs)
+
+    def search(self, query: str, num_results: int = 10) -> List[Dict[str, Any]]:
+        return self.search_many([query], num_results=num_results)[0]
+
+    def search_many(self, queries: List[str], num_results: int = 10) -> List[List[Dict[str, Any]]]:
+        """
+        Score all queries with one (queries x dim) @ (dim x docs) product.
+        """
+        if not queries or not len(self.docs):
+            return [[] for _ in queries]
+
+        # float16 embeddings are upcast here; NumPy has no fast float16 matmul
+        query_vecs = self.encode(queries, cache=False).astype(np.float32, copy=False)
+
+        if self.ann is not None:
+            return [
+                [self.docs[i] for i in ids]
+                for ids in self.ann.search(query_vecs, num_results)
+            ]
+
+        scores = query_vecs @ self.embeddings.T
+
+        return [
+            [self.docs[i] for i in top_k_indices(row, num_results)]
+            for row in scores
+        ]
+
+
+class VectorSearchTools(SearchTools):
+    """
+    SearchTools backed by a VectorIndex: same search, search_many and
+    read_file tools, answered by embedding similarity instead of TF-IDF.
+    """
+
+    def _build_index(self, chunks):
+        index = VectorIndex(
+            dtype=self.index.dtype.name,
+            n_lists=self.index.n_lists,
+            n_probe=self.index.n_probe,
+            embedder=self.index.embedder,
+        )
+        return index.fit(chunks)
+
+    def _batch_search(self, queries: List[str]) -> List[List[Dict[str, Any]]]:
+        return self.index.search_many(queries, num_results=self.top_k)
+
+
+def vector_index_config(
+        chunk_size: int,
+        chunk_step: int,
+        chunking: str,
+        model_name: str,
+        dtype: str,
+        n_lists: int | None = None
+) -> Dict[str, Any]:
+    config = search_tools.index_config(chunk_size, chunk_step, chunking)
+    config.update({
+        "backend": "vector",
+        "model": model_name,
+        "dtype": dtype,
+    })
+    if n_lists is not None:
+        config["n_lists"] = n_lists
+    return config
+
+
+def _prepare_vector_search_tools(
+        raw_files: Iterable[docs.RawRepositoryFile],
+        chunk_size: int = 2000,
+        chunk_step: int = 1000,
+        top_k: int = 5,
+        chunking: str = "sliding_window",
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        dtype: str = "float32",
+        n_lists: int | None = None,
+        n_probe: int = DEFAULT_N_PROBE,
+        embedding_cache_dir: Path | None = DEFAULT_EMBEDDING_CACHE_DIR
+) -> VectorSearchTools:
+    state = IndexState(chunk_size=chunk_size, chunk_step=chunk_step, chunking=chunking)
+    state.update(raw_files)
+
+    index = VectorIndex(
+        dtype=dtype,
+        n_lists=n_lists,
+        n_probe=n_probe,
+        embedder=Embedder(model_name, cache_dir=embedding_cache_dir),
+    )
+    index.fit(state.all_chunks())
+
+    return VectorSearchTools(
+        index=index,
+        file_index=search_tools.prepare_file_index(state.documents.values()),
+        top_k=top_k,
+        state=state
+    )
+
+
+def save_vector_search_tools(
+        tools: VectorSearchTools,
+        path: Path,
+        config_hash: str | None = None
+) -> Path:
+    arrays = {"embeddings": tools.index.embeddings}
+
+    ann = tools.index.ann
+    if ann is not None and ann.is_trained:
+        arrays.update({f"ivf.{name}": values for name, values in ann.to_arrays().items()})
+
+    return search_tools.save_search_tools(tools, path, config_hash=config_hash, arrays=arrays)
+
+
+def load_vector_search_tools(
+        path: Path,
+        top_k: int | None = None,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        n_lists: int | None = None,
+        n_probe: int = DEFAULT_N_PROBE,
+        embedding_cache_dir: Path | None = DEFAULT_EMBEDDING_CACHE_DIR
+) -> VectorSearchTools | None:
+    """
+    Open a store written by save_vector_search_tools. The embeddings and
+    IVF lists are memory-mapped, not read.
+    """
+    header = search_tools.read_store_header(path)
+    if header is None:
+        return None
+
+    metadata = index_store.read_metadata(path)
+    embeddings = index_store.load_array(path, "embeddings")
+
+    index = VectorIndex(
+        dtype=embeddings.dtype.name,
+        n_lists=n_lists,
+        n_probe=n_probe,
+        embedder=Embedder(model_name, cache_dir=embedding_cache_dir),
+    )
+    if (Path(path) / "ivf.centroids.npy").exists():
+        index.ann = IVFIndex.from_arrays(
+            embeddings,
+            **{
+                name: index_store.load_array(path, f"ivf.{name}")
+                for name in ("centroids", "ids", "offsets")
+            },
+            n_probe=n_probe,
+        )
+    else:
+        index.embeddings = embeddings
+    index.docs = index_store.load_chunks(path, header, metadata)
+
+    state = search_tools.load_state(path, header, metadata)
+    index_store.mark_used(path)
+
+    return VectorSearchTools(
+        index=index,
+        file_index=index_store.StoredFileIndex(state.documents),
+        top_k=header["params"]["top_k"] if top_k is None else top_k,
+        state=state
+    )
+
+
+def prepare_vector_search_tools(
+        chunk_size: int,
+        chunk_step: int,
+        top_k: int,
+        refresh: bool = False,
+        chunking: str = "sliding_window",
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        dtype: str = "float32",
+        n_lists: int | None = None,
+        n_probe: int = DEFAULT_N_PROBE,
+        cache_dir: Path = index_store.DEFAULT_CACHE_DIR,
+        embedding_cache_dir: Path | None = DEFAULT_EMBEDDING_CACHE_DIR,
+        source: search_tools.DocsSource | None = None
+) -> VectorSearchTools:
+    """
+    Return vector search tools for the current docs, built or loaded from
+    the cache like search_tools.prepare_search_tools.
+
+    n_lists switches to approximate IVF search and is part of the cache
+    key; n_probe only affects queries and can change between runs.
+    """
+    return search_tools.prepare_cached(
+        config=vector_index_config(chunk_size, chunk_step, chunking, model_name, dtype, n_lists),
+        load=partial(
+            load_vector_search_tools,
+            top_k=top_k,
+            model_name=model_name,
+            n_lists=n_lists,
+            n_probe=n_probe,
+            embedding_cache_dir=embedding_cache_dir,
+        ),
+        build=partial(
+            _prepare_vector_search_tools,
+            chunk_size=chunk_size,
+            chunk_step=chunk_step,
+            top_k=top_k,
+            chunking=chunking,
+            model_name=model_name,
+            dtype=dtype,
+            n_lists=n_lists,
+            n_probe=n_probe,
+            embedding_cache_dir=embedding_cache_dir,
+        ),
+        save=save_vector_search_tools,
+        refresh=refresh,
+        cache_dir=cache_dir,
+        source=source,
+    )
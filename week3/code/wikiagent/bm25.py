@@ -0,0 +1,377 @@
+"""
+BM25 search over an inverted index, a drop-in for minsearch's
+AppendableIndex (same fit/append/search interface and tokenizer; the
+tokenizer is vendored below because minsearch doesn't export it).
+
+Every text field has its own inverted index: term -> posting list, where
+a posting list is a pair of array('I') with the ids of the documents that
+contain the term and the term's frequency in each. A query only reads the
+posting lists of its terms, so its cost grows with how many documents
+contain those terms, not with the size of the corpus, and an append only
+touches the posting lists of the new document's terms.
+
+Field scores are combined like minsearch: each field's BM25 score is
+multiplied by its boost_dict weight (default 1) and summed.
+
+filter_dict keeps only documents whose keyword fields equal the given
+values. Every (field, value) gets a bitmap, a NumPy bool array over the
+doc ids, built the first time the value is filtered on and extended on
+later queries as documents are appended. A filtered query intersects the
+bitmaps of its filters and drops the excluded postings before scoring,
+so the more selective the filter, the less work the query does.
+"""
+import re
+import math
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+# text index backends create_index can build; minsearch stays the default
+INDEX_BACKENDS = ("minsearch", "bm25")
+DEFAULT_INDEX_BACKEND = "minsearch"
+
+# minsearch.append.Tokenizer.DEFAULT_STOP_WORDS (minsearch 0.0.7)
+STOP_WORDS = frozenset({
+    "a", "about", "above", "after", "again", "against", "all", "am", "an", "and",
+    "any", "are", "aren't", "as", "at", "be", "because", "been", "before", "being",
+    "below", "between", "both", "but", "by", "can't", "cannot", "could", "couldn't",
+    "did", "didn't", "do", "does", "doesn't", "doing", "don't", "down", "during",
+    "each", "few", "for", "from", "further", "had", "hadn't", "has", "hasn't",
+    "have", "haven't", "having", "he", "he'd", "he'll", "he's", "her", "here",
+    "here's", "hers", "herself", "him", "himself", "his", "how", "how's", "i",
+    "i'd", "i'll", "i'm", "i've", "if", "in", "into", "is", "isn't", "it", "it's",
+    "its", "itself", "let's", "me", "more", "most", "mustn't", "my", "myself", "no",
+    "nor", "not", "of", "off", "on", "once", "only", "or", "other", "ought", "our",
+    "ours", "ourselves", "out", "over", "own", "same", "shan't", "she", "she'd",
+    "she'll", "she's", "should", "shouldn't", "so", "some", "such", "than", "that",
+    "that's", "the", "their", "theirs", "them", "themselves", "then", "there",
+    "there's", "these", "they", "they'd", "they'll", "they're", "they've", "this",
+    "those", "through", "to", "too", "under", "until", "up", "very", "was",
+    "wasn't", "we", "we'd", "we'll", "we're", "we've", "were", "weren't", "what",
+    "what's", "when", "when's", "where", "where's", "which", "while", "who",
+    "who's", "whom", "why", "why's", "with", "won't", "would", "wouldn't", "you",
+    "you'd", "you'll", "you're", "you've", "your", "yours", "yourself", "yourselves"
+})
+
+
+class Tokenizer:
+    """
+    Lowercases text, splits it on whitespace, non-word characters and
+    digits, and drops stop words, like minsearch.append.Tokenizer.
+    """
+
+    def __init__(self, pattern=r"[\s\W\d]+", stop_words=None):
+        """
+        Args:
+            pattern (str): Regex to split the text on.
+            stop_words (set, optional): Stop words to drop; defaults to
+                STOP_WORDS, an empty set keeps every token.
+        """
+        self.pattern = re.compile(pattern)
+        self.stop_words = STOP_WORDS if stop_words is None else stop_words
+
+    def tokenize(self, text):
+        if not text:
+            return []
+        tokens = [token for token in self.pattern.split(text.lower()) if token]
+        if self.stop_words:
+            tokens = [token for token in tokens if token not in self.stop_words]
+        return tokens
+
+
+class Postings:
+    """
+    Posting list of one term in one field: parallel doc id and term
+    frequency arrays, in insertion (= doc id) order.
+    """
+
+    __slots__ = ("doc_ids", "tfs")
+
+    def __init__(self):
+        self.doc_ids = array("I")
+        self.tfs = array("I")
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add(self, doc_id: int, tf: int):
+        self.doc_ids.append(doc_id)
+        self.tfs.append(tf)
+
+
+class BM25Index:
+    """
+    Appendable BM25 index with per-field boosts and keyword filters.
+
+    Attributes:
+        text_fields (list): Text field names to index.
+        keyword_fields (list): Keyword field names to filter on.
+        docs (list): Indexed documents; doc ids are positions in this list.
+        postings (dict): field -> term -> Postings.
+        doc_lengths (dict): field -> array('I') of token counts per document.
+        keyword_data (dict): field -> list of keyword values per document.
+        keyword_codes (dict): field -> array('I') of keyword value codes
+            per document, see keyword_values.
+        keyword_values (dict): field -> keyword value -> code.
+        bitmaps (dict): (field, code) -> bool array of the documents with
+            that keyword value, see keyword_bitmap.
+    """
+
+    def __init__(self, text_fields, keyword_fields=None, k1=1.2, b=0.75, stop_words=None):
+        """
+        Args:
+            text_fields (list): Text field names to index.
+            keyword_fields (list, optional): Keyword field names to filter on.
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalization, 0 (none) to 1 (full).
+            stop_words (set, optional): Stop words to drop; defaults to
+                STOP_WORDS.
+        """
+        self.text_fields = text_fields
+        self.keyword_fields = keyword_fields if keyword_fields is not None else []
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = Tokenizer(stop_words=stop_words)
+        # a search holds NumPy views of the arrays an append would resize,
+        # and tools may be called from pydantic-ai's worker threads
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.docs = []
+        self.postings = {field: {} for field in self.text_fields}
+        self.doc_lengths = {field: array("I") for field in self.text_fields}
+        self.total_lengths = {field: 0 for field in self.text_fields}
+        self.keyword_data = {field: [] for field in self.keyword_fields}
+        self.keyword_codes = {field: array("I") for field in self.keyword_fields}
+        self.keyword_values = {field: {} for field in self.keyword_fields}
+        self.bitmaps = {}
+
+    def clone_empty(self):
+        """
+        A new empty index with the same fields, k1, b and stop words.
+        """
+        return type(self)(
+            self.text_fields,
+            self.keyword_fields,
+            k1=self.k1,
+            b=self.b,
+            stop_words=self.tokenizer.stop_words,
+        )
+
+    def select(self, rows):
+        """
+        A new index with the same parameters holding only the given
+        documents (a bool mask or doc ids), renumbered in order.
+        """
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        return self.clone_empty().fit([self.docs[i] for i in rows])
+
+    def fit(self, docs):
+        """
+        Index the documents, replacing anything indexed before.
+        """
+        self._reset()
+        for doc in docs:
+            self.append(doc)
+        return self
+
+    def append(self, doc):
+        """
+        Add one document to the index.
+        """
+        with self._lock:
+            self._append(doc)
+        return self
+
+    def _append(self, doc):
+        # everything that can fail (tokenizing, hashing keyword values)
+        # happens before the index is touched, so a bad document leaves
+        # it unchanged
+        field_tokens = {
+            field: self.tokenizer.tokenize(doc.get(field) or "")
+            for field in self.text_fields
+        }
+        keyword_values = {field: doc.get(field) for field in self.keyword_fields}
+        for field, value in keyword_values.items():
+            try:
+                hash(value)
+            except TypeError:
+                raise TypeError(
+                    f"Keyword field {field!r} must be hashable, got {type(value).__name__}"
+                ) from None
+
+        doc_id = len(self.docs)
+        self.docs.append(doc)
+
+        for field, tokens in field_tokens.items():
+            self.doc_lengths[field].append(len(tokens))
+            self.total_lengths[field] += len(tokens)
+
+            field_postings = self.postings[field]
+            for term, tf in Counter(tokens).items():
+                postings = field_postings.get(term)
+                if postings is None:
+                    postings = field_postings[term] = Postings()
+                postings.add(doc_id, tf)
+
+        for field, value in keyword_values.items():
+            codes = self.keyword_values[field]
+            self.keyword_data[field].append(value)
+            self.keyword_codes[field].append(codes.setdefault(value, len(codes)))
+
+    def _field_scores(self, field: str, query_terms: Counter, mask: np.ndarray | None = None):
+        """
+        BM25 contributions of one field: (doc ids, scores) arrays with one
+        entry per posting of every query term found in the field, leaving
+        out the documents that are False in mask.
+        """
+        num_docs = len(self.docs)
+        avg_length = self.total_lengths[field] / num_docs or 1.0
+        doc_lengths = np.frombuffer(self.doc_lengths[field], dtype=np.uint32)
+
+        ids, scores = [], []
+        for term, query_tf in query_terms.items():
+            postings = self.postings[field].get(term)
+            if postings is None:
+                continue
+
+            df = len(postings)
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+
+            doc_ids = np.frombuffer(postings.doc_ids, dtype=np.uint32)
+            tfs = np.frombuffer(postings.tfs, dtype=np.uint32)
+            if mask is not None:
+                kept = mask[doc_ids]
+                doc_ids, tfs = doc_ids[kept], tfs[kept]
+                if not len(doc_ids):
+                    continue
+
+            tfs = tfs.astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[doc_ids] / avg_length)
+
+            ids.append(doc_ids)
+            scores.append(query_tf * idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+        return ids, scores
+
+    def keyword_bitmap(self, field: str, value) -> np.ndarray:
+        """
+        Bool array over all doc ids, True where the keyword field equals value.
+
+        Bitmaps are cached; one built before later appends is only
+        extended over the new documents.
+        """
+        num_docs = len(self.docs)
+        code = self.keyword_values[field].get(value)
+        if code is None:
+            return np.zeros(num_docs, dtype=bool)
+
+        bitmap = self.bitmaps.get((field, code))
+        if bitmap is None or len(bitmap) < num_docs:
+            done = 0 if bitmap is None else len(bitmap)
+            codes = np.frombuffer(self.keyword_codes[field], dtype=np.uint32)
+            new_rows = codes[done:num_docs] == code
+            bitmap = new_rows if bitmap is None else np.concatenate([bitmap, new_rows])
+            self.bitmaps[(field, code)] = bitmap
+        return bitmap
+
+    def _filter_mask(self, filter_dict: Dict[str, Any]) -> np.ndarray | None:
+        """
+        Intersection of the filter_dict bitmaps, or None when nothing is
+        filtered on. Fields that aren't keyword fields are ignored.
+        """
+        bitmaps = [
+            self.keyword_bitmap(field, value)
+            for field, value in filter_dict.items()
+            if field in self.keyword_fields
+        ]
+        if not bitmaps:
+            return None
+        if len(bitmaps) == 1:
+            return bitmaps[0]
+        return np.logical_and.reduce(bitmaps)
+
+    def search(self, query, filter_dict=None, boost_dict=None, num_results=10, output_ids=False) -> List[Dict]:
+        """
+        Searches the index with the given query, filters, and boost parameters.
+
+        Args:
+            query (str): The search query string.
+            filter_dict (dict): Keyword field -> value the documents must have.
+            boost_dict (dict): Text field -> weight of its score (default 1).
+            num_results (int): The number of top results to return.
+            output_ids (bool): If True, adds an '_id' field to each document containing its index.
+
+        Returns:
+            list of dict: Matching documents, best first.
+        """
+        filter_dict = filter_dict or {}
+        boost_dict = boost_dict or {}
+
+        query_terms = Counter(self.tokenizer.tokenize(query))
+        if not self.docs or not query_terms or num_results <= 0:
+            return []
+
+        with self._lock:
+            top_ids = self._top_ids(query_terms, filter_dict, boost_dict, num_results)
+
+        if output_ids:
+            return [{**self.docs[doc_id], "_id": doc_id} for doc_id in top_ids]
+        return [self.docs[doc_id] for doc_id in top_ids]
+
+    def _top_ids(self, query_terms, filter_dict, boost_dict, num_results) -> List[int]:
+        mask = self._filter_mask(filter_dict)
+        if mask is not None and not mask.any():
+            return []
+
+        ids, scores = [], []
+        for field in self.text_fields:
+            boost = boost_dict.get(field, 1)
+            if boost == 0:
+                continue
+            field_ids, field_scores = self._field_scores(field, query_terms, mask)
+            ids.extend(field_ids)
+            scores.extend(boost * s for s in field_scores)
+
+        if not ids:
+            return []
+
+        # sum the contributions per document, touching only the candidates
+        candidates, positions = np.unique(np.concatenate(ids), return_inverse=True)
+        totals = np.bincount(positions, weights=np.concatenate(scores))
+
+        keep = totals > 0
+        candidates, totals = candidates[keep], totals[keep]
+
+        if num_results < len(totals):
+            top = np.argpartition(-totals, num_results - 1)[:num_results]
+            candidates, totals = candidates[top], totals[top]
+
+        # best first, ties go to the lower doc id
+        return candidates[np.lexsort((candidates, -totals))].tolist()
+
+
+def create_index(text_fields, keyword_fields=None, backend=DEFAULT_INDEX_BACKEND):
+    """
+    Create an empty appendable text index.
+
+    Args:
+        text_fields (list): Text field names to index.
+        keyword_fields (list, optional): Keyword field names to filter on.
+        backend (str): "minsearch" for minsearch's AppendableIndex or
+            "bm25" for BM25Index.
+    """
+    keyword_fields = keyword_fields if keyword_fields is not None else []
+    if backend == "minsearch":
+        from minsearch import AppendableIndex
+        return AppendableIndex(text_fields=text_fields, keyword_fields=keyword_fields)
+    if backend == "bm25":
+        return BM25Index(text_fields=text_fields, keyword_fields=keyword_fields)
+    raise ValueError(f"Unknown index backend {backend!r}, expected one of {INDEX_BACKENDS}")
@@ -26,9 +26,11 @@ def test_get_page_is_invoked_3_times():
     result = main.run_agent_sync(user_prompt)
 
     tool_calls = get_tool_calls(result)
-    count = sum(1 for call in tool_calls if call.name == "get_keyword_page")
+    count = sum(
+        len(call.args["keywords"]) for call in tool_calls if call.name == "get_keyword_pages"
+    )
 
-    assert count >= 3, f"Expected at least 3 get_keyword_page tool calls, got {count}"
+    assert count >= 3, f"Expected at least 3 pages requested from get_keyword_pages, got {count}"
 
 
 def test_agent_reference():
@@ -1,17 +1,249 @@
 
+import re
+import json
+import time
+import hashlib
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
 import requests
 from requests.exceptions import RequestException, HTTPError, Timeout
 from typing import List, Dict
 
 
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+DEFAULT_PAGE_CACHE_PATH = Path(".cache") / "wiki_pages.sqlite"
+
+# hits update accessed_at in memory and write it back at most this often
+DEFAULT_ACCESS_FLUSH_INTERVAL = 30
+
+# IVF lists of the chunk embeddings index SearchTools creates; it searches
+# exactly until it holds 8 chunks per list
+DEFAULT_ANN_LISTS = 32
+
+
+def get_encoding():
+    """
+    The tokenizer of the docs pipeline, see docs.get_encoding. Imported on
+    first use, so only token windows need the code directory on the path.
+    """
+    import docs
+    return docs.get_encoding()
+
+
+def normalize_key(text: str) -> str:
+    """
+    Normalize a keyword or page title the way Wikipedia does: only the
+    first character is case-insensitive, so 'Capybara' and 'capybara '
+    map to the same key while 'SAT' and 'Sat' stay apart. '+' / '_' are
+    treated as spaces.
+    """
+    text = re.sub(r"[\s+_]+", " ", text).strip()
+    return text[:1].upper() + text[1:]
+
+
+class PageCache:
+    """
+    Persistent SQLite cache for Wikipedia responses.
+
+    Entries expire after ttl seconds. When the stored values exceed
+    max_bytes, the least recently used entries are evicted. Hits and
+    misses are counted for monitoring.
+
+    A hit is a read only: access times are kept in memory and written in
+    one batch every flush_interval seconds, before an eviction, and on
+    flush() or close().
+    """
+
+    def __init__(
+            self,
+            path: str | Path = DEFAULT_PAGE_CACHE_PATH,
+            ttl: float = 24 * 60 * 60,
+            max_bytes: int = 100 * 1024 * 1024,
+            flush_interval: float = DEFAULT_ACCESS_FLUSH_INTERVAL
+    ):
+        """
+        Args:
+            path (str | Path): SQLite database file. Use ":memory:" for a
+                non-persistent cache.
+            ttl (float): Seconds an entry stays valid.
+            max_bytes (int): Upper bound on the total size of stored values.
+            flush_interval (float): Seconds between writes of the access
+                times of hits.
+        """
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+
+        self.hits = 0
+        self.misses = 0
+
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._accessed = {}
+        self._flushed_at = time.time()
+
+        # tools may be called from pydantic-ai's worker threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)"
+        )
+        self._conn.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+    def get(self, key: str):
+        """
+        Return the cached value for key, or None if it's missing or expired.
+        """
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._accessed.pop(key, None)
+                    self._conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._accessed[key] = now
+            if now - self._flushed_at >= self.flush_interval:
+                self._flush_accessed(now)
+                self._conn.commit()
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def set(self, key: str, value) -> None:
+        """
+        Store a JSON-serializable value and evict old entries if over budget.
+        """
+        data = json.dumps(value)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            self._accessed.pop(key, None)
+            # eviction orders by accessed_at, so it has to be current
+            self._flush_accessed(now)
+            self._evict()
+            self._conn.commit()
+
+    def flush(self) -> None:
+        """
+        Write the pending access times of hits.
+        """
+        with self._lock:
+            self._flush_accessed(time.time())
+            self._conn.commit()
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute("DELETE FROM pages")
+            self._conn.commit()
+
+    def _flush_accessed(self, now: float) -> None:
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE pages SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._accessed.items()],
+            )
+            self._accessed.clear()
+        self._flushed_at = now
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT key, size FROM pages ORDER BY accessed_at ASC"
+        ).fetchall()
+
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+
+        self._conn.executemany("DELETE FROM pages WHERE key = ?", evicted)
+
+
 class WikiSearch:
     """
     A lightweight wrapper for interacting with the Wikipedia API.
 
     This class allows you to search for Wikipedia articles based on a keyword,
     store the results, and fetch raw page contents for each matched title.
+
+    Sync methods reuse one requests session; the async methods share one
+    pooled keep-alive HTTP client and limit concurrent requests per host.
     """
 
+    def __init__(
+            self,
+            max_connections: int = 10,
+            max_per_host: int = 4,
+            timeout: float = 10,
+            cache: PageCache | None = None
+    ):
+        """
+        Args:
+            max_connections (int): Size of the shared connection pool.
+            max_per_host (int): Maximum concurrent requests to a single host.
+            timeout (float): Request timeout in seconds.
+            cache (PageCache, optional): Cache for search results and pages.
+        """
+        self.cache = cache
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+
+        self._session = requests.Session()
+        self._session.headers.update(HEADERS)
+
+        self._loop = None
+        self._client = None
+        self._host_limits = {}
+
     def get_keywords(self, keyword: str) -> List[str]:
         """
         Extract related Wikipedia article titles for a given keyword.
@@ -34,25 +266,17 @@ class WikiSearch:
                     description: The main search keyword to find related Wikipedia articles.
             required: ["keyword"]
         """
-        if not keyword or not keyword.strip():
-            raise ValueError("Keyword must be a non-empty string.")
+        url = self._keywords_url(keyword)
 
-        url = f"https://en.wikipedia.org/w/api.php?action=query&format=json&list=search&srsearch={keyword}"
+        cached = self._cache_get("keywords", keyword)
+        if cached is not None:
+            return cached
 
-        response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+        response = self._session.get(url, timeout=self.timeout)
         response.raise_for_status()
 
-        json_response = response.json()
-        search_results = json_response.get("query", {}).get("search", [])
-        keyword_list = []
-
-
-        for search in search_results:
-            title = search.get("title", "").strip()
-            if title:
-                search_keyword = "+".join(title.split(" "))
-                keyword_list.append(search_keyword)
-
+        keyword_list = self._parse_keywords(response.json())
+        self._cache_set("keywords", keyword, keyword_list)
         return keyword_list
 
     def get_keyword_page(self, search_keyword: str) -> List[Dict]:
@@ -66,16 +290,186 @@ class WikiSearch:
             list[dict]: [{'title': search_keyword, 'content': page_content, 'url': search_url}]
         """
         
-        url = f"https://en.wikipedia.org/w/index.php?title={search_keyword}&action=raw"
-        response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
+        cached = self._cache_get("page", search_keyword)
+        if cached is not None:
+            return self._page_result(search_keyword, cached["content"], cached["url"])
+
+        url = self._page_url(search_keyword)
+        response = self._session.get(url, timeout=self.timeout)
         response.raise_for_status()
         
         content = response.content.decode("utf-8")
-        
 
+        return self._store_page(search_keyword, content, url)
+
+    async def get_keywords_async(self, keyword: str) -> List[str]:
+        """
+        Extract related Wikipedia article titles for a given keyword.
+
+        Args:
+            keyword (str): The search keyword or phrase.
+
+        Returns:
+            list[str]: A list of related article titles, formatted with '+'
+                    instead of spaces.
+        """
+        url = self._keywords_url(keyword)
+
+        cached = await self._cache_get_async("keywords", keyword)
+        if cached is not None:
+            return cached
+
+        response = await self._get(url)
+
+        keyword_list = self._parse_keywords(response.json())
+        await self._cache_set_async("keywords", keyword, keyword_list)
+        return keyword_list
+
+    async def get_keyword_page_async(self, search_keyword: str) -> List[Dict]:
+        """
+        Fetch the raw Wikipedia page content for a single keyword.
+
+        Args:
+            search_keyword (str): One Wikipedia article title.
+
+        Returns:
+            list[dict]: [{'title': search_keyword, 'content': page_content, 'url': search_url}]
+        """
+        cached = await self._cache_get_async("page", search_keyword)
+        if cached is not None:
+            return self._page_result(search_keyword, cached["content"], cached["url"])
+
+        url = self._page_url(search_keyword)
+        response = await self._get(url)
+        content = response.content.decode("utf-8")
+        return await asyncio.to_thread(self._store_page, search_keyword, content, url)
+
+    async def get_keyword_pages(self, keywords: List[str]) -> List[Dict]:
+        """
+        Fetch the raw Wikipedia pages for several keywords concurrently.
+
+        Pages that fail to download are reported and left out of the result.
+
+        Args:
+            keywords (list[str]): Wikipedia article titles.
+
+        Returns:
+            list[dict]: One {'title', 'content', 'url'} record per fetched page,
+                    in the same order as the keywords.
+        """
+        results = await asyncio.gather(
+            *(self.get_keyword_page_async(keyword) for keyword in keywords),
+            return_exceptions=True
+        )
+
+        pages = []
+        for keyword, result in zip(keywords, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Failed to fetch page. keyword: {keyword}, error: {result}")
+                continue
+            pages.extend(result)
+
+        return pages
+
+    async def aclose(self) -> None:
+        """
+        Close the shared HTTP client.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+        self._loop = None
+        self._client = None
+        self._host_limits = {}
+
+    async def _get(self, url: str) -> httpx.Response:
+        client = await self._get_client()
+
+        host = urlsplit(url).hostname
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+
+        async with self._host_limits[host]:
+            response = await client.get(url)
+
+        response.raise_for_status()
+        return response
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        # pooled connections belong to the event loop that opened them,
+        # so every new loop (e.g. each asyncio.run) gets its own client
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            previous = self._client
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                headers=HEADERS,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._host_limits = {}
+
+            if previous is not None:
+                try:
+                    await previous.aclose()
+                except Exception:
+                    # its loop is gone; the sockets are released anyway
+                    pass
+        return self._client
+
+    def _keywords_url(self, keyword: str) -> str:
+        if not keyword or not keyword.strip():
+            raise ValueError("Keyword must be a non-empty string.")
+
+        return f"https://en.wikipedia.org/w/api.php?action=query&format=json&list=search&srsearch={keyword}"
+
+    def _parse_keywords(self, json_response: Dict) -> List[str]:
+        search_results = json_response.get("query", {}).get("search", [])
+        keyword_list = []
+
+        for search in search_results:
+            title = search.get("title", "").strip()
+            if title:
+                search_keyword = "+".join(title.split(" "))
+                keyword_list.append(search_keyword)
+
+        return keyword_list
+
+    def _page_url(self, search_keyword: str) -> str:
+        return f"https://en.wikipedia.org/w/index.php?title={search_keyword}&action=raw"
+
+    def _cache_get(self, kind: str, key: str):
+        if self.cache is None:
+            return None
+        return self.cache.get(f"{kind}:{normalize_key(key)}")
+
+    def _cache_set(self, kind: str, key: str, value) -> None:
+        if self.cache is not None:
+            self.cache.set(f"{kind}:{normalize_key(key)}", value)
+
+    # SQLite calls block, so the async methods run them in a worker thread
+
+    async def _cache_get_async(self, kind: str, key: str):
+        if self.cache is None:
+            return None
+        return await asyncio.to_thread(self._cache_get, kind, key)
+
+    async def _cache_set_async(self, kind: str, key: str, value) -> None:
+        if self.cache is not None:
+            await asyncio.to_thread(self._cache_set, kind, key, value)
+
+    def _store_page(self, search_keyword: str, content: str, url: str) -> List[Dict]:
+        # empty responses are not cached so they're retried next time
+        if content:
+            self._cache_set("page", search_keyword, {"content": content, "url": url})
+        return self._page_result(search_keyword, content, url)
+
+    def _page_result(self, search_keyword: str, content: str, url: str) -> List[Dict]:
         if not content:
             print(f"⚠️ No valid pages were fetched. keyword: {search_keyword}")
-        
+
         return [{"title": search_keyword, "content": content, "url": url}]
     
 
@@ -84,10 +478,44 @@ class WikiSearch:
 
 from typing import Any, Dict, List
 
+
+def select_index(index, keep):
+    """
+    A new text index holding only the documents where keep is True,
+    built with the same parameters as index.
+
+    BM25Index has its own select; minsearch's AppendableIndex is rebuilt
+    with the same fields and stop words.
+    """
+    if hasattr(index, "select"):
+        return index.select(keep)
+    remaining = [doc for doc, kept in zip(index.docs, keep) if kept]
+    empty = type(index)(
+        text_fields=index.text_fields,
+        keyword_fields=index.keyword_fields,
+        stop_words=index.tokenizer.stop_words,
+    )
+    return empty.fit(remaining)
+
+
 class SearchTools:
 
-    def __init__(self, index):
+    def __init__(self, index, embedder=None, ann=None):
         self.index = index
+        # normalized title -> content hash of the page currently indexed
+        self.pages = {}
+        # optional embedder.Embedder: add_entry then embeds the new chunks
+        # (unchanged pages come from its cache) and search ranks by cosine
+        self.embedder = embedder
+        # optional ann_index.IVFIndex over the chunk embeddings, row i is
+        # index.docs[i]; created on the first embedded add_entry if not given
+        self.ann = ann
+
+    @property
+    def embeddings(self):
+        if self.ann is None or not len(self.ann):
+            return None
+        return self.ann.vectors
 
     def search(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
         """
@@ -122,6 +550,9 @@ class SearchTools:
                 }
             ]
         """
+        if self.embeddings is not None:
+            return self._vector_search(query, num_results)
+
         boost = {"title": 2.0, "summary": 1.0, "details": 0.5}
         
         results = self.index.search(
@@ -131,6 +562,20 @@ class SearchTools:
         )
         return results
 
+    def _vector_search(self, query, num_results):
+        query_vec = self.embedder.encode([query], cache=False)
+        top = self.ann.search(query_vec, k=num_results)[0]
+        return [self.index.docs[i] for i in top]
+
+    def _embed(self, chunks):
+        vectors = self.embedder.encode([f"{c['title']} {c['content']}" for c in chunks])
+        if self.ann is None:
+            # imported on first use like docs, so BM25-only use doesn't need it
+            from ann_index import IVFIndex
+            self.ann = IVFIndex(n_lists=DEFAULT_ANN_LISTS)
+        # appended in place to the index's growable buffer
+        self.ann.add(vectors)
+
     def _chunk_with_word_window(self, data, chunk_size=200, overlap=50):
         """
         Split a single record into overlapping word-based chunks.
@@ -144,24 +589,31 @@ class SearchTools:
             list[dict]: [{'title': ..., 'content': ...}, ...]
         """
         title = data["title"]
-        words = data["content"].strip().split(" ")
+        content = data["content"].strip()
         chunks = []
-        
-        start = 0
-        total_words = len(words)
-        
-        while start < total_words:
-            end = start + chunk_size
-            chunk_words = words[start:end]
-            chunk_text = " ".join(chunk_words)
-            
+
+        # Words are separated by single spaces, so instead of splitting the
+        # page into a list of words and joining every window back together,
+        # locate the spaces once (vectorized over the code points) and slice
+        # each window straight out of the page.
+        codepoints = np.frombuffer(content.encode("utf-32-le"), dtype=np.uint32)
+        spaces = np.flatnonzero(codepoints == 32)
+        total_words = len(spaces) + 1
+
+        # word i spans (spaces[i - 1] + 1, spaces[i]), with the page edges
+        # standing in for the missing spaces before the first/after the last word
+        boundaries = np.concatenate(([-1], spaces, [len(content)]))
+        first_words = np.arange(0, total_words, chunk_size - overlap)
+        last_words = np.minimum(first_words + chunk_size, total_words) - 1
+        char_starts = (boundaries[first_words] + 1).tolist()
+        char_ends = boundaries[last_words + 1].tolist()
+
+        for start, end in zip(char_starts, char_ends):
             chunks.append({
                 "title": title,
-                "content": chunk_text
+                "content": content[start:end]
             })
-            
-            start += chunk_size - overlap  # slide window forward
-        
+
         return chunks
     
     def _chunk_with_sliding_window(self, data, chunk_size=500, overlap=100):
@@ -188,7 +640,7 @@ class SearchTools:
         """
         title = data["title"]
         content = data["content"].strip()
-        url = data["url"]
+        url = data.get("url")
         chunks = []
 
         start = 0
@@ -207,7 +659,49 @@ class SearchTools:
 
         return chunks
 
-    def add_entry(self, data, chunk_size=500, overlap=100):
+    def _chunk_with_token_window(self, data, chunk_size=128, overlap=32):
+        """
+        Split a single text record into overlapping token-based chunks.
+
+        Like _chunk_with_sliding_window, but chunk_size and overlap are
+        counted in tokens. Each chunk is an exact slice of the content and
+        carries its token count.
+
+        Returns:
+            list[dict]: A list of chunk dictionaries with keys:
+                - 'title' (str)
+                - 'content' (str)
+                - 'url' (str or None)
+                - 'num_tokens' (int)
+        """
+        title = data["title"]
+        content = data["content"].strip()
+        url = data.get("url")
+        chunks = []
+
+        encoding = get_encoding()
+        tokens = encoding.encode(content, disallowed_special=())
+        _, offsets = encoding.decode_with_offsets(tokens)
+        total_tokens = len(tokens)
+
+        start = 0
+        while start < total_tokens:
+            end = min(start + chunk_size, total_tokens)
+            char_end = offsets[end] if end < total_tokens else len(content)
+
+            chunks.append({
+                "title": title,
+                "content": content[offsets[start]:char_end],
+                "url": url,
+                "num_tokens": end - start
+            })
+            if end == total_tokens:
+                break
+            start += chunk_size - overlap
+
+        return chunks
+
+    def add_entry(self, data, chunk_size=500, overlap=100, unit="chars"):
 
         """
         Add text entries into the index after chunking them into overlapping windows.
@@ -217,6 +711,10 @@ class SearchTools:
         chunks using a sliding window, and appends the resulting chunks to the
         internal index.
 
+        Pages are deduplicated by title: a record whose title is already indexed
+        with the same content is skipped, and one with changed content replaces
+        the previously indexed chunks.
+
         Args:
             data (list[dict]): A list of records, each with keys:
                 - 'title' (str): The title of the document.
@@ -224,9 +722,12 @@ class SearchTools:
                 - 'url' (str, optional): The document’s source URL.
             chunk_size (int, optional): Number of characters per chunk. Defaults to 500.
             overlap (int, optional): Overlapping characters between chunks for context continuity. Defaults to 100.
+            unit (str, optional): "chars" or "tokens". With "tokens", chunk_size and
+                overlap are counted in tokens and every chunk gets 'num_tokens'.
 
         Returns:
-            list[dict]: A flattened list of all generated text chunks.
+            list[dict]: A flattened list of all newly indexed text chunks.
+                Skipped duplicates contribute no chunks.
                 Each element has the structure:
                 {
                     'title': str,
@@ -237,11 +738,41 @@ class SearchTools:
         all_chunks = []
 
         for record in data:
-            chunks = self._chunk_with_sliding_window(record, chunk_size, overlap)
+            key = normalize_key(record["title"])
+            content_hash = hashlib.sha256(record["content"].encode("utf-8")).hexdigest()
+
+            if key in self.pages:
+                if self.pages[key] == content_hash:
+                    print(f"skipping already indexed page: {record['title']}")
+                    continue
+                self._remove_page(key)
+
+            if unit == "tokens":
+                chunks = self._chunk_with_token_window(record, chunk_size, overlap)
+            else:
+                chunks = self._chunk_with_sliding_window(record, chunk_size, overlap)
             
             
             for chunk in chunks:
                 self.index.append(chunk)
+            if self.embedder is not None and chunks:
+                self._embed(chunks)
             all_chunks.extend(chunks)
+            self.pages[key] = content_hash
         
         return all_chunks
+
+    def _remove_page(self, key):
+        """
+        Drop all chunks of a page from the index.
+
+        The appendable index has no delete, so it is rebuilt from the
+        remaining chunks.
+        """
+        keep = np.array([normalize_key(doc["title"]) != key for doc in self.index.docs], dtype=bool)
+
+        if self.ann is not None:
+            self.ann = self.ann.select(keep)
+
+        self.index = select_index(self.index, keep)
+        del self.pages[key]
@@ -1,12 +1,14 @@
 # tool calling monitoring 
-from pydantic_ai import Agent
+import os
+
+from pydantic_ai import Agent, Tool
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 load_dotenv()
 from pydantic_ai.messages import FunctionToolCallEvent
-from minsearch import AppendableIndex
 # from wikiagent.tools import WikiSearch, SearchTools
-from tools import WikiSearch, SearchTools
+from tools import WikiSearch, SearchTools, PageCache
+from bm25 import create_index, DEFAULT_INDEX_BACKEND
 
 
 class NamedCallback:
@@ -45,16 +47,14 @@ You are an intelligent assistant designed to answer user questions using Wikiped
    - Do not process more than 3 keywords, even if more are returned.
 
 3. **Fetch and index pages**:
-   - For **each keyword** in the list:
-     a. Call `wiki_search.get_keyword_page(keyword)` to fetch the Wikipedia page for that keyword.  
-     b. Immediately call `search_tool.add_entry()` to chunk and index the page content.
-     - Ensure `page_data` includes:
+   - Call `wiki_search.get_keyword_pages(keywords)` **once** with all the selected keywords; the pages are downloaded concurrently.
+   - Immediately call `search_tool.add_entry()` with the returned pages to chunk and index them.
+     - Ensure every record in `data` includes:
             - 'title' (str) — search keywords
             - 'content' (str) — content from the wiki of the keyword
             - 'url' (str or None) — url of the wikipdia. if missing, set to None
-     - If a page with the same title already exists in the index, skip adding it again.
-     - This step is **mandatory** for every keyword.
-     - Do not wait until all pages are fetched — index each page immediately.
+     - If a page with the same title already exists in the index, it is skipped.
+     - This step is **mandatory** for every selected keyword.
      
 
 4. **Search the indexed content**:
@@ -67,17 +67,21 @@ You are an intelligent assistant designed to answer user questions using Wikiped
 
 **Important rules**:
 - Only one main keyword should be parsed from the user query.  
-- Every keyword returned by `get_keywords` **must** be fetched and indexed individually.  
-- Call `add_entry` **immediately after fetching each page**.  
+- Every selected keyword **must** be fetched and indexed.  
+- Fetch all selected pages with a single `get_keyword_pages` call, then call `add_entry` **immediately**.  
 - Always search using the **original user query**, not the keywords.  
 - Follow all steps strictly in order.
 """
 
-wiki_search = WikiSearch()
+wiki_search = WikiSearch(cache=PageCache())
+
+# "minsearch" (AppendableIndex) or "bm25" (BM25Index, faster on large indexes)
+INDEX_BACKEND = os.getenv("INDEX_BACKEND", DEFAULT_INDEX_BACKEND)
 
-index = AppendableIndex(
+index = create_index(
     text_fields=["title", "content"],
-    keyword_fields=["title"]
+    keyword_fields=["title"],
+    backend=INDEX_BACKEND
 )
 search_tool = SearchTools(index)
 
@@ -106,9 +110,10 @@ class WikipediaResultArticle(BaseModel):
 
 def create_agent(config = None) -> Agent:
 
-    index = AppendableIndex(
+    index = create_index(
         text_fields=["title", "content"],
-        keyword_fields=["title"]
+        keyword_fields=["title"],
+        backend=INDEX_BACKEND
     )
     search_tool = SearchTools(index)
 
@@ -116,7 +121,12 @@ def create_agent(config = None) -> Agent:
     wiki_agent = Agent(
         name='Wikipedia',
         instructions=wiki_instruction,
-        tools=[search_tool.search, search_tool.add_entry, wiki_search.get_keywords, wiki_search.get_keyword_page],
+        tools=[
+            search_tool.search,
+            search_tool.add_entry,
+            Tool(wiki_search.get_keywords_async, name="get_keywords"),
+            Tool(wiki_search.get_keyword_pages, name="get_keyword_pages"),
+        ],
         model='gpt-4o-mini',
         # model='gpt-4.1',
         output_type=WikipediaResultArticle
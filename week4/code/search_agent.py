@@ -61,6 +61,8 @@ Requirements:
 - For each section, include references listing all the sources
     you used to write that section.
 - Do not perform more than 6 searches per query.
+- To run several searches at once, pass all the queries to search_many;
+    each query counts as one search.
 """.strip()
 
 
@@ -71,6 +73,9 @@ def force_answer_after_6_searches(messages: list[ModelMessage]) -> list[ModelMes
         for p in m.parts:
             if p.part_kind == 'tool-call' and p.tool_name == 'search':
                 num_tool_calls = num_tool_calls + 1
+            elif p.part_kind == 'tool-call' and p.tool_name == 'search_many':
+                # every query of a batched search counts as a search
+                num_tool_calls = num_tool_calls + len(p.args_as_dict().get('queries', []))
 
     if num_tool_calls >= 6:
         print('forcing output')
@@ -96,7 +101,7 @@ def create_agent(config: AgentConfig = None) -> Agent:
     agent = Agent(
         name="search",
         instructions=search_instructions,
-        tools=[tools.search, tools.read_file],
+        tools=[tools.search, tools.search_many, tools.read_file],
         model=config.model,
         output_type=SearchResultArticle,
         history_processors=[force_answer_after_6_searches]
@@ -1,18 +1,363 @@
-import io
+import os
+import re
+import json
+import time
+import zlib
+import hashlib
+import fnmatch
 import zipfile
+import tempfile
+import warnings
 import traceback
 
-from dataclasses import dataclass
-from typing import Iterable, Callable, Any, Dict, List
+from array import array
+from pathlib import Path
+from functools import lru_cache, partial
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Callable, Any, Dict, List, BinaryIO, Pattern
 
+import yaml
 import requests
 import frontmatter
 
+from requests.adapters import HTTPAdapter
+
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+DEFAULT_CACHE_DIR = Path(".cache") / "github"
+DEFAULT_CACHE_TTL = 60 * 60
+
+# below this many files the process pool startup costs more than it saves
+PARALLEL_PARSE_MIN_FILES = 200
+
+DEFAULT_DOWNLOAD_WORKERS = 4
+
+DEFAULT_TOKENIZER_MODEL = "gpt-4o-mini"
+
+_COMMIT_SHA = re.compile(r"^[0-9a-f]{40}$")
+
 
 @dataclass
 class RawRepositoryFile:
     filename: str
     content: str
+    crc32: int | None = None
+    repo: str | None = None
+    commit: str | None = None
+
+
+@dataclass(frozen=True)
+class RepositorySpec:
+    owner: str
+    name: str
+    ref: str = "main"
+
+
+@dataclass
+class ManifestDiff:
+    added: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> list[str]:
+        return self.added + self.modified
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.deleted)
+
+
+def is_commit_sha(ref: str) -> bool:
+    return bool(_COMMIT_SHA.match(ref))
+
+
+def _write_response(resp: requests.Response, out: BinaryIO, hasher=None) -> None:
+    """
+    Write a streamed response body into a file object in chunks.
+
+    Args:
+        resp: Response opened with stream=True
+        out: Writable binary file object
+        hasher: Optional hashlib object updated with every chunk
+    """
+    for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+        out.write(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+
+
+class RepositoryArchiveCache:
+    """
+    On-disk cache for repository zip archives.
+
+    Archives are stored content-addressed as blobs/<sha256>.zip, and each
+    owner/repo/ref has a small JSON entry pointing to its current blob
+    together with the ETag and Last-Modified headers of the response.
+    Entries younger than the TTL are served without any request, older
+    ones are revalidated with a conditional GET. Archives pinned to a
+    commit SHA never change and are never revalidated. A blob replaced by
+    a new download is deleted once no entry points to it anymore.
+    """
+
+    def __init__(self, cache_dir: str | Path = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_CACHE_TTL):
+        """
+        Initialize the archive cache.
+
+        Args:
+            cache_dir: Directory to keep the archives and their entries in
+            ttl: Number of seconds an entry is trusted without revalidation
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+
+    def fetch(
+            self,
+            url: str,
+            repo_owner: str,
+            repo_name: str,
+            ref: str,
+            session: requests.Session | None = None
+    ) -> Path:
+        """
+        Return the path to the cached archive, downloading it if needed.
+
+        Args:
+            url: The archive download URL
+            repo_owner: The owner/organization of the GitHub repository
+            repo_name: The name of the GitHub repository
+            ref: The branch, tag or commit the archive was built from
+            session: Optional session to download with
+
+        Returns:
+            Path to the zip archive on disk
+
+        Raises:
+            Exception: If the repository download fails
+        """
+        entry_path = self._entry_path(repo_owner, repo_name, ref)
+        entry = self._load_entry(entry_path)
+        previous_sha256 = entry["sha256"] if entry is not None else None
+
+        if entry is not None and not self._blob_path(entry["sha256"]).exists():
+            entry = None
+
+        if entry is not None:
+            if is_commit_sha(ref) or time.time() - entry["fetched_at"] < self.ttl:
+                return self._blob_path(entry["sha256"])
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        http = session if session is not None else requests
+        with http.get(url, headers=headers, stream=True) as resp:
+            if resp.status_code == 304 and entry is not None:
+                entry["fetched_at"] = time.time()
+                self._save_entry(entry_path, entry)
+                return self._blob_path(entry["sha256"])
+
+            if resp.status_code != 200:
+                raise Exception(f"Failed to download repository: {resp.status_code}")
+
+            sha256 = self._store_blob(resp)
+            entry = {
+                "url": url,
+                "sha256": sha256,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+            }
+
+        self._save_entry(entry_path, entry)
+        if previous_sha256 is not None and previous_sha256 != sha256:
+            self._remove_unreferenced_blob(previous_sha256)
+        return self._blob_path(sha256)
+
+    def _remove_unreferenced_blob(self, sha256: str) -> None:
+        """
+        Delete a blob unless another ref entry still points to it.
+        """
+        for entry_path in (self.cache_dir / "refs").rglob("*.json"):
+            entry = self._load_entry(entry_path)
+            if entry is not None and entry.get("sha256") == sha256:
+                return
+
+        try:
+            self._blob_path(sha256).unlink(missing_ok=True)
+        except OSError:
+            # still open elsewhere on platforms that don't allow that
+            pass
+
+    def _store_blob(self, resp: requests.Response) -> str:
+        """
+        Stream a response into the blob store and return its SHA-256 digest.
+        """
+        blobs_dir = self.cache_dir / "blobs"
+        blobs_dir.mkdir(parents=True, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        tmp = tempfile.NamedTemporaryFile(dir=blobs_dir, suffix=".tmp", delete=False)
+        try:
+            with tmp:
+                _write_response(resp, tmp, hasher)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+        sha256 = hasher.hexdigest()
+        os.replace(tmp.name, self._blob_path(sha256))
+        return sha256
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.cache_dir / "blobs" / f"{sha256}.zip"
+
+    def _entry_path(self, repo_owner: str, repo_name: str, ref: str) -> Path:
+        safe_ref = ref.replace("/", "__")
+        return self.cache_dir / "refs" / repo_owner / repo_name / f"{safe_ref}.json"
+
+    def _load_entry(self, entry_path: Path) -> dict | None:
+        if not entry_path.exists():
+            return None
+
+        try:
+            return json.loads(entry_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _save_entry(self, entry_path: Path, entry: dict) -> None:
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp = tempfile.NamedTemporaryFile(
+            "w", dir=entry_path.parent, suffix=".tmp", delete=False
+        )
+        try:
+            with tmp:
+                json.dump(entry, tmp)
+        except BaseException:
+            os.unlink(tmp.name)
+            raise
+
+        os.replace(tmp.name, entry_path)
+
+
+@dataclass
+class ExtractionStats:
+    files_read: int = 0
+    bytes_read: int = 0
+    files_skipped: int = 0
+    bytes_skipped: int = 0
+
+    def __add__(self, other: "ExtractionStats") -> "ExtractionStats":
+        return ExtractionStats(
+            files_read=self.files_read + other.files_read,
+            bytes_read=self.bytes_read + other.bytes_read,
+            files_skipped=self.files_skipped + other.files_skipped,
+            bytes_skipped=self.bytes_skipped + other.bytes_skipped,
+        )
+
+
+def _compile_patterns(patterns: Iterable[str | Pattern] | None) -> Pattern | None:
+    """
+    Combine glob strings and compiled regexes into a single case-insensitive regex.
+    """
+    if not patterns:
+        return None
+
+    parts = []
+    for pattern in patterns:
+        if isinstance(pattern, str):
+            parts.append(fnmatch.translate(pattern))
+        else:
+            parts.append(pattern.pattern)
+
+    return re.compile("|".join(f"(?:{part})" for part in parts), re.IGNORECASE)
+
+
+class ZipEntryFilter:
+    """
+    Decides from the zip entry metadata alone whether a file should be read,
+    so rejected entries are never decompressed.
+
+    Rules are compiled once: extensions into a set, include/exclude globs
+    and regexes into one regex each, plus a limit on the uncompressed size.
+    """
+
+    def __init__(self,
+                allowed_extensions: Iterable[str] | None = None,
+                include: Iterable[str | Pattern] | None = None,
+                exclude: Iterable[str | Pattern] | None = None,
+                max_file_size: int | None = None,
+                filename_filter: Callable[[str], bool] | None = None
+        ):
+        """
+        Initialize the entry filter.
+
+        Args:
+            allowed_extensions: Optional set of file extensions to include
+                    (e.g., {"md", "py"}). If not provided, all file types are included
+            include: Optional glob strings or compiled regexes; if given, a path
+                    must match at least one of them
+            exclude: Optional glob strings or compiled regexes; paths matching
+                    any of them are skipped
+            max_file_size: Optional limit on the uncompressed file size in bytes
+            filename_filter: Optional callable receiving the lowercased path
+        """
+        self.allowed_extensions = None
+        if allowed_extensions is not None:
+            self.allowed_extensions = frozenset(ext.lower() for ext in allowed_extensions)
+
+        self.include = _compile_patterns(include)
+        self.exclude = _compile_patterns(exclude)
+        self.max_file_size = max_file_size
+        self.filename_filter = filename_filter
+
+    def accepts(self, filepath: str, file_size: int | None = None) -> bool:
+        """
+        Check whether a file should be read.
+
+        Args:
+            filepath: The normalized path of the file inside the repository
+            file_size: The uncompressed size from ZipInfo.file_size, if known
+
+        Returns:
+            True if the file passes every rule, False otherwise
+        """
+        # directory
+        if filepath.endswith("/"):
+            return False
+
+        filename = filepath.rpartition("/")[2]
+
+        # hidden file
+        if filename.startswith("."):
+            return False
+
+        if self.allowed_extensions:
+            name, dot, ext = filename.rpartition(".")
+            if not dot or ext.lower() not in self.allowed_extensions:
+                return False
+
+        if self.max_file_size is not None and file_size is not None:
+            if file_size > self.max_file_size:
+                return False
+
+        if self.include is not None and not self.include.match(filepath):
+            return False
+
+        if self.exclude is not None and self.exclude.match(filepath):
+            return False
+
+        if self.filename_filter is not None:
+            if not self.filename_filter(filepath.lower()):
+                return False
+
+        return True
 
 
 class GithubRepositoryDataReader:
@@ -24,7 +369,13 @@ class GithubRepositoryDataReader:
                 repo_owner: str,
                 repo_name: str,
                 allowed_extensions: Iterable[str] | None = None,
-                filename_filter: Callable[[str], bool] | None = None
+                filename_filter: Callable[[str], bool] | None = None,
+                cache: RepositoryArchiveCache | None = None,
+                ref: str = "main",
+                session: requests.Session | None = None,
+                include: Iterable[str | Pattern] | None = None,
+                exclude: Iterable[str | Pattern] | None = None,
+                max_file_size: int | None = None
         ):
         """
         Initialize the GitHub repository data reader.
@@ -35,19 +386,34 @@ class GithubRepositoryDataReader:
             allowed_extensions: Optional set of file extensions to include
                     (e.g., {"md", "py"}). If not provided, all file types are included
             filename_filter: Optional callable to filter files by their path
+            cache: Optional archive cache. If not provided, the archive is
+                    downloaded on every read
+            ref: Branch, tag or commit SHA to download. Defaults to "main"
+            session: Optional requests session to download with
+            include: Optional glob strings or compiled regexes a path must match
+            exclude: Optional glob strings or compiled regexes to skip paths by
+            max_file_size: Optional limit on the uncompressed file size in bytes
         """
+        self.repo_owner = repo_owner
+        self.repo_name = repo_name
+        self.repo = f"{repo_owner}/{repo_name}"
+        self.ref = ref
+
         prefix = "https://codeload.github.com"
         self.url = (
-            f"{prefix}/{repo_owner}/{repo_name}/zip/refs/heads/main"
+            f"{prefix}/{repo_owner}/{repo_name}/zip/{ref}"
         )
+        self.cache = cache
+        self.session = session
 
-        if allowed_extensions is not None:
-            self.allowed_extensions = {ext.lower() for ext in allowed_extensions}
-
-        if filename_filter is None:
-            self.filename_filter = lambda filepath: True
-        else:
-            self.filename_filter = filename_filter
+        self.entry_filter = ZipEntryFilter(
+            allowed_extensions=allowed_extensions,
+            include=include,
+            exclude=exclude,
+            max_file_size=max_file_size,
+            filename_filter=filename_filter,
+        )
+        self.stats = ExtractionStats()
 
     def read(self) -> list[RawRepositoryFile]:
         """
@@ -59,15 +425,115 @@ class GithubRepositoryDataReader:
         Raises:
             Exception: If the repository download fails
         """
-        resp = requests.get(self.url)
-        if resp.status_code != 200:
-            raise Exception(f"Failed to download repository: {resp.status_code}")
+        return list(self.iter_files())
+
+    def iter_files(self) -> Iterator[RawRepositoryFile]:
+        """
+        Download the repository archive to a temporary file and lazily
+        yield its files one at a time.
+
+        The archive is streamed to disk in chunks and opened from there,
+        so only the file currently being decoded is held in memory. When
+        a cache is configured, the cached archive is opened instead.
+
+        Yields:
+            RawRepositoryFile objects for each processed file
+
+        Raises:
+            Exception: If the repository download fails
+        """
+        with self._open_archive() as archive:
+            yield from self._iter_archive(archive)
+
+    def _open_archive(self) -> BinaryIO:
+        """
+        Return the repository archive as a binary file positioned at the start,
+        either from the cache or freshly spooled into a temporary file.
+        """
+        if self.cache is not None:
+            archive_path = self.cache.fetch(
+                self.url, self.repo_owner, self.repo_name, self.ref,
+                session=self.session
+            )
+            return open(archive_path, "rb")
 
-        zf = zipfile.ZipFile(io.BytesIO(resp.content))
-        repository_data = self._extract_files(zf)
-        zf.close()
+        archive = tempfile.TemporaryFile()
+        try:
+            self._download(archive)
+        except BaseException:
+            archive.close()
+            raise
 
-        return repository_data
+        archive.seek(0)
+        return archive
+
+    def _iter_archive(self, archive: BinaryIO) -> Iterator[RawRepositoryFile]:
+        """
+        Open a repository archive and lazily yield its files, tagged with
+        the repository and the commit the archive was built from.
+        """
+        with zipfile.ZipFile(archive) as zf:
+            commit = self._get_commit(zf)
+            for file in self._iter_extract_files(zf):
+                file.repo = self.repo
+                file.commit = commit
+                yield file
+
+    def manifest(self) -> Dict[str, int]:
+        """
+        Build the file key -> CRC32 manifest of the files read would return,
+        see _archive_manifest.
+        """
+        with self._open_archive() as archive:
+            return self._archive_manifest(archive)
+
+    def _archive_manifest(self, archive: BinaryIO) -> Dict[str, int]:
+        """
+        Build the manifest from the archive's central directory alone: the
+        entries pass the same entry filter as in _iter_extract_files and
+        the checksums are the stored CRC32s, so nothing is decompressed.
+        """
+        manifest = {}
+        with zipfile.ZipFile(archive) as zf:
+            for file_info in zf.infolist():
+                if file_info.is_dir():
+                    continue
+
+                filepath = self._normalize_filepath(file_info.filename)
+                if self.entry_filter.accepts(filepath, file_info.file_size):
+                    manifest[file_key(filepath, self.repo)] = file_info.CRC
+        return manifest
+
+    def _get_commit(self, zf: zipfile.ZipFile) -> str | None:
+        """
+        Determine the commit SHA of the archive.
+
+        GitHub stores the commit id in the zip comment; a pinned SHA ref
+        is used as a fallback.
+        """
+        comment = zf.comment.decode("ascii", errors="ignore").strip()
+        if is_commit_sha(comment):
+            return comment
+        if is_commit_sha(self.ref):
+            return self.ref
+        return None
+
+    def _download(self, out: BinaryIO) -> None:
+        """
+        Stream the repository archive into a file object in chunks.
+
+        Args:
+            out: Writable binary file object to spool the archive into
+
+        Raises:
+            Exception: If the repository download fails
+        """
+        http = self.session if self.session is not None else requests
+        with http.get(self.url, stream=True) as resp:
+            if resp.status_code != 200:
+                raise Exception(f"Failed to download repository: {resp.status_code}")
+
+            _write_response(resp, out)
 
     def _extract_files(self, zf: zipfile.ZipFile) -> list[RawRepositoryFile]:
         """
@@ -79,12 +545,32 @@ class GithubRepositoryDataReader:
         Returns:
             List of RawRepositoryFile objects for each processed file
         """
-        data = []
+        return list(self._iter_extract_files(zf))
+
+    def _iter_extract_files(self, zf: zipfile.ZipFile) -> Iterator[RawRepositoryFile]:
+        """
+        Lazily extract and process files from the zip archive.
+
+        Args:
+            zf: ZipFile object containing the repository data
+
+        Entries rejected by the entry filter are counted in self.stats
+        without being decompressed.
+
+        Yields:
+            RawRepositoryFile objects for each processed file
+        """
+        self.stats = ExtractionStats()
 
         for file_info in zf.infolist():
+            if file_info.is_dir():
+                continue
+
             filepath = self._normalize_filepath(file_info.filename)
 
-            if self._should_skip_file(filepath):
+            if not self.entry_filter.accepts(filepath, file_info.file_size):
+                self.stats.files_skipped += 1
+                self.stats.bytes_skipped += file_info.file_size
                 continue
 
             try:
@@ -95,16 +581,18 @@ class GithubRepositoryDataReader:
 
                     file = RawRepositoryFile(
                         filename=filepath,
-                        content=content
+                        content=content,
+                        crc32=file_info.CRC
                     )
-                    data.append(file)
 
             except Exception as e:
                 print(f"Error processing {file_info.filename}: {e}")
                 traceback.print_exc()
                 continue
 
-        return data
+            self.stats.files_read += 1
+            self.stats.bytes_read += file_info.file_size
+            yield file
 
     def _should_skip_file(self, filepath: str) -> bool:
         """
@@ -116,42 +604,7 @@ class GithubRepositoryDataReader:
         Returns:
             True if the file should be skipped, False otherwise
         """
-        filepath = filepath.lower()
-
-        # directory
-        if filepath.endswith("/"):
-            return True
-
-        # hidden file
-        filename = filepath.split("/")[-1]
-        if filename.startswith("."):
-            return True
-
-        if self.allowed_extensions:
-            ext = self._get_extension(filepath)
-            if ext not in self.allowed_extensions:
-                return True
-
-        if not self.filename_filter(filepath):
-            return True
-
-        return False
-
-    def _get_extension(self, filepath: str) -> str:
-        """
-        Extract the file extension from a filepath.
-        
-        Args:
-            filepath: The file path to extract extension from
-            
-        Returns:
-            The file extension (without dot) or empty string if no extension
-        """
-        filename = filepath.lower().split("/")[-1]
-        if "." in filename:
-            return filename.rsplit(".", maxsplit=1)[-1]
-        else:
-            return ""
+        return not self.entry_filter.accepts(filepath)
 
     def _normalize_filepath(self, filepath: str) -> str:
         """
@@ -171,30 +624,368 @@ class GithubRepositoryDataReader:
             return parts[0]
 
 
-def read_github_data():
-    repo_owner = 'evidentlyai'
-    repo_name = 'docs'
+class MultiRepositoryDataReader:
+    """
+    Downloads and parses files from several GitHub repositories at once.
+
+    Archives are downloaded concurrently over a shared connection pool,
+    and files are yielded repository by repository in the order of the specs.
+    """
+
+    def __init__(self,
+                repos: Iterable[RepositorySpec],
+                allowed_extensions: Iterable[str] | None = None,
+                filename_filter: Callable[[str], bool] | None = None,
+                cache: RepositoryArchiveCache | None = None,
+                max_workers: int = DEFAULT_DOWNLOAD_WORKERS,
+                include: Iterable[str | Pattern] | None = None,
+                exclude: Iterable[str | Pattern] | None = None,
+                max_file_size: int | None = None
+        ):
+        """
+        Initialize the multi-repository data reader.
+
+        Args:
+            repos: Repositories to read, each with an optional pinned ref
+            allowed_extensions: Optional set of file extensions to include
+            filename_filter: Optional callable to filter files by their path
+            cache: Optional archive cache shared by all repositories
+            max_workers: Maximum number of concurrent downloads, which is
+                    also the size of the connection pool
+            include: Optional glob strings or compiled regexes a path must match
+            exclude: Optional glob strings or compiled regexes to skip paths by
+            max_file_size: Optional limit on the uncompressed file size in bytes
+        """
+        self.max_workers = max_workers
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+
+        self.readers = [
+            GithubRepositoryDataReader(
+                spec.owner,
+                spec.name,
+                allowed_extensions=allowed_extensions,
+                filename_filter=filename_filter,
+                cache=cache,
+                ref=spec.ref,
+                session=self.session,
+                include=include,
+                exclude=exclude,
+                max_file_size=max_file_size,
+            )
+            for spec in repos
+        ]
+
+    @property
+    def stats(self) -> ExtractionStats:
+        """
+        Extraction counters summed over all repositories.
+        """
+        total = ExtractionStats()
+        for reader in self.readers:
+            total = total + reader.stats
+        return total
+
+    def read(self) -> list[RawRepositoryFile]:
+        """
+        Download and extract files from all repositories.
+
+        Returns:
+            List of RawRepositoryFile objects tagged with their repo and commit
+        """
+        return list(self.iter_files())
+
+    def iter_files(self) -> Iterator[RawRepositoryFile]:
+        """
+        Download all archives concurrently and lazily yield their files.
+
+        Yields:
+            RawRepositoryFile objects tagged with their repo and commit
+
+        Raises:
+            Exception: If any repository download fails
+        """
+        for reader, archive in self._iter_archives():
+            yield from reader._iter_archive(archive)
+
+    def manifest(self) -> Dict[str, int]:
+        """
+        Build the file key -> CRC32 manifest of all repositories from their
+        archives' central directories, without extracting any file.
+
+        Raises:
+            Exception: If any repository download fails
+        """
+        manifest = {}
+        for reader, archive in self._iter_archives():
+            manifest.update(reader._archive_manifest(archive))
+        return manifest
+
+    def _iter_archives(self) -> Iterator[tuple[GithubRepositoryDataReader, BinaryIO]]:
+        """
+        Open all archives concurrently and yield them with their reader,
+        in the order of the specs.
+        """
+        futures = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(reader._open_archive) for reader in self.readers
+                ]
+
+                for reader, future in zip(self.readers, futures):
+                    with future.result() as archive:
+                        yield reader, archive
+        finally:
+            for future in futures:
+                if future.done() and future.exception() is None:
+                    future.result().close()
+
+
+def _github_reader(
+        cache_dir: str | Path | None = DEFAULT_CACHE_DIR,
+        cache_ttl: float = DEFAULT_CACHE_TTL,
+        repos: Iterable[RepositorySpec] | None = None
+) -> MultiRepositoryDataReader:
+    if repos is None:
+        repos = [RepositorySpec(owner='evidentlyai', name='docs')]
     
     allowed_extensions = {"md", "mdx"}
 
-    reader = GithubRepositoryDataReader(
-        repo_owner,
-        repo_name,
+    cache = None
+    if cache_dir is not None:
+        cache = RepositoryArchiveCache(cache_dir, ttl=cache_ttl)
+
+    return MultiRepositoryDataReader(
+        repos,
         allowed_extensions=allowed_extensions,
+        cache=cache,
     )
-    
-    return reader.read()
 
 
-def parse_data(data_raw):
-    data_parsed = []
-    for f in data_raw:
+def read_github_data(
+        cache_dir: str | Path | None = DEFAULT_CACHE_DIR,
+        cache_ttl: float = DEFAULT_CACHE_TTL,
+        repos: Iterable[RepositorySpec] | None = None
+):
+    return _github_reader(cache_dir, cache_ttl, repos).read()
+
+
+def read_github_manifest(
+        cache_dir: str | Path | None = DEFAULT_CACHE_DIR,
+        cache_ttl: float = DEFAULT_CACHE_TTL,
+        repos: Iterable[RepositorySpec] | None = None
+) -> Dict[str, int]:
+    """
+    Return the build_manifest of what read_github_data would read with
+    the same arguments, computed from the archives' zip entries without
+    decompressing or parsing any file.
+    """
+    return _github_reader(cache_dir, cache_ttl, repos).manifest()
+
+
+def file_key(filename: str, repo: str | None = None) -> str:
+    """
+    Identify a file across repositories: 'owner/name/path' for files
+    read from a repository, the bare path otherwise.
+
+    Manifests and ingested documents are keyed by it, so two repositories
+    with the same path don't overwrite each other.
+    """
+    if repo is None:
+        return filename
+    return f"{repo}/{filename}"
+
+
+def document_key(doc: Dict[str, Any]) -> str:
+    """
+    file_key of a parsed document.
+    """
+    return file_key(doc["filename"], doc.get("repo"))
+
+
+def file_checksum(file: RawRepositoryFile) -> int:
+    """
+    Return the CRC32 of a repository file.
+
+    Uses the checksum stored in the zip archive when it's available and
+    falls back to hashing the decoded content otherwise.
+    """
+    if file.crc32 is not None:
+        return file.crc32
+    return zlib.crc32(file.content.encode("utf-8"))
+
+
+def build_manifest(files: Iterable[RawRepositoryFile]) -> Dict[str, int]:
+    """
+    Build a file key -> CRC32 manifest for a collection of files.
+    """
+    return {file_key(f.filename, f.repo): file_checksum(f) for f in files}
+
+
+def diff_manifest(old: Dict[str, int], new: Dict[str, int]) -> ManifestDiff:
+    """
+    Compare two manifests and report which files were added, modified
+    or deleted.
+
+    Args:
+        old: Manifest of the previously indexed files
+        new: Manifest of the current files
+
+    Returns:
+        ManifestDiff with the file keys in each category
+    """
+    diff = ManifestDiff()
+
+    for filename, checksum in new.items():
+        if filename not in old:
+            diff.added.append(filename)
+        elif old[filename] != checksum:
+            diff.modified.append(filename)
+
+    for filename in old:
+        if filename not in new:
+            diff.deleted.append(filename)
+
+    return diff
+
+
+# same boundary as frontmatter.YAMLHandler
+_FM_BOUNDARY = re.compile(r"^-{3,}\s*$", re.MULTILINE)
+_SIMPLE_KEY = re.compile(r"^[A-Za-z_][\w-]*$")
+_PLAIN_INDICATORS = set("-?:,[]{}#&*!|>'\"%@`")
+_IMPLICIT_RESOLVERS = yaml.resolver.Resolver.yaml_implicit_resolvers
+
+
+def _is_plain_string(value: str) -> bool:
+    """
+    Check that YAML would load a plain scalar as the string itself rather
+    than as a bool, number, null or date.
+    """
+    for _, regexp in _IMPLICIT_RESOLVERS.get(value[:1], []):
+        if regexp.match(value):
+            return False
+    return True
+
+
+def _parse_simple_header(fm: str) -> Dict[str, Any] | None:
+    """
+    Decode a flat header of single-line `key: value` string pairs.
+
+    Returns None as soon as a line needs the full YAML parser: nesting,
+    lists, comments, block scalars, escapes or values that resolve to
+    something other than a string.
+    """
+    metadata = {}
+
+    for line in fm.split("\n"):
+        line = line.rstrip("\r")
+        if not line.strip():
+            continue
+
+        if line[0].isspace():
+            return None
+
+        key, sep, value = line.partition(":")
+        if not sep or not _SIMPLE_KEY.match(key) or not _is_plain_string(key):
+            return None
+
+        value = value.strip()
+        if not value or not line[len(key) + 1].isspace():
+            return None
+
+        if re.search(r"\s#|: |:$", value):
+            return None
+
+        first, last = value[0], value[-1]
+        if first == '"':
+            if len(value) < 2 or last != '"' or '"' in value[1:-1] or "\\" in value:
+                return None
+            value = value[1:-1]
+        elif first == "'":
+            if len(value) < 2 or last != "'" or "'" in value[1:-1]:
+                return None
+            value = value[1:-1]
+        elif first in _PLAIN_INDICATORS or not _is_plain_string(value):
+            return None
+
+        metadata[key] = value
+
+    return metadata
+
+
+def parse_frontmatter(text: str) -> Dict[str, Any]:
+    """
+    Parse a document with YAML frontmatter, taking a fast path for flat headers.
+
+    Headers made of simple `key: value` lines are decoded directly; anything
+    else (nested or complex YAML, TOML/JSON frontmatter, no frontmatter) is
+    handed to python-frontmatter. The result has the same shape as
+    frontmatter.loads(text).to_dict().
+
+    Args:
+        text: The raw file content
+
+    Returns:
+        dict: The header fields plus the document body under 'content'
+    """
+    text = text.strip()
+
+    if text.startswith("---"):
+        parts = _FM_BOUNDARY.split(text, 2)
+        if len(parts) == 3 and parts[0] == "":
+            _, fm, content = parts
+            metadata = _parse_simple_header(fm)
+            if metadata is not None:
+                metadata["content"] = content.strip()
+                return metadata
+
+    return frontmatter.loads(text).to_dict()
+
+
+def _parse_file(f: RawRepositoryFile, fast: bool = False) -> Dict[str, Any]:
+    if fast:
+        data = parse_frontmatter(f.content)
+    else:
         post = frontmatter.loads(f.content)
         data = post.to_dict()
-        data['filename'] = f.filename
-        data_parsed.append(data)
+    data['filename'] = f.filename
+    if f.repo is not None:
+        data['repo'] = f.repo
+        data['commit'] = f.commit
+    return data
+
+
+def parse_data(data_raw, workers: int = 1, fast: bool = False):
+    """
+    Parse the frontmatter of repository files into document dictionaries.
+
+    Args:
+        data_raw: An iterable of RawRepositoryFile objects
+        workers (int, optional): Number of processes to parse with. Inputs
+            smaller than PARALLEL_PARSE_MIN_FILES are always parsed serially.
+            Defaults to 1.
+        fast (bool, optional): Use parse_frontmatter, which skips YAML for
+            flat `key: value` headers. Defaults to False.
+
+    Returns:
+        list: Parsed documents in the same order as the input files
+    """
+    parse_file = partial(_parse_file, fast=fast)
+
+    if workers <= 1:
+        return [parse_file(f) for f in data_raw]
+
+    data_raw = list(data_raw)
+    if len(data_raw) < PARALLEL_PARSE_MIN_FILES:
+        return [parse_file(f) for f in data_raw]
 
-    return data_parsed
+    chunksize = max(1, len(data_raw) // (workers * 4))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse_file, data_raw, chunksize=chunksize))
 
 
 def sliding_window(
@@ -225,16 +1016,29 @@ def sliding_window(
     if size <= 0 or step <= 0:
         raise ValueError("size and step must be positive")
 
+    return list(iter_sliding_window(seq, size=size, step=step))
+
+
+def iter_sliding_window(
+        seq: Iterable[Any],
+        size: int,
+        step: int
+    ) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming version of sliding_window: yields one window at a time.
+
+    Raises:
+        ValueError: If size or step are not positive integers.
+    """
+    if size <= 0 or step <= 0:
+        raise ValueError("size and step must be positive")
+
     n = len(seq)
-    result = []
     for i in range(0, n, step):
-        batch = seq[i:i+size]
-        result.append({'start': i, 'content': batch})
+        yield {'start': i, 'content': seq[i:i+size]}
         if i + size > n:
             break
 
-    return result
-
 
 def chunk_documents(
         documents: Iterable[Dict[str, str]],
@@ -268,14 +1072,549 @@ def chunk_documents(
         >>> documents = [{'text': 'long text...', 'filename': 'doc.txt'}]
         >>> chunks = chunk_documents(documents, content_field_name='text')
     """
-    results = []
+    return list(iter_chunks(
+        documents, size=size, step=step, content_field_name=content_field_name
+    ))
+
 
+def iter_chunks(
+        documents: Iterable[Dict[str, str]],
+        size: int = 2000,
+        step: int = 1000,
+        content_field_name: str = 'content'
+) -> Iterator[Dict[str, str]]:
+    """
+    Streaming version of chunk_documents.
+
+    Documents are consumed lazily and chunks are yielded as soon as they're
+    cut, so the output can go straight to an index builder or write_chunks
+    without holding the whole corpus in memory.
+
+    Example:
+        >>> chunks = iter_chunks(parse_data(read_github_data()))
+        >>> write_chunks(chunks, "chunks.jsonl")
+    """
     for doc in documents:
         doc_copy = doc.copy()
         doc_content = doc_copy.pop(content_field_name)
-        chunks = sliding_window(doc_content, size=size, step=step)
+        for chunk in iter_sliding_window(doc_content, size=size, step=step):
+            chunk.update(doc_copy)
+            yield chunk
+
+
+def write_chunks(chunks: Iterable[Dict[str, Any]], path: str | Path) -> int:
+    """
+    Write chunks to a JSON Lines file, one chunk per line.
+
+    Args:
+        chunks: Any iterable of chunks, e.g. the output of iter_chunks
+        path: Destination file
+
+    Returns:
+        int: Number of chunks written
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
         for chunk in chunks:
+            f.write(json.dumps(dict(chunk), ensure_ascii=False, default=str))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def read_chunks(path: str | Path) -> Iterator[Dict[str, Any]]:
+    """
+    Stream chunks back from a file written by write_chunks.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class ChunkView(Mapping):
+    """
+    A read-only chunk backed by a ChunkStore.
+
+    Behaves like the dictionaries returned by chunk_documents, but the
+    content is only sliced out of the document text when it's accessed.
+    """
+    __slots__ = ("_store", "_chunk_id")
+
+    def __init__(self, store: "ChunkStore", chunk_id: int):
+        self._store = store
+        self._chunk_id = chunk_id
+
+    def __getitem__(self, key):
+        store = self._store
+        doc_id = store.doc_ids[self._chunk_id]
+
+        metadata = store.metadata[doc_id]
+        if key in metadata:
+            return metadata[key]
+
+        # int() since a loaded store keeps its offsets in NumPy arrays
+        if key == "start":
+            return int(store.starts[self._chunk_id])
+        if key == "content":
+            start = store.starts[self._chunk_id]
+            end = store.ends[self._chunk_id]
+            return store.texts[doc_id][start:end]
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        metadata = self._store.metadata[self._store.doc_ids[self._chunk_id]]
+        yield "start"
+        yield "content"
+        for key in metadata:
+            if key not in ("start", "content"):
+                yield key
+
+    def __len__(self):
+        metadata = self._store.metadata[self._store.doc_ids[self._chunk_id]]
+        return 2 + sum(1 for key in metadata if key not in ("start", "content"))
+
+    def __repr__(self):
+        return f"ChunkView({dict(self)!r})"
+
+
+class ChunkStore(Sequence):
+    """
+    Compact storage for sliding-window chunks.
+
+    Each document's text and metadata are kept once, and chunks are stored
+    as (doc_id, start, end) offsets in flat arrays. Indexing the store
+    returns a ChunkView, so it can be passed wherever a list of chunk
+    dictionaries is expected, e.g. to Index.fit.
+    """
+
+    def __init__(self, size: int = 2000, step: int = 1000, content_field_name: str = 'content'):
+        """
+        Args:
+            size (int, optional): The maximum size of each chunk. Defaults to 2000.
+            step (int, optional): The step size between chunks. Defaults to 1000.
+            content_field_name (str, optional): The name of the field containing
+                document content. Defaults to 'content'.
+        """
+        if size <= 0 or step <= 0:
+            raise ValueError("size and step must be positive")
+
+        self.size = size
+        self.step = step
+        self.content_field_name = content_field_name
+
+        self.texts: list[str] = []
+        self.metadata: list[dict[str, Any]] = []
+        self.doc_ids = array("I")
+        self.starts = array("I")
+        self.ends = array("I")
+
+    @classmethod
+    def from_documents(
+            cls,
+            documents: Iterable[Dict[str, str]],
+            size: int = 2000,
+            step: int = 1000,
+            content_field_name: str = 'content'
+    ) -> "ChunkStore":
+        """
+        Build a store with the same chunks chunk_documents would produce.
+        """
+        store = cls(size=size, step=step, content_field_name=content_field_name)
+        for doc in documents:
+            store.add_document(doc)
+        return store
+
+    def add_document(self, doc: Dict[str, Any]) -> range:
+        """
+        Add a document and compute its chunk offsets.
+
+        Args:
+            doc: Document dictionary with a content field
+
+        Returns:
+            range: Ids of the chunks created for the document
+        """
+        metadata = doc.copy()
+        text = metadata.pop(self.content_field_name)
+
+        doc_id = len(self.texts)
+        self.texts.append(text)
+        self.metadata.append(metadata)
+
+        first = len(self.starts)
+        n = len(text)
+        for i in range(0, n, self.step):
+            self.doc_ids.append(doc_id)
+            self.starts.append(i)
+            self.ends.append(min(i + self.size, n))
+            if i + self.size > n:
+                break
+
+        return range(first, len(self.starts))
+
+    def __getitem__(self, chunk_id):
+        if isinstance(chunk_id, slice):
+            return [self[i] for i in range(*chunk_id.indices(len(self)))]
+        if chunk_id < 0:
+            chunk_id += len(self)
+        if not 0 <= chunk_id < len(self):
+            raise IndexError("chunk index out of range")
+        return ChunkView(self, chunk_id)
+
+    def __len__(self):
+        return len(self.starts)
+
+
+_MD_HEADING = re.compile(r"^ {0,3}#{1,6}(?:[ \t]|$)")
+_MD_FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+
+
+def split_markdown_blocks(text: str) -> List[tuple[int, int, str]]:
+    """
+    Split markdown into headings, paragraphs and fenced code blocks.
+
+    Blank lines between blocks are attached to the preceding block, so
+    consecutive blocks are contiguous and text[start:end] of a run of
+    blocks is always a valid slice of the original document.
+
+    Returns:
+        list: (start, end, kind) tuples, where kind is 'heading', 'code'
+            or 'text'
+    """
+    blocks = []
+    start = None
+    kind = None
+    fence = None
+    pos = 0
+
+    for line in text.splitlines(keepends=True):
+        line_start = pos
+        pos += len(line)
+
+        if fence is not None:
+            # inside a code block, only the matching fence closes it
+            stripped = line.strip()
+            if stripped.startswith(fence) and stripped.strip(fence[0]) == "":
+                fence = None
+            continue
+
+        fence_match = _MD_FENCE.match(line)
+        if fence_match or _MD_HEADING.match(line):
+            if start is not None:
+                blocks.append((start, line_start, kind))
+            start = line_start
+            if fence_match:
+                kind = "code"
+                fence = fence_match.group(1)
+            else:
+                blocks.append((start, pos, "heading"))
+                start = None
+            continue
+
+        if not line.strip():
+            # a blank line ends a paragraph, but stays attached to it
+            if kind == "text" and start is not None:
+                blocks.append((start, pos, kind))
+                start = None
+            elif blocks and start is None:
+                blocks[-1] = (blocks[-1][0], pos, blocks[-1][2])
+            continue
+
+        if start is not None and kind == "code":
+            blocks.append((start, line_start, kind))
+            start = None
+
+        if start is None:
+            start = line_start
+            kind = "text"
+
+    if start is not None:
+        blocks.append((start, len(text), kind))
+
+    if blocks and blocks[0][0] > 0:
+        # leading blank lines belong to the first block
+        blocks[0] = (0, blocks[0][1], blocks[0][2])
+
+    return blocks
+
+
+def _markdown_sections(text: str) -> List[tuple[str | None, List[tuple[int, int, str]]]]:
+    sections = []
+    heading = None
+    blocks = []
+
+    for block in split_markdown_blocks(text):
+        if block[2] == "heading":
+            if blocks:
+                sections.append((heading, blocks))
+            heading = text[block[0]:block[1]].strip()
+            blocks = [block]
+        else:
+            blocks.append(block)
+
+    if blocks:
+        sections.append((heading, blocks))
+
+    return sections
+
+
+def _find_cut(text: str, start: int, limit: int) -> int:
+    for sep in ("\n", " "):
+        cut = text.rfind(sep, start + (limit - start) // 2, limit)
+        if cut != -1:
+            return cut + 1
+    return limit
+
+
+def _pack_markdown(text: str, size: int) -> Iterator[tuple[int, int, str | None, bool]]:
+    """
+    Yield (start, end, section, continued) spans of at most size characters.
+
+    Whole sections are packed together while they fit. A section larger than
+    size is split between blocks (and blocks larger than size by characters);
+    the continuation spans are flagged so the caller can repeat the heading.
+    """
+    current = None
+
+    for heading, blocks in _markdown_sections(text):
+        section_start = blocks[0][0]
+        section_end = blocks[-1][1]
+
+        if current is not None and section_end - current[0] <= size:
+            current = (current[0], section_end, current[2])
+            continue
+
+        if current is not None:
+            yield current[0], current[1], current[2], False
+            current = None
+
+        if section_end - section_start <= size:
+            current = (section_start, section_end, heading)
+            continue
+
+        span_start = section_start
+        continued = False
+        for start, end, _ in blocks:
+            if end - span_start <= size:
+                continue
+            if start > span_start and end - start <= size:
+                yield span_start, start, heading, continued
+                continued = True
+                span_start = start
+                continue
+            # the block doesn't fit in a chunk on its own: cut it, preferably
+            # at whitespace, carrying whatever precedes it in the first piece
+            while end - span_start > size:
+                cut = _find_cut(text, span_start, span_start + size)
+                yield span_start, cut, heading, continued
+                continued = True
+                span_start = cut
+
+        if text[span_start:section_end].strip():
+            yield span_start, section_end, heading, continued
+
+    if current is not None:
+        yield current[0], current[1], current[2], False
+
+
+def iter_markdown_chunks(
+        documents: Iterable[Dict[str, str]],
+        size: int = 2000,
+        content_field_name: str = 'content'
+) -> Iterator[Dict[str, str]]:
+    """
+    Split documents into chunks along markdown structure.
+
+    Headings, paragraphs and fenced code blocks are never cut unless they
+    are larger than size on their own. Consecutive sections are packed into
+    one chunk while they fit. There's no sliding overlap: the only repeated
+    text is the section heading, prepended to chunks that continue a section
+    split across several chunks.
+
+    Each chunk has the same fields as chunk_documents output plus 'section',
+    the heading of the section the chunk starts in (None before the first
+    heading).
+
+    Args:
+        documents: An iterable of document dictionaries
+        size (int, optional): The target maximum chunk size in characters. Defaults to 2000.
+        content_field_name (str, optional): The name of the field containing document content.
+    """
+    if size <= 0:
+        raise ValueError("size must be positive")
+
+    for doc in documents:
+        doc_copy = doc.copy()
+        text = doc_copy.pop(content_field_name)
+
+        for start, end, section, continued in _pack_markdown(text, size):
+            content = text[start:end]
+            if continued and section is not None:
+                content = f"{section}\n\n{content}"
+
+            chunk = {'start': start, 'content': content, 'section': section}
             chunk.update(doc_copy)
-        results.extend(chunks)
+            yield chunk
 
-    return results
\ No newline at end of file
+
+def chunk_markdown_documents(
+        documents: Iterable[Dict[str, str]],
+        size: int = 2000,
+        content_field_name: str = 'content'
+) -> List[Dict[str, str]]:
+    """
+    List version of iter_markdown_chunks.
+    """
+    return list(iter_markdown_chunks(
+        documents, size=size, content_field_name=content_field_name
+    ))
+
+
+class CharEstimateEncoding:
+    """
+    Offline stand-in for a tiktoken encoding that estimates tokens from
+    length: every CHARS_PER_TOKEN characters count as one token, rounded up.
+
+    BPE encodings average about four characters per token on English
+    prose, so chunks sized this way stay close to the real budget without
+    a vocabulary. It has the encode/decode_with_offsets subset the
+    chunkers use; a token id packs the code points of its characters, so
+    it decodes without any state.
+    """
+
+    name = "chars/4"
+    version = "1"
+
+    CHARS_PER_TOKEN = 4
+    _BITS = 21  # enough for any code point
+
+    def encode(self, text: str, disallowed_special=()) -> List[int]:
+        tokens = []
+        for start in range(0, len(text), self.CHARS_PER_TOKEN):
+            token = 1
+            for char in text[start:start + self.CHARS_PER_TOKEN]:
+                token = (token << self._BITS) | ord(char)
+            tokens.append(token)
+        return tokens
+
+    def decode_with_offsets(self, tokens: List[int]) -> tuple[str, List[int]]:
+        mask = (1 << self._BITS) - 1
+        pieces, offsets, pos = [], [], 0
+        for token in tokens:
+            chars = []
+            while token > 1:
+                chars.append(chr(token & mask))
+                token >>= self._BITS
+            piece = "".join(reversed(chars))
+            pieces.append(piece)
+            offsets.append(pos)
+            pos += len(piece)
+        return "".join(pieces), offsets
+
+
+def tokenizer_config(encoding=None) -> Dict[str, Any]:
+    """
+    Name and version of the encoding token chunks are sized with, so
+    indexes built with different tokenizers don't share a cache entry.
+    """
+    if encoding is None:
+        encoding = get_encoding()
+    if isinstance(encoding, CharEstimateEncoding):
+        tokenizer_version = encoding.version
+    else:
+        from importlib.metadata import version
+        tokenizer_version = version("tiktoken")
+    return {"tokenizer": encoding.name, "tokenizer_version": tokenizer_version}
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_TOKENIZER_MODEL):
+    """
+    Return the tiktoken encoding for a model, loaded once per process.
+
+    tiktoken downloads the BPE ranks on first use and caches them, in
+    TIKTOKEN_CACHE_DIR if that is set. If they can't be loaded, e.g.
+    offline with an empty cache, this warns and returns a
+    CharEstimateEncoding, so token sizes are estimated from length instead.
+    """
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        warnings.warn(
+            f"Could not load the tiktoken encoding for {model!r} ({e}); "
+            f"token sizes are estimated as one per 4 characters instead. Run once "
+            f"with network access, or point TIKTOKEN_CACHE_DIR at a cache that "
+            f"has the BPE file.",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+        return CharEstimateEncoding()
+
+
+def iter_token_chunks(
+        documents: Iterable[Dict[str, str]],
+        size: int = 500,
+        step: int = 400,
+        content_field_name: str = 'content',
+        encoding=None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Sliding-window chunking where size and step are counted in tokens.
+
+    Each document is encoded once; windows are cut on token boundaries and
+    mapped back to character offsets, so 'content' is an exact slice of the
+    original text and 'start' is a character position like in
+    chunk_documents. Every chunk also gets 'num_tokens'.
+
+    Args:
+        documents: An iterable of document dictionaries
+        size (int, optional): Maximum number of tokens per chunk. Defaults to 500.
+        step (int, optional): Number of tokens between chunk starts. Defaults to 400.
+        content_field_name (str, optional): The name of the field containing document content.
+        encoding: A tiktoken encoding. Defaults to get_encoding().
+    """
+    if size <= 0 or step <= 0:
+        raise ValueError("size and step must be positive")
+
+    if encoding is None:
+        encoding = get_encoding()
+
+    for doc in documents:
+        doc_copy = doc.copy()
+        text = doc_copy.pop(content_field_name)
+
+        tokens = encoding.encode(text, disallowed_special=())
+        _, offsets = encoding.decode_with_offsets(tokens)
+        n = len(tokens)
+
+        for i in range(0, n, step):
+            j = min(i + size, n)
+            end = offsets[j] if j < n else len(text)
+            chunk = {
+                'start': offsets[i],
+                'content': text[offsets[i]:end],
+                'num_tokens': j - i,
+            }
+            chunk.update(doc_copy)
+            yield chunk
+            if i + size >= n:
+                break
+
+
+def chunk_token_documents(
+        documents: Iterable[Dict[str, str]],
+        size: int = 500,
+        step: int = 400,
+        content_field_name: str = 'content',
+        encoding=None
+) -> List[Dict[str, Any]]:
+    """
+    List version of iter_token_chunks.
+    """
+    return list(iter_token_chunks(
+        documents, size=size, step=step,
+        content_field_name=content_field_name, encoding=encoding
+    ))
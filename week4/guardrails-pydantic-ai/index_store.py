@@ -0,0 +1,613 @@
+"""
+On-disk format for prepared search tools.
+
+A store is a directory with:
+
+- header.json: schema version, source hash and the parameters the index
+  was built with
+- metadata.json: chunk and document metadata (everything but the texts),
+  the manifest and the keyword columns
+- files.bin: UTF-8 texts of the source files, concatenated, with byte
+  offsets in files.offsets.npy
+- chunks: for a docs.ChunkStore, the (doc_id, start, end) arrays in
+  chunks.*.npy over the texts in files.bin; for any other list of chunks,
+  their texts in chunks.bin / chunks.offsets.npy
+- field{i}.*.npy: per text field, the TF-IDF vocabulary, idf weights and
+  the CSR arrays of the document-term matrix
+
+Arrays are loaded with np.load(mmap_mode="r") and texts through mmap, so
+loading only reads the small JSON files and the vocabularies. The pages
+are shared by every process that opens the same store, and texts are
+decoded only when a search result or file is returned.
+
+Stores live in DEFAULT_CACHE_DIR under a content-addressed key (see
+cache_key) and are never modified once written. Old stores are removed
+with:
+
+    uv run python index_store.py prune
+"""
+import os
+import json
+import mmap
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+from pathlib import Path
+from collections.abc import Mapping, Sequence
+from importlib.metadata import version
+from typing import Any, Dict, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from scipy.sparse import csr_matrix
+from minsearch import Index
+
+import docs
+
+
+SCHEMA_VERSION = 1
+
+HEADER_FILE = "header.json"
+METADATA_FILE = "metadata.json"
+
+DEFAULT_CACHE_DIR = Path(".cache") / "search_index"
+
+# directories without a header younger than this may still be being written
+INCOMPLETE_STORE_GRACE = 60 * 60
+
+# caches written before stores were content-addressed, always in .cache
+LEGACY_CACHE_DIR = Path(".cache")
+LEGACY_CACHE_PATTERNS = ["search_tools_*"]
+
+
+def library_versions() -> Dict[str, Any]:
+    """
+    Versions of everything that affects the stored index.
+    """
+    return {
+        "schema": SCHEMA_VERSION,
+        "minsearch": version("minsearch"),
+        "scikit-learn": version("scikit-learn"),
+    }
+
+
+def cache_key(parts: Dict[str, Any]) -> str:
+    """
+    Stable digest of JSON-serializable parts, used as a store name.
+    """
+    data = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+
+def manifest_hash(manifest: Dict[str, int]) -> str:
+    """
+    Digest of a filename -> checksum manifest, independent of file order.
+    """
+    hasher = hashlib.sha256()
+    for filename, checksum in sorted(manifest.items()):
+        hasher.update(f"{filename}\0{checksum}\n".encode("utf-8"))
+    return hasher.hexdigest()
+
+
+class MappedTexts(Sequence):
+    """
+    Read-only sequence of strings stored back to back in a memory-mapped file.
+    """
+
+    def __init__(self, path: Path, offsets: np.ndarray):
+        self.offsets = offsets
+        self._data = b""
+        if path.stat().st_size > 0:
+            with open(path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._data[start:end].decode("utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class StoredChunks(Sequence):
+    """
+    Chunks of a loaded store. Items are fresh dictionaries, so callers can
+    modify search results without touching the index.
+    """
+
+    def __init__(self, metadata: list[dict[str, Any]], texts: MappedTexts):
+        self.metadata = metadata
+        self.texts = texts
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        chunk = dict(self.metadata[i])
+        if "content" in chunk:
+            chunk["content"] = self.texts[i]
+        return chunk
+
+    def __len__(self):
+        return len(self.metadata)
+
+
+class StoredDocuments(Mapping):
+    """
+    Parsed documents of a loaded store, keyed by docs.document_key.
+    """
+
+    def __init__(self, metadata: list[dict[str, Any]], texts: MappedTexts):
+        self.metadata = metadata
+        self.texts = texts
+        self._positions = {docs.document_key(doc): i for i, doc in enumerate(metadata)}
+
+    def __getitem__(self, key):
+        i = self._positions[key]
+        doc = dict(self.metadata[i])
+        doc["content"] = self.texts[i]
+        return doc
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __len__(self):
+        return len(self._positions)
+
+
+class StoredFileIndex(Mapping):
+    """
+    file key -> content view over the stored documents, used as file_index.
+    """
+
+    def __init__(self, documents: StoredDocuments):
+        self.documents = documents
+
+    def __getitem__(self, key):
+        return self.documents.texts[self.documents._positions[key]]
+
+    def __iter__(self):
+        return iter(self.documents)
+
+    def __len__(self):
+        return len(self.documents)
+
+
+def _write_texts(directory: Path, name: str, texts: Iterable[str]) -> None:
+    offsets = [0]
+    with open(directory / f"{name}.bin", "wb") as f:
+        for text in texts:
+            data = (text or "").encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    np.save(directory / f"{name}.offsets.npy", np.array(offsets, dtype=np.int64))
+
+
+def _read_texts(directory: Path, name: str) -> MappedTexts:
+    offsets = np.load(directory / f"{name}.offsets.npy", mmap_mode="r")
+    return MappedTexts(directory / f"{name}.bin", offsets)
+
+
+def _json_params(vectorizer) -> dict[str, Any]:
+    params = {}
+    for key, value in vectorizer.get_params().items():
+        if key == "ngram_range":
+            params[key] = list(value)
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            params[key] = value
+    return params
+
+
+def save_search_tools(
+        search_tools,
+        path: str | Path,
+        source_hash: str | None = None,
+        config_hash: str | None = None,
+        params: Dict[str, Any] | None = None,
+        arrays: Dict[str, np.ndarray] | None = None
+) -> Path:
+    """
+    Write search tools to a store directory.
+
+    The store is written to a temporary directory next to path and renamed
+    into place, so readers never see a half-written store. Stores are
+    immutable: if another process has already written path (e.g. several
+    workers started at once), this copy is discarded and theirs is kept.
+
+    Args:
+        search_tools: SearchTools with a minsearch Index
+        path: Store directory
+        source_hash: Digest of the indexed sources, see manifest_hash
+        config_hash: Digest of the build configuration, used to find
+            stores that can be refreshed incrementally
+        params: Build parameters recorded in the header (chunk_size, ...)
+        arrays: Extra arrays to store as <name>.npy, see load_array
+
+    Returns:
+        Path: The store directory
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{path.name}.", dir=path.parent))
+
+    try:
+        for name, array in (arrays or {}).items():
+            np.save(tmp / f"{name}.npy", array)
+        _write_store(tmp, search_tools, source_hash, config_hash, params or {})
+        os.rename(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if read_header(path) is None:
+            raise
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    return path
+
+
+def _write_store(directory: Path, search_tools, source_hash, config_hash, params) -> None:
+    index = search_tools.index
+    state = search_tools.state
+
+    if state is not None:
+        documents = list(state.documents.values())
+    else:
+        documents = [
+            {"filename": filename, "content": content}
+            for filename, content in search_tools.file_index.items()
+        ]
+    document_metadata = [
+        {k: v for k, v in doc.items() if k != "content"} for doc in documents
+    ]
+    _write_texts(directory, "files", (doc["content"] for doc in documents))
+
+    chunks = index.docs
+    if _chunks_over_documents(chunks, documents):
+        # chunks are offsets into the file texts, so only the offsets are stored
+        chunk_layout = "offsets"
+        chunk_metadata = None
+        np.save(directory / "chunks.doc_ids.npy", np.asarray(chunks.doc_ids, dtype=np.uint32))
+        np.save(directory / "chunks.starts.npy", np.asarray(chunks.starts, dtype=np.uint32))
+        np.save(directory / "chunks.ends.npy", np.asarray(chunks.ends, dtype=np.uint32))
+    else:
+        chunk_layout = "texts"
+        chunk_metadata = []
+        chunk_texts = []
+        for chunk in chunks:
+            chunk = dict(chunk)
+            if "content" in chunk:
+                chunk_texts.append(chunk["content"])
+                chunk["content"] = None
+            else:
+                chunk_texts.append("")
+            chunk_metadata.append(chunk)
+        _write_texts(directory, "chunks", chunk_texts)
+
+    fields = []
+    for i, field in enumerate(getattr(index, "text_fields", [])):
+        vectorizer = index.vectorizers[field]
+        fields.append({"name": field, "params": _json_params(vectorizer)})
+
+        matrix = index.text_matrices.get(field)
+        if matrix is None:
+            continue
+
+        matrix = csr_matrix(matrix)
+        terms = vectorizer.get_feature_names_out().astype(str)
+        np.save(directory / f"field{i}.terms.npy", terms)
+        np.save(directory / f"field{i}.idf.npy", vectorizer.idf_)
+        np.save(directory / f"field{i}.data.npy", matrix.data)
+        np.save(directory / f"field{i}.indices.npy", matrix.indices)
+        np.save(directory / f"field{i}.indptr.npy", matrix.indptr)
+        fields[-1]["shape"] = list(matrix.shape)
+
+    keywords = {}
+    if getattr(index, "keyword_df", None) is not None:
+        keywords = {
+            field: index.keyword_df[field].tolist() for field in index.keyword_fields
+        }
+
+    metadata = {
+        "chunk_layout": chunk_layout,
+        "chunks": chunk_metadata,
+        "documents": document_metadata,
+        "manifest": state.manifest if state is not None else {},
+        "keywords": keywords,
+    }
+    with open(directory / METADATA_FILE, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, default=str)
+
+    header = {
+        "schema_version": SCHEMA_VERSION,
+        "source_hash": source_hash,
+        "config_hash": config_hash,
+        "library_versions": library_versions(),
+        "created_at": time.time(),
+        "params": params,
+        "text_fields": fields,
+        "keyword_fields": list(getattr(index, "keyword_fields", [])),
+        "num_chunks": len(chunks),
+        "num_documents": len(document_metadata),
+    }
+    # the header goes last: a store without one is incomplete
+    with open(directory / HEADER_FILE, "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+
+
+def _chunks_over_documents(chunks, documents: list[dict[str, Any]]) -> bool:
+    if not isinstance(chunks, docs.ChunkStore):
+        return False
+    if chunks.content_field_name != "content" or len(chunks.texts) != len(documents):
+        return False
+    return all(
+        text is doc["content"] and metadata.keys() | {"content"} == doc.keys()
+        for text, metadata, doc in zip(chunks.texts, chunks.metadata, documents)
+    )
+
+
+def read_header(path: str | Path) -> Dict[str, Any] | None:
+    """
+    Return the header of a store, or None if there's no complete store at path.
+    """
+    try:
+        with open(Path(path) / HEADER_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+        return None
+
+
+def load_index(path: str | Path, header: Dict[str, Any]) -> tuple[Index, dict[str, Any]]:
+    """
+    Rebuild the minsearch Index of a store without refitting it.
+
+    Returns:
+        tuple: The index and the parsed metadata.json
+    """
+    path = Path(path)
+    metadata = read_metadata(path)
+
+    fields = header["text_fields"]
+    index = Index(
+        text_fields=[field["name"] for field in fields],
+        keyword_fields=header["keyword_fields"],
+    )
+
+    for i, field in enumerate(fields):
+        params = dict(field["params"])
+        if "ngram_range" in params:
+            params["ngram_range"] = tuple(params["ngram_range"])
+        vectorizer = index.vectorizers[field["name"]]
+        vectorizer.set_params(**params)
+
+        if "shape" not in field:
+            continue
+
+        terms = np.load(path / f"field{i}.terms.npy", mmap_mode="r")
+        vectorizer.vocabulary_ = {term: j for j, term in enumerate(terms.tolist())}
+        vectorizer.idf_ = np.load(path / f"field{i}.idf.npy")
+
+        matrix = csr_matrix(
+            (
+                np.load(path / f"field{i}.data.npy", mmap_mode="r"),
+                np.load(path / f"field{i}.indices.npy", mmap_mode="r"),
+                np.load(path / f"field{i}.indptr.npy", mmap_mode="r"),
+            ),
+            shape=tuple(field["shape"]),
+            copy=False,
+        )
+        index.text_matrices[field["name"]] = matrix
+
+    index.docs = load_chunks(path, header, metadata)
+    index.keyword_df = pd.DataFrame(
+        {field: metadata["keywords"].get(field, []) for field in index.keyword_fields}
+    )
+
+    return index, metadata
+
+
+def read_metadata(path: str | Path) -> Dict[str, Any]:
+    with open(Path(path) / METADATA_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_chunks(path: str | Path, header: Dict[str, Any], metadata: Dict[str, Any]) -> Sequence:
+    """
+    Open the chunks of a store, as a ChunkStore or StoredChunks.
+    """
+    path = Path(path)
+
+    if metadata["chunk_layout"] == "offsets":
+        store = docs.ChunkStore(
+            size=header["params"].get("chunk_size", 2000),
+            step=header["params"].get("chunk_step", 1000),
+        )
+        store.texts = _read_texts(path, "files")
+        store.metadata = metadata["documents"]
+        store.doc_ids = np.load(path / "chunks.doc_ids.npy", mmap_mode="r")
+        store.starts = np.load(path / "chunks.starts.npy", mmap_mode="r")
+        store.ends = np.load(path / "chunks.ends.npy", mmap_mode="r")
+        return store
+
+    return StoredChunks(metadata["chunks"], _read_texts(path, "chunks"))
+
+
+def load_documents(path: str | Path, metadata: Dict[str, Any]) -> StoredDocuments:
+    return StoredDocuments(metadata["documents"], _read_texts(Path(path), "files"))
+
+
+def load_array(path: str | Path, name: str) -> np.ndarray:
+    """
+    Memory-map an extra array saved with save_search_tools(arrays=...).
+    """
+    return np.load(Path(path) / f"{name}.npy", mmap_mode="r")
+
+
+def mark_used(path: str | Path) -> None:
+    """
+    Record that a store was opened; prune keeps the most recently used ones.
+    """
+    try:
+        os.utime(Path(path) / HEADER_FILE)
+    except OSError:
+        pass
+
+
+def iter_stores(cache_dir: str | Path = DEFAULT_CACHE_DIR) -> Iterator[tuple[Path, Dict[str, Any]]]:
+    """
+    Yield (path, header) for every complete store in cache_dir.
+    """
+    cache_dir = Path(cache_dir)
+    if not cache_dir.is_dir():
+        return
+
+    for path in cache_dir.iterdir():
+        if path.name.startswith("."):
+            continue
+        header = read_header(path)
+        if header is not None:
+            yield path, header
+
+
+def last_used(path: Path) -> float:
+    try:
+        return (path / HEADER_FILE).stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def find_latest(cache_dir: str | Path, config_hash: str) -> Path | None:
+    """
+    Return the most recently used store built with the given configuration.
+    """
+    candidates = [
+        path for path, header in iter_stores(cache_dir)
+        if header.get("config_hash") == config_hash
+        and header.get("schema_version") == SCHEMA_VERSION
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=last_used)
+
+
+def prune(
+        cache_dir: str | Path = DEFAULT_CACHE_DIR,
+        keep: int = 1,
+        max_age: float | None = None,
+        dry_run: bool = False,
+        legacy: bool = False,
+        legacy_dir: Path = LEGACY_CACHE_DIR
+) -> list[Path]:
+    """
+    Remove stale stores.
+
+    Removes stores from other schema versions or built with other
+    versions of the indexing libraries, all but the keep most recently
+    used stores of every configuration, stores not used for max_age
+    seconds, leftovers of interrupted writes, and, if asked to, pickled
+    caches from before the store format.
+
+    A configuration that is no longer requested never gets a newer
+    store, so its last one is only removed by max_age or once the
+    libraries are upgraded.
+
+    Args:
+        cache_dir: Store directory
+        keep: Number of stores to keep per configuration
+        max_age: Remove stores last used longer ago than this, in seconds
+        dry_run: Only report what would be removed
+        legacy: Also remove the legacy caches in legacy_dir
+        legacy_dir: Where the legacy caches were written; it's unrelated
+            to cache_dir, so a custom cache_dir never widens what's removed
+
+    Returns:
+        list: Removed paths
+    """
+    cache_dir = Path(cache_dir)
+    stale = []
+    now = time.time()
+    versions = library_versions()
+
+    by_config = {}
+    for path, header in iter_stores(cache_dir):
+        if header.get("schema_version") != SCHEMA_VERSION:
+            stale.append(path)
+            continue
+        # stores written before the header recorded them are left to max_age
+        if header.get("library_versions", versions) != versions:
+            stale.append(path)
+            continue
+        if max_age is not None and now - last_used(path) > max_age:
+            stale.append(path)
+            continue
+        by_config.setdefault(header.get("config_hash"), []).append(path)
+
+    for paths in by_config.values():
+        paths.sort(key=last_used, reverse=True)
+        stale.extend(paths[keep:])
+
+    if cache_dir.is_dir():
+        for path in cache_dir.iterdir():
+            if path.is_dir() and read_header(path) is None:
+                if now - path.stat().st_mtime > INCOMPLETE_STORE_GRACE:
+                    stale.append(path)
+
+    if legacy and Path(legacy_dir).is_dir():
+        for pattern in LEGACY_CACHE_PATTERNS:
+            stale.extend(Path(legacy_dir).glob(pattern))
+
+    if not dry_run:
+        for path in stale:
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+    return stale
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Manage the search index cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prune_parser = subparsers.add_parser("prune", help="Remove stale index stores")
+    prune_parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR, help='Store directory')
+    prune_parser.add_argument('--keep', type=int, default=1, help='Stores to keep per configuration')
+    prune_parser.add_argument(
+        '--max-age',
+        type=float,
+        default=None,
+        help='Also remove stores not used for this many days'
+    )
+    prune_parser.add_argument('--dry-run', action='store_true', help='Only list what would be removed')
+    prune_parser.add_argument(
+        '--legacy',
+        action='store_true',
+        help=f'Also remove {LEGACY_CACHE_DIR}/search_tools_* caches from before the store format'
+    )
+    args = parser.parse_args()
+
+    if args.command == "prune":
+        max_age = args.max_age * 24 * 60 * 60 if args.max_age is not None else None
+        removed = prune(
+            args.cache_dir,
+            keep=args.keep,
+            max_age=max_age,
+            dry_run=args.dry_run,
+            legacy=args.legacy,
+        )
+        action = "would remove" if args.dry_run else "removed"
+        for path in removed:
+            print(f"{action} {path}")
+        print(f"{action} {len(removed)} entries")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -65,6 +65,7 @@ Search Strategy
     * Perform at least 3 and at most 6 distinct searches to gather enough context.
     * Each search must use a different phrasing or keyword variation of the user's question.
     * Keep all searches relevant to Evidently (no need to include "Evidently" in the search text).
+    * To run several searches at once, pass all the queries to search_many; each query counts as one search.
 
 - After collecting search results:
     1. Synthesize the information into a concise, accurate answer.
@@ -105,6 +106,9 @@ def force_answer_after_6_searches(messages: list[ModelMessage]) -> list[ModelMes
         for p in m.parts:
             if p.part_kind == 'tool-call' and p.tool_name == 'search':
                 num_tool_calls = num_tool_calls + 1
+            elif p.part_kind == 'tool-call' and p.tool_name == 'search_many':
+                # every query of a batched search counts as a search
+                num_tool_calls = num_tool_calls + len(p.args_as_dict().get('queries', []))
 
     if num_tool_calls >= 6:
         print('forcing output')
@@ -130,7 +134,7 @@ def create_agent(config: AgentConfig = None) -> Agent:
     agent = Agent(
         name="search",
         instructions=search_instructions,
-        tools=[tools.search, tools.read_file, input_guardrail],
+        tools=[tools.search, tools.search_many, tools.read_file, input_guardrail],
         model=config.model,
         output_type=SearchResultArticle,
         history_processors=[force_answer_after_6_searches]